@@ -0,0 +1,194 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.cli.consumer import (
+    TOPIC_LIST,
+    decode_message,
+    get_ordering_key,
+    is_error_response,
+    metric_action,
+    process_new_message,
+    _commit_tracked,
+)
+from app.cli.producer import send_response_async
+from app.core.kafka_config import (
+    CONSUMER_BATCH_SIZE,
+    CONSUMER_BATCH_TIMEOUT,
+    CONSUMER_COMMIT_INTERVAL,
+    CONSUMER_ASYNC_MAX_IN_FLIGHT,
+    CONSUMER_ASYNC_THREADS,
+)
+from app.core.mongo_config import close_async_client
+from app.core.registry import get_action
+from app.core.service_config import IDEMPOTENCY_WAIT_TIMEOUT
+from app.utils.kafka_helper import get_consumer
+from app.utils.metrics import (
+    REQUESTS,
+    ERRORS,
+    HANDLER_SECONDS,
+    PRODUCE_SECONDS,
+    IN_FLIGHT,
+    current_action,
+    record_lag,
+)
+from app.utils.worker_pool import OffsetTracker
+
+logger = logging.getLogger(__name__)
+
+
+class KeyedLocks:
+    """asyncio-блокировки по ключу сущности; неиспользуемые блокировки удаляются"""
+
+    def __init__(self):
+        self._locks = {}
+
+    async def run(self, key, coro_fn):
+        if key is None:
+            return await coro_fn()
+
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                return await coro_fn()
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+
+
+def timeout_response(action):
+    return {"action": action, "message": {"status": "error", "details": "timeout"}}
+
+
+async def process_message_async(action, request_id, message):
+    # Действия без корутины-обработчика (записи, списки, поиск) выполняются синхронным обработчиком
+    # в пуле из CONSUMER_ASYNC_THREADS потоков: их одновременность ограничена пулом, а не in-flight
+    spec = get_action(action)
+    if spec is None or spec.async_handler is None:
+        await asyncio.to_thread(process_new_message, action, request_id, message, IDEMPOTENCY_WAIT_TIMEOUT)
+        return
+
+    context = {"action": action, "request_id": request_id}
+    label = metric_action(action)
+    # Задача asyncio работает в своей копии контекста — метка не протекает в соседние запросы
+    current_action.set(label)
+    REQUESTS.inc(label)
+    try:
+        if "body" in message:
+            message = message["body"]
+        logger.debug("Обработка сообщения", extra={**context, "payload": message})
+
+        started = time.monotonic()
+        result = await asyncio.wait_for(spec.async_handler(spec.get_data(message), action), spec.timeout)
+        elapsed = time.monotonic() - started
+        HANDLER_SECONDS.observe(label, value=elapsed)
+        if is_error_response(result):
+            ERRORS.inc(label, "handler")
+
+        # В режиме async время отправки включает ожидание подтверждения доставки
+        produce_started = time.monotonic()
+        await send_response_async(request_id, result)
+        PRODUCE_SECONDS.observe(label, value=time.monotonic() - produce_started)
+        logger.info("Запрос обработан", extra={**context, "duration_ms": round(elapsed * 1000, 2)})
+    except asyncio.TimeoutError:
+        ERRORS.inc(label, "timeout")
+        logger.warning("Действие не уложилось в %s с", spec.timeout, extra=context)
+        # Клиент ждёт ответа по request_id — сообщаем об ошибке в том же формате, что и обработчики
+        try:
+            await send_response_async(request_id, timeout_response(action))
+        except Exception as e:
+            logger.error("Не удалось отправить ответ о превышении времени: %s", e, extra=context)
+    except Exception as e:
+        ERRORS.inc(label, "exception")
+        logger.error("Ошибка обработки сообщения: %s", e, extra=context)
+
+
+async def consume_async(stop_event):
+    loop = asyncio.get_running_loop()
+    sync_executor = ThreadPoolExecutor(max_workers=CONSUMER_ASYNC_THREADS, thread_name_prefix="sync-handler")
+    loop.set_default_executor(sync_executor)
+    # Все вызовы Consumer выполняются в одном выделенном потоке
+    kafka_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="kafka-consumer")
+    tracker = OffsetTracker()
+
+    def on_revoke(consumer, partitions):
+        _commit_tracked(consumer, tracker)
+        tracker.forget(partitions)
+
+    consumer = await loop.run_in_executor(kafka_executor, get_consumer, TOPIC_LIST, on_revoke)
+    in_flight = asyncio.Semaphore(CONSUMER_ASYNC_MAX_IN_FLIGHT)
+    locks = KeyedLocks()
+    tasks = set()
+    last_commit = time.monotonic()
+
+    async def handle(topic, partition, offset, action, request_id, message):
+        cancelled = False
+        try:
+            await locks.run(
+                get_ordering_key(action, message),
+                lambda: process_message_async(action, request_id, message)
+            )
+        except asyncio.CancelledError:
+            # Прервано по дедлайну остановки: offset остаётся незавершённым и не коммитится
+            cancelled = True
+            raise
+        finally:
+            if not cancelled:
+                tracker.done(topic, partition, offset)
+            in_flight.release()
+            IN_FLIGHT.dec()
+
+    try:
+        while not stop_event.is_set():
+            msgs = await loop.run_in_executor(
+                kafka_executor, consumer.consume, CONSUMER_BATCH_SIZE, CONSUMER_BATCH_TIMEOUT
+            )
+            record_lag(consumer, msgs)
+
+            for msg in msgs:
+                if msg.error():
+                    logger.warning("Ошибка Kafka Consumer: %s", msg.error())
+                    continue
+
+                topic, partition, offset = msg.topic(), msg.partition(), msg.offset()
+                tracker.start(topic, partition, offset)
+
+                decoded = decode_message(msg)
+                if decoded is None:
+                    tracker.done(topic, partition, offset)
+                    continue
+
+                request_id, action, message = decoded
+                await in_flight.acquire()
+                IN_FLIGHT.inc()
+                task = asyncio.create_task(handle(topic, partition, offset, action, request_id, message))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+            if time.monotonic() - last_commit >= CONSUMER_COMMIT_INTERVAL:
+                await loop.run_in_executor(kafka_executor, _commit_tracked, consumer, tracker)
+                last_commit = time.monotonic()
+
+    finally:
+        logger.info("Остановка Consumer: дообработка %s сообщений", len(tasks))
+        if tasks:
+            # Не успевшие до дедлайна задачи отменяются; их offset'ы не коммитятся
+            _, pending = await asyncio.wait(tasks, timeout=stop_event.drain_timeout())
+            if pending:
+                logger.warning("Не все сообщения дообработаны до дедлайна: %s", len(pending))
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+        await loop.run_in_executor(kafka_executor, _commit_tracked, consumer, tracker)
+        await loop.run_in_executor(kafka_executor, consumer.close)
+        kafka_executor.shutdown(wait=True)
+        await close_async_client()
+
+
+def run_async_consumer(stop_event):
+    asyncio.run(consume_async(stop_event))
@@ -1,142 +1,317 @@
-import json
+import logging
+import time
+
+from confluent_kafka import KafkaException
 
 from app.utils.kafka_helper import get_consumer
+from app.utils.serialization import loads
+from app.utils.metrics import (
+    REQUESTS,
+    ERRORS,
+    DECODE_SECONDS,
+    HANDLER_SECONDS,
+    PRODUCE_SECONDS,
+    IN_FLIGHT,
+    DUPLICATES,
+    current_action,
+    record_lag,
+)
+from app.utils.worker_pool import KeyedWorkerPool, OffsetTracker
 from app.cli.producer import *
-from app.core.kafka_config import TOPICS
+from app.core.kafka_config import (
+    TOPICS,
+    CONSUMER_MODE,
+    CONSUMER_BATCH_SIZE,
+    CONSUMER_BATCH_TIMEOUT,
+    CONSUMER_WORKERS,
+    CONSUMER_WORKER_QUEUE_SIZE,
+    CONSUMER_COMMIT_INTERVAL,
+)
 from pydantic import ValidationError
-from app.services.event_service import *
-from app.services.task_service import *
-from app.services.chat_service import *
+from app.core.registry import get_action
+from app.core.service_config import IDEMPOTENCY_ENABLED, IDEMPOTENCY_WAIT_TIMEOUT
+from app.services.idempotency_service import REPLAY, IN_PROGRESS, claim_request, complete_request, release_request
+# Импорт сервисов регистрирует их действия в реестре
+from app.services import event_service, task_service, chat_service, cleanup_service  # noqa: F401
 
 TOPIC_LIST = [TOPICS["requests"]]
 
+logger = logging.getLogger(__name__)
 
-def process_new_message(action, request_id, message):
-    try:
-        print(f"📩 Обработка нового сообщения: {json.dumps(message, indent=2)}")
 
+def metric_action(action) -> str:
+    """Метка действия для метрик: незарегистрированные действия сводятся в одну серию"""
+    return action if get_action(action) is not None else "unknown"
+
+
+def is_error_response(result) -> bool:
+    """Обработчики сообщают об ошибке статусом в ответе, а не исключением"""
+    if not isinstance(result, dict):
+        return False
+    message = result.get("message")
+    return result.get("status") == "error" or (isinstance(message, dict) and message.get("status") == "error")
+
+
+def validation_response(action, error):
+    """Ответ клиенту на data, не прошедшую проверку моделью действия"""
+    return {"action": action, "message": {"status": "error", "details": str(error)}}
+
+
+def process_new_message(action, request_id, message, duplicate_wait=0.0):
+    """Обрабатывает запрос и отправляет ответ. duplicate_wait — сколько дубликат ждёт ответа
+    живого владельца захвата (только там, где ожидание не останавливает чтение партиций)"""
+    context = {"action": action, "request_id": request_id}
+    label = metric_action(action)
+    # Команды MongoDB внутри обработчика учитываются в метриках этого действия
+    token = current_action.set(label)
+    REQUESTS.inc(label)
+    claimed = False
+    try:
         if "body" in message:
             message = message["body"]
 
-        print("message:", message)
-
-        if action == "create_event":
-            result = create_event_service(message["data"], action)
-            send_response(request_id, result)
-        elif action == "update_event":
-            result = update_event_service(message["data"], action)
-            send_response(request_id, result)
-        elif action == "delete_event":
-            result = delete_event_service(message["data"], action)
-            send_response(request_id, result)
-        elif action == "register_volunteer":
-            result = register_volunteer_service(message["data"], action)
-            send_response(request_id, result)
-        elif action == "unregister_volunteer":
-            result = unregister_volunteer_service(message["data"], action)
-            send_response(request_id, result)
-        elif action == "get_upcoming_events":
-            result = get_upcoming_events_service(message.get("data", {}), action)
-            send_response(request_id, result)
-        elif action == "get_user_events":
-            result = get_user_events_service(message.get("data", {}), action)
-            send_response(request_id, result)
-        elif action == "get_event_by_id":
-            result = get_event_by_id_service(message.get("data", {}), action)
-            send_response(request_id, result)
-        elif action == "get_event_by_title":
-            result = get_event_by_title_service(message.get("data", {}), action)
-            send_response(request_id, result)
-        elif action == "get_user_volunteer_count":
-            result = get_user_volunteer_count_service(message.get("data", {}), action)
-            send_response(request_id, result)
-        elif action == "assign_task":
-            result = assign_task_service(message["data"], action)
-            send_response(request_id, result)
-        elif action == "update_task":
-            result = update_task_service(message["data"], action)
-            send_response(request_id, result)
-        elif action == "delete_task":
-            result = delete_task_service(message["data"], action)
-            send_response(request_id, result)
-        elif action == "get_tasks_by_user":
-            result = get_tasks_by_user_service(message.get("data", {}), action)
-            send_response(request_id, result)
-        elif action == "get_tasks_by_event":
-            result = get_tasks_by_event_service(message.get("data", {}), action)
-            send_response(request_id, result)
-        elif action == "get_task_by_id":
-            result = get_task_by_id_service(message.get("data", {}), action)
-            send_response(request_id, result)
-        elif action == "add_task_comment":
-            result = add_task_comment_service(message["data"], action)
-            send_response(request_id, result)
-        elif action == "get_task_comments":
-            result = get_task_comments_service(message["data"], action)
-            send_response(request_id, result)
-            pass
-        elif action == "add_task_attachment":
-            result = add_task_attachment_service(message["data"], action)
-            send_response(request_id, result)
-        elif action == "remove_task_attachment":
-            result = remove_task_attachment_service(message["data"], action)
-            send_response(request_id, result)
-        elif action == "change_task_status":
-            result = change_task_status_service(message["data"], action)
-            send_response(request_id, result)
-        elif action == "get_tasks_assigned_by_user":
-            result = get_tasks_assigned_by_user_service(message.get("data", {}), action)
-            send_response(request_id, result)
-        elif action == "get_task_attachments":
-            result = get_task_attachments_service(message["data"], action)
-            send_response(request_id, result)
-        elif action == "delete_tasks_by_event_id":
-            result = delete_tasks_by_event_id_service(message["data"], action)
-            send_response(request_id, result)
-        elif action == "get_events_with_user_as_volunteer":
-            result = get_events_with_user_as_volunteer_service(message.get("data", {}), action)
-            send_response(request_id, result)
-        elif action == "get_chat_messages":
-            result = get_chat_messages_service(message.get("data", {}), action)
-            send_response(request_id, result)
-        elif action == "add_chat_message":
-            result = add_chat_message_service(message.get("data", {}), action)
-            send_response(request_id, result)
-
-        else:
+        # Тело запроса сериализуется форматтером, только если запись debug действительно выводится
+        logger.debug("Обработка сообщения", extra={**context, "payload": message})
+
+        spec = get_action(action)
+        if spec is None:
             raise ValueError(f"Неизвестное действие: {action}")
 
+        # Повторная доставка запроса на запись (ребаланс, падение) не должна создавать дубликаты
+        if spec.write and request_id and IDEMPOTENCY_ENABLED:
+            outcome, stored = claim_request(request_id, action, wait=duplicate_wait)
+            if outcome == REPLAY:
+                DUPLICATES.inc(label, "replayed")
+                send_response(request_id, stored)
+                logger.info("Повторный запрос: отправлен сохранённый ответ", extra=context)
+                return
+            if outcome == IN_PROGRESS:
+                # Владелец захвата жив и продлевает аренду — ответ отправит он
+                DUPLICATES.inc(label, "in_progress")
+                logger.warning("Повторный запрос всё ещё обрабатывается другим процессом", extra=context)
+                return
+            claimed = True
+
+        started = time.monotonic()
+        result = spec.handler(spec.get_data(message), action)
+        elapsed = time.monotonic() - started
+        if claimed:
+            complete_request(request_id, result)
+            claimed = False
+        HANDLER_SECONDS.observe(label, value=elapsed)
+        if is_error_response(result):
+            ERRORS.inc(label, "handler")
+        if elapsed > spec.timeout:
+            logger.warning("Действие выполнялось %.2f с (лимит %s с)", elapsed, spec.timeout, extra=context)
 
+        produce_started = time.monotonic()
+        send_response(request_id, result)
+        PRODUCE_SECONDS.observe(label, value=time.monotonic() - produce_started)
+        logger.info("Запрос обработан", extra={**context, "duration_ms": round(elapsed * 1000, 2)})
 
     except ValidationError as ve:
-        print(f"⚠️ Ошибка валидации данных: {ve}")
+        ERRORS.inc(label, "validation")
+        logger.warning("Ошибка валидации данных: %s", ve, extra=context)
+        # Клиент ждёт ответа по request_id — как и при ошибке внутри обработчика
+        try:
+            send_response(request_id, validation_response(action, ve))
+        except Exception as e:
+            logger.error("Не удалось отправить ответ об ошибке валидации: %s", e, extra=context)
     except Exception as e:
-        print(f"⚠️ Ошибка обработки сообщения: {str(e)}")
+        ERRORS.inc(label, "exception")
+        logger.error("Ошибка обработки сообщения: %s", e, extra=context)
+    finally:
+        if claimed:
+            try:
+                release_request(request_id)
+            except Exception as e:
+                logger.error("Не удалось снять захват запроса: %s", e, extra=context)
+        current_action.reset(token)
+
+
+def decode_message(msg):
+    """Разбирает сообщение Kafka в (request_id, action, message) или None при ошибке"""
+    started = time.monotonic()
+    try:
+        message = loads(msg.value())
+
+        request_id = message.get("request_id")
+        action = message["message"].get("action")
+        DECODE_SECONDS.observe(metric_action(action), value=time.monotonic() - started)
+        logger.debug(
+            "Получено сообщение из %s", msg.topic(),
+            extra={"action": action, "request_id": request_id, "payload": message}
+        )
+        return request_id, action, message["message"]
+    except (ValueError, KeyError, AttributeError) as e:
+        ERRORS.inc("unknown", "decode")
+        logger.warning("Не удалось разобрать сообщение из %s: %s", msg.topic(), e)
+        return None
+
+
+def process_batch(batch):
+    """Обрабатывает пачку разобранных сообщений по порядку"""
+    for request_id, action, message in batch:
+        process_new_message(action, request_id, message)
 
 
-def consume_messages():
-    print("🟢 Consumer инициализирован, слушаю темы:", TOPIC_LIST)
+def get_ordering_key(action, message):
+    """Возвращает ключ сущности (event _id, task_id, chat_id), к которой относится запрос"""
+    spec = get_action(action)
+    if spec is None:
+        return None
+    return spec.ordering_key(message.get("body", message).get("data"))
 
+
+def consume_single(stop_event):
     consumer = get_consumer(TOPIC_LIST)
 
     try:
-        while True:
+        while not stop_event.is_set():
             msg = consumer.poll(1.0)
             if msg is None:
                 continue
             if msg.error():
-                print(f"⚠️ Ошибка Kafka Consumer: {msg.error()}")
+                logger.warning("Ошибка Kafka Consumer: %s", msg.error())
+                continue
+            record_lag(consumer, [msg])
+
+            decoded = decode_message(msg)
+            if decoded is None:
                 continue
 
-            message = json.loads(msg.value().decode("utf-8"))
-            print(f"📩 Получено сообщение из {msg.topic()}:\n{json.dumps(message, indent=2)}")
+            request_id, action, message = decoded
+            IN_FLIGHT.inc()
+            try:
+                process_new_message(action, request_id, message)
+            finally:
+                IN_FLIGHT.dec()
 
-            request_id = message.get("request_id")
-            action = message["message"].get("action")
+    finally:
+        # При автокоммите close() фиксирует offset'ы уже обработанных сообщений
+        logger.info("Остановка Consumer")
+        consumer.close()
 
-            process_new_message(action, request_id, message["message"])
 
-    except KeyboardInterrupt:
-        print("⏹️ Остановка Consumer")
+def consume_batches(stop_event):
+    consumer = get_consumer(TOPIC_LIST)
+
+    try:
+        while not stop_event.is_set():
+            msgs = consumer.consume(CONSUMER_BATCH_SIZE, CONSUMER_BATCH_TIMEOUT)
+            if not msgs:
+                continue
+            record_lag(consumer, msgs)
+
+            batch = []
+            for msg in msgs:
+                if msg.error():
+                    logger.warning("Ошибка Kafka Consumer: %s", msg.error())
+                    continue
+                decoded = decode_message(msg)
+                if decoded is not None:
+                    batch.append(decoded)
+
+            IN_FLIGHT.set(value=len(batch))
+            process_batch(batch)
+            IN_FLIGHT.set(value=0)
+
+            # Коммитим только после того, как обработчики всей пачки завершились
+            try:
+                consumer.commit(asynchronous=False)
+            except KafkaException as e:
+                logger.error("Ошибка коммита offset'ов: %s", e)
+
     finally:
+        # Текущая пачка уже дообработана и закоммичена внутри цикла
+        logger.info("Остановка Consumer")
         consumer.close()
+
+
+def _process_tracked(tracker, topic, partition, offset, action, request_id, message):
+    try:
+        # Ждущий дубликат занимает поток пула, а не поток Consumer'а
+        process_new_message(action, request_id, message, IDEMPOTENCY_WAIT_TIMEOUT)
+    finally:
+        tracker.done(topic, partition, offset)
+        IN_FLIGHT.dec()
+
+
+def _commit_tracked(consumer, tracker):
+    offsets = tracker.committable()
+    if not offsets:
+        return
+    try:
+        consumer.commit(offsets=offsets, asynchronous=False)
+        tracker.mark_committed(offsets)
+    except KafkaException as e:
+        logger.error("Ошибка коммита offset'ов: %s", e)
+
+
+def consume_pool(stop_event):
+    tracker = OffsetTracker()
+
+    def on_revoke(consumer, partitions):
+        _commit_tracked(consumer, tracker)
+        tracker.forget(partitions)
+
+    consumer = get_consumer(TOPIC_LIST, on_revoke=on_revoke)
+    pool = KeyedWorkerPool(CONSUMER_WORKERS, CONSUMER_WORKER_QUEUE_SIZE)
+    last_commit = time.monotonic()
+
+    try:
+        while not stop_event.is_set():
+            msgs = consumer.consume(CONSUMER_BATCH_SIZE, CONSUMER_BATCH_TIMEOUT)
+            record_lag(consumer, msgs)
+
+            for msg in msgs:
+                if msg.error():
+                    logger.warning("Ошибка Kafka Consumer: %s", msg.error())
+                    continue
+
+                topic, partition, offset = msg.topic(), msg.partition(), msg.offset()
+                tracker.start(topic, partition, offset)
+
+                decoded = decode_message(msg)
+                if decoded is None:
+                    tracker.done(topic, partition, offset)
+                    continue
+
+                request_id, action, message = decoded
+                IN_FLIGHT.inc()
+                pool.submit(
+                    get_ordering_key(action, message),
+                    _process_tracked,
+                    tracker, topic, partition, offset, action, request_id, message
+                )
+
+            if time.monotonic() - last_commit >= CONSUMER_COMMIT_INTERVAL:
+                _commit_tracked(consumer, tracker)
+                last_commit = time.monotonic()
+
+    finally:
+        logger.info("Остановка Consumer: дообработка %s сообщений", pool.in_flight())
+        # Коммитится только обработанный префикс: не успевшие до дедлайна сообщения будут прочитаны повторно
+        if not pool.shutdown(wait=True, timeout=stop_event.drain_timeout()):
+            logger.warning("Не все сообщения дообработаны до дедлайна: %s", pool.in_flight())
+            # Очередь брошена, но начатые обработчики ещё пишут в MongoDB и Producer: клиенты закрываются
+            # после выхода из consume_pool, поэтому ждём их до общего дедлайна остановки
+            if not pool.join(stop_event.remaining()):
+                logger.error("Обработчики пула не завершились к дедлайну остановки")
+        _commit_tracked(consumer, tracker)
+        consumer.close()
+
+
+def consume_messages(stop_event):
+    """Читает запросы до установки stop_event (app.core.lifecycle.ShutdownEvent), затем корректно завершается"""
+    logger.info("Consumer инициализирован", extra={"topics": TOPIC_LIST, "mode": CONSUMER_MODE})
+
+    if CONSUMER_MODE == "batch":
+        consume_batches(stop_event)
+    elif CONSUMER_MODE == "pool":
+        consume_pool(stop_event)
+    elif CONSUMER_MODE == "async":
+        from app.cli.async_consumer import run_async_consumer
+        run_async_consumer(stop_event)
+    else:
+        consume_single(stop_event)
@@ -0,0 +1,74 @@
+"""Служебные команды: python -m app.cli.maintenance <команда>"""
+import argparse
+import sys
+
+from app.core.indexes import ensure_indexes, verify_query_shapes
+from app.core.logging_config import setup_logging
+
+
+def cmd_ensure_indexes(args):
+    for collection, names in ensure_indexes().items():
+        print(f"✅ {collection}: {', '.join(names)}")
+    return 0
+
+
+def cmd_verify_indexes(args):
+    failed = 0
+    for name, stages, collscan in verify_query_shapes():
+        mark = "❌" if collscan else "✅"
+        print(f"{mark} {name}: {' -> '.join(stages)}")
+        failed += collscan
+    if failed:
+        print(f"⚠️ Запросов с полным сканированием коллекции: {failed}")
+        return 1
+    return 0
+
+
+def cmd_migrate_chats(args):
+    from app.services.chat_service import migrate_embedded_chat_messages
+    print(f"✅ Перенесено сообщений чатов: {migrate_embedded_chat_messages()}")
+    return 0
+
+
+def cmd_migrate_comments(args):
+    from app.services.task_service import migrate_embedded_task_comments
+    print(f"✅ Задач с перенесёнными комментариями: {migrate_embedded_task_comments()}")
+    return 0
+
+
+def cmd_reconcile_counters(args):
+    from app.services.counter_service import reconcile_event_counters
+    counters = reconcile_event_counters()
+    print(f"✅ Счётчики мероприятий пересчитаны: {counters['status']}")
+    return 0
+
+
+def cmd_reindex_search(args):
+    from app.services.event_service import reindex_search_fields
+    print(f"✅ Обновлено поисковых токенов мероприятий: {reindex_search_fields()}")
+    return 0
+
+
+COMMANDS = {
+    "ensure-indexes": (cmd_ensure_indexes, "создать индексы из манифеста"),
+    "verify-indexes": (cmd_verify_indexes, "проверить планы запросов на COLLSCAN"),
+    "migrate-chats": (cmd_migrate_chats, "перенести встроенные сообщения чатов в пачки"),
+    "migrate-comments": (cmd_migrate_comments, "перенести встроенные комментарии задач в task_comments"),
+    "reconcile-counters": (cmd_reconcile_counters, "пересчитать счётчики мероприятий по статусам"),
+    "reindex-search": (cmd_reindex_search, "пересобрать поисковые токены мероприятий"),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.cli.maintenance")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, (handler, help_text) in COMMANDS.items():
+        subparsers.add_parser(name, help=help_text).set_defaults(handler=handler)
+
+    args = parser.parse_args(argv)
+    setup_logging(fmt="text")
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,30 +1,13 @@
-import json
-from datetime import datetime
+import logging
 
-from bson import ObjectId
+from app.utils.kafka_helper import produce, produce_async
+from app.utils.serialization import dumps
+from app.core.kafka_config import TOPICS, RESPONSE_KEY
 
-from app.utils.kafka_helper import get_producer
-from app.core.kafka_config import TOPICS
+logger = logging.getLogger(__name__)
 
 
-def default_serializer(obj):
-    if isinstance(obj, datetime):
-        return obj.isoformat()
-    raise TypeError(f"Object of type {type(obj)} is not JSON serializable")
-
-
-class MongoJSONEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, ObjectId):
-            return str(obj)
-        if isinstance(obj, datetime):
-            return obj.isoformat()
-        return super().default(obj)
-
-
-def send_response(request_id, message):
-    producer = get_producer()
-
+def build_response(request_id, message):
     forward_to = message.get("message", {}).get("forward_to")
     only_forward = message.get("message", {}).get("only_forward")
 
@@ -39,18 +22,51 @@ def send_response(request_id, message):
     if only_forward is not None:
         response_message["only_forward"] = only_forward
 
-    producer.produce(
+    return response_message
+
+
+def response_key(request_id, message, mode=RESPONSE_KEY):
+    """Ключ партиционирования ответа; без ключа librdkafka распределяет ответы сам"""
+    if mode == "user":
+        forward_to = message.get("message", {}).get("forward_to")
+        if isinstance(forward_to, list) and forward_to:
+            return str(forward_to[0])
+    return str(request_id) if request_id is not None else None
+
+
+def log_response(response_message):
+    # Тело ответа — только на уровне debug; адресаты пересылки пишутся списком в той же записи
+    logger.debug(
+        "Ответ отправлен в %s", TOPICS["responses"],
+        extra={
+            "request_id": response_message.get("request_id"),
+            "forward_to": response_message.get("forward_to"),
+            "payload": response_message["message"],
+        }
+    )
+
+
+def send_response(request_id, message):
+    response_message = build_response(request_id, message)
+
+    # Доставка асинхронная: Producer общий, flush выполняется только при остановке
+    produce(
         TOPICS["responses"],
-        key="user",
-        value=json.dumps(response_message, cls=MongoJSONEncoder)
+        dumps(response_message),
+        key=response_key(request_id, message)
     )
 
-    producer.flush()
+    log_response(response_message)
 
-    # Для логирования покажем все, что отправили
-    print(f"✅ Ответ отправлен в {TOPICS['responses']}:\n{json.dumps(response_message, indent=2, cls=MongoJSONEncoder)}")
-    if forward_to:
-        for target_id in forward_to:
-            print(f"↪️ Также переслано пользователю {target_id}:\n{json.dumps(message, indent=2, cls=MongoJSONEncoder)}")
 
+async def send_response_async(request_id, message):
+    """Отправляет ответ и дожидается подтверждения доставки (режим async)"""
+    response_message = build_response(request_id, message)
+
+    await produce_async(
+        TOPICS["responses"],
+        dumps(response_message),
+        key=response_key(request_id, message)
+    )
 
+    log_response(response_message)
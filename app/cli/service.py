@@ -0,0 +1,69 @@
+import logging
+import signal
+import threading
+
+from app.cli.consumer import consume_messages
+from app.core.indexes import ensure_indexes
+from app.core.lifecycle import Lifecycle
+from app.core.mongo_config import MONGO_ENSURE_INDEXES, close_client
+from app.core.registry import ACTIONS
+from app.core.service_config import METRICS_ENABLED, METRICS_HOST, METRICS_PORT
+from app.services.cleanup_service import resume_cleanup_jobs, stop_cleanup_jobs
+from app.utils.cache import event_cache, task_cache
+from app.utils.kafka_helper import flush_producer, get_delivery_stats
+from app.utils.metrics import REQUESTS, init_action_metrics, start_metrics_server
+
+logger = logging.getLogger(__name__)
+
+
+def log_stats():
+    logger.info("Статистика доставки", extra={"delivery": get_delivery_stats()})
+    logger.info("Статистика кэша", extra={"event_cache": event_cache.stats(), "task_cache": task_cache.stats()})
+
+
+def _report_requests(stop_event, counter, interval):
+    """Публикует число обработанных запросов в общую с супервизором ячейку"""
+    while not stop_event.wait(interval):
+        counter.value = int(REQUESTS.total())
+    counter.value = int(REQUESTS.total())
+
+
+def run_service(ensure=MONGO_ENSURE_INDEXES, metrics_port=METRICS_PORT, signals=(signal.SIGINT, signal.SIGTERM),
+                counter=None, report_interval=1.0) -> int:
+    """Запускает Consumer и блокируется до сигнала остановки. Возвращает код выхода процесса"""
+    lifecycle = Lifecycle()
+    # Перехватываем сигналы остановки (Ctrl+C, kill): Consumer прекращает чтение и дообрабатывает принятое
+    lifecycle.install_signal_handlers(signals)
+
+    if ensure:
+        ensure_indexes()
+        logger.info("Индексы MongoDB проверены")
+
+    if METRICS_ENABLED:
+        init_action_metrics(ACTIONS)
+        start_metrics_server(METRICS_HOST, metrics_port)
+
+    if counter is not None:
+        threading.Thread(
+            target=_report_requests, args=(lifecycle.stop_event, counter, report_interval),
+            name="requests-report", daemon=True
+        ).start()
+
+    # Фоновая очистка удалённых мероприятий, прерванная остановкой или падением процесса:
+    # задание с живой арендой другого процесса не трогаем
+    resume_cleanup_jobs()
+
+    # Фоновая очистка прерывается между порциями и дочищается при следующем запуске
+    lifecycle.on_shutdown(stop_cleanup_jobs)
+    # Producer общий для процесса — дожидаемся доставки ответов только после остановки Consumer
+    lifecycle.on_shutdown(lambda: flush_producer(max(lifecycle.stop_event.remaining(), 1.0)))
+    lifecycle.on_shutdown(close_client)
+    lifecycle.on_shutdown(log_stats)
+
+    lifecycle.start(consume_messages)
+    logger.info("Consumer запущен")
+
+    lifecycle.wait()
+    clean = lifecycle.shutdown()
+    logger.info("Программа завершена")
+    return 0 if clean else 1
@@ -0,0 +1,183 @@
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+import time
+
+from app.core.indexes import ensure_indexes
+from app.core.lifecycle import ShutdownEvent
+from app.core.logging_config import setup_logging
+from app.core.mongo_config import MONGO_ENSURE_INDEXES, close_client
+from app.core.service_config import (
+    ENTITY_CACHE_MULTIPROCESS_TTL, METRICS_PORT, SHUTDOWN_TIMEOUT, SUPERVISOR_REPORT_INTERVAL, WORKER_PROCESSES,
+)
+
+logger = logging.getLogger(__name__)
+
+# spawn, а не fork: MongoClient и librdkafka не переживают fork, каждый процесс создаёт свои клиенты с нуля
+_mp = multiprocessing.get_context("spawn")
+
+# Пауза перед перезапуском упавшего процесса растёт экспоненциально до этого предела (сек)
+MAX_RESTART_BACKOFF = 30.0
+# Процесс, проработавший столько секунд, считается стабильным — счётчик падений сбрасывается
+STABLE_UPTIME = 60.0
+# Запас сверх дедлайна остановки процесса, после которого супервизор добивает его SIGKILL
+KILL_MARGIN = 5.0
+
+
+def run_worker(index, counter):
+    """Точка входа процесса-обработчика: собственные Producer, Consumer и клиент MongoDB"""
+    from app.cli.service import run_service
+    from app.utils.cache import bound_cache_staleness
+
+    setup_logging()
+    # Инвалидация кэша не выходит за пределы процесса — ограничиваем срок устаревания записей других процессов
+    bound_cache_staleness(ENTITY_CACHE_MULTIPROCESS_TTL)
+    # Своя группа процессов: Ctrl+C и сигналы на группу супервизора сюда не доходят,
+    # останавливает обработчик только супервизор через SIGTERM (иначе второй сигнал обрывал бы дообработку)
+    os.setpgrp()
+    code = run_service(
+        ensure=False, metrics_port=METRICS_PORT + index, signals=(signal.SIGTERM,), counter=counter
+    )
+    sys.exit(code)
+
+
+class _Worker:
+    def __init__(self, index):
+        self.index = index
+        self.counter = _mp.Value("q", 0, lock=False)
+        self.process = None
+        self.started_at = 0.0
+        self.failures = 0
+        self.restart_at = None
+        # Счётчик запросов умирает вместе с процессом — накопленное до перезапуска храним отдельно
+        self.base = 0
+        self.reported = 0
+
+    def start(self):
+        self.base += self.counter.value
+        self.counter.value = 0
+        self.process = _mp.Process(
+            target=run_worker, args=(self.index, self.counter), name=f"worker-{self.index}", daemon=False
+        )
+        self.process.start()
+        self.started_at = time.monotonic()
+        self.restart_at = None
+        logger.info("Процесс запущен", extra={"worker": self.index, "pid": self.process.pid})
+
+    def total(self):
+        return self.base + self.counter.value
+
+
+class Supervisor:
+    """Держит workers процессов в одной группе Consumer'ов: перезапускает упавшие и останавливает все по сигналу"""
+
+    def __init__(self, workers, report_interval=SUPERVISOR_REPORT_INTERVAL, timeout=SHUTDOWN_TIMEOUT):
+        self.stop_event = ShutdownEvent(timeout)
+        self.workers = [_Worker(index) for index in range(workers)]
+        self.report_interval = report_interval
+
+    def install_signal_handlers(self):
+        signal.signal(signal.SIGINT, self._handle_signal)
+        signal.signal(signal.SIGTERM, self._handle_signal)
+
+    def _handle_signal(self, signum, frame):
+        if self.stop_event.is_set():
+            logger.warning("Повторный сигнал %s, принудительное завершение процессов", signal.Signals(signum).name)
+            for worker in self.workers:
+                if worker.process is not None and worker.process.is_alive():
+                    worker.process.kill()
+            return
+        logger.info("Получен сигнал %s, остановка процессов...", signal.Signals(signum).name)
+        self.stop_event.set()
+
+    def _check(self, now):
+        for worker in self.workers:
+            process = worker.process
+            if process.is_alive():
+                continue
+            if worker.restart_at is None:
+                if now - worker.started_at >= STABLE_UPTIME:
+                    worker.failures = 0
+                worker.failures += 1
+                delay = min(2.0 ** (worker.failures - 1), MAX_RESTART_BACKOFF)
+                worker.restart_at = now + delay
+                logger.error(
+                    "Процесс завершился, перезапуск через %.0f с", delay,
+                    extra={"worker": worker.index, "pid": process.pid, "exitcode": process.exitcode},
+                )
+            elif now >= worker.restart_at:
+                process.close()
+                worker.start()
+
+    def _report(self, elapsed):
+        rates = {}
+        total = 0
+        for worker in self.workers:
+            value = worker.total()
+            rates[str(worker.index)] = round((value - worker.reported) / elapsed, 1)
+            total += value - worker.reported
+            worker.reported = value
+        logger.info(
+            "Пропускная способность процессов",
+            extra={"rps": rates, "rps_total": round(total / elapsed, 1),
+                   "alive": sum(worker.process.is_alive() for worker in self.workers)},
+        )
+
+    def run(self) -> int:
+        for worker in self.workers:
+            worker.start()
+        logger.info("Супервизор запущен", extra={"workers": len(self.workers)})
+
+        last_report = time.monotonic()
+        while not self.stop_event.wait(1.0):
+            now = time.monotonic()
+            self._check(now)
+            if now - last_report >= self.report_interval:
+                self._report(now - last_report)
+                last_report = now
+
+        return self._stop()
+
+    def _stop(self) -> int:
+        # SIGTERM каждому процессу: они дообрабатывают принятое в пределах своего дедлайна
+        for worker in self.workers:
+            if worker.process.is_alive():
+                worker.process.terminate()
+
+        deadline = time.monotonic() + self.stop_event.timeout + KILL_MARGIN
+        clean = True
+        for worker in self.workers:
+            worker.process.join(max(0.0, deadline - time.monotonic()))
+            if worker.process.is_alive():
+                logger.warning("Процесс не завершился вовремя, SIGKILL", extra={"worker": worker.index})
+                worker.process.kill()
+                worker.process.join()
+                clean = False
+            elif worker.process.exitcode != 0 and worker.restart_at is None:
+                clean = False
+
+        logger.info(
+            "Супервизор остановлен",
+            extra={"requests": {str(worker.index): worker.total() for worker in self.workers}},
+        )
+        return 0 if clean else 1
+
+
+def run_supervisor(workers=WORKER_PROCESSES) -> int:
+    supervisor = Supervisor(workers)
+    supervisor.install_signal_handlers()
+
+    # Индексы проверяет один процесс, а не каждый обработчик
+    if MONGO_ENSURE_INDEXES:
+        ensure_indexes()
+        logger.info("Индексы MongoDB проверены")
+    close_client()
+
+    return supervisor.run()
+
+
+if __name__ == "__main__":
+    setup_logging()
+    sys.exit(run_supervisor(max(WORKER_PROCESSES, 1)))
@@ -0,0 +1,135 @@
+import logging
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from app.core.mongo_config import db
+from app.core.service_config import IDEMPOTENCY_TTL
+
+logger = logging.getLogger(__name__)
+
+# Манифест индексов сервиса: коллекция -> индексы, которые должны существовать
+INDEXES = {
+    "events": [
+        IndexModel([("status", ASCENDING), ("start_datetime", ASCENDING)], name="status_start_datetime"),
+        IndexModel(
+            [("status", ASCENDING), ("category", ASCENDING), ("start_datetime", ASCENDING)],
+            name="status_category_start_datetime"
+        ),
+        IndexModel(
+            [("volunteers", ASCENDING), ("start_datetime", ASCENDING), ("_id", ASCENDING)],
+            name="volunteers_start_datetime"
+        ),
+        IndexModel(
+            [("created_by", ASCENDING), ("start_datetime", ASCENDING), ("_id", ASCENDING)],
+            name="created_by_start_datetime"
+        ),
+        IndexModel([("chat_id", ASCENDING)], name="chat_id"),
+        IndexModel([("search_prefixes", ASCENDING)], name="search_prefixes"),
+        IndexModel(
+            [("search_title", ASCENDING), ("start_datetime", ASCENDING), ("_id", ASCENDING)],
+            name="search_title_start_datetime"
+        ),
+    ],
+    "volunteer_tasks": [
+        IndexModel(
+            [("assigned_to", ASCENDING), ("deadline", ASCENDING), ("_id", ASCENDING)],
+            name="assigned_to_deadline_id"
+        ),
+        IndexModel([("event_id", ASCENDING), ("deadline", ASCENDING), ("_id", ASCENDING)], name="event_id_deadline_id"),
+        IndexModel([("created_by", ASCENDING), ("deadline", ASCENDING), ("_id", ASCENDING)], name="created_by_deadline_id"),
+    ],
+    "task_comments": [
+        IndexModel(
+            [("task_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="task_id_created_at"
+        ),
+    ],
+    "chat_message_buckets": [
+        IndexModel([("chat_id", ASCENDING), ("last_id", DESCENDING)], name="chat_id_last_id"),
+        IndexModel([("chat_id", ASCENDING), ("first_id", ASCENDING)], name="chat_id_first_id"),
+        IndexModel([("chat_id", ASCENDING), ("count", ASCENDING)], name="chat_id_count"),
+    ],
+    "cleanup_jobs": [
+        IndexModel([("status", ASCENDING)], name="status"),
+    ],
+    "processed_requests": [
+        # Ответы на обработанные запросы удаляются MongoDB через IDEMPOTENCY_TTL секунд
+        IndexModel([("created_at", ASCENDING)], name="created_at_ttl", expireAfterSeconds=IDEMPOTENCY_TTL),
+    ],
+}
+
+
+# Индексы, заменённые составными из INDEXES: удаляются при применении манифеста
+DROPPED_INDEXES = {
+    "events": ["volunteers", "created_by"],
+    "volunteer_tasks": ["assigned_to_deadline", "event_id_deadline", "created_by"],
+}
+
+
+def query_shapes():
+    """Формы запросов сервисов: (название, коллекция, фильтр, сортировка) — проверяются через explain.
+    Фильтры и сортировки строят те же функции, что и обработчики действий"""
+    from app.services import chat_service, event_service, task_service
+
+    return [*event_service.query_shapes(), *task_service.query_shapes(), *chat_service.query_shapes()]
+
+
+def drop_replaced_indexes(database=db):
+    """Удаляет индексы из DROPPED_INDEXES, если они ещё есть. Возвращает имена удалённых"""
+    dropped = {}
+    for collection, names in DROPPED_INDEXES.items():
+        existing = database[collection].index_information()
+        for name in names:
+            if name not in existing:
+                continue
+            try:
+                database[collection].drop_index(name)
+            except OperationFailure as e:
+                logger.warning("Не удалось удалить индекс %s.%s: %s", collection, name, e)
+                continue
+            dropped.setdefault(collection, []).append(name)
+    return dropped
+
+
+def ensure_indexes(database=db):
+    """Идемпотентно создаёт индексы из манифеста и удаляет заменённые ими.
+    Возвращает имена созданных/существующих индексов"""
+    ensured = {}
+    for collection, models in INDEXES.items():
+        try:
+            ensured[collection] = database[collection].create_indexes(models)
+        except OperationFailure as e:
+            logger.warning("Не удалось создать индексы для %s: %s", collection, e)
+
+    # Старые индексы удаляются только после создания замены, чтобы запросы не остались без индекса
+    for collection, names in drop_replaced_indexes(database).items():
+        logger.info("Удалены заменённые индексы %s: %s", collection, ", ".join(names))
+    return ensured
+
+
+def _plan_stages(plan):
+    """Собирает все стадии плана выполнения (включая вложенные inputStage/inputStages)"""
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(_plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(_plan_stages(item))
+    return stages
+
+
+def verify_query_shapes(database=db):
+    """Выполняет explain для каждой формы запроса. Возвращает список (название, стадии, есть ли COLLSCAN)"""
+    report = []
+    for name, collection, query, sort in query_shapes():
+        cursor = database[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = cursor.explain().get("queryPlanner", {}).get("winningPlan", {})
+        stages = _plan_stages(plan)
+        report.append((name, stages, "COLLSCAN" in stages))
+    return report
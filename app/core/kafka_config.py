@@ -13,18 +13,86 @@ KAFKA_CONFIG = {
     "bootstrap.servers": BROKERS,
 }
 
+# Режим чтения: single — по одному сообщению с автокоммитом,
+# batch — пачками через consume() с ручным коммитом после обработки,
+# pool — параллельно в пуле потоков с сохранением порядка по сущности,
+# async — на asyncio с асинхронным клиентом MongoDB
+CONSUMER_MODE = os.getenv("KAFKA_CONSUMER_MODE", "single")
+CONSUMER_BATCH_SIZE = int(os.getenv("KAFKA_CONSUMER_BATCH_SIZE", "100"))
+CONSUMER_BATCH_TIMEOUT = float(os.getenv("KAFKA_CONSUMER_BATCH_TIMEOUT", "0.5"))
+
+# Параметры пула обработчиков (режим pool)
+CONSUMER_WORKERS = int(os.getenv("KAFKA_CONSUMER_WORKERS", "8"))
+CONSUMER_WORKER_QUEUE_SIZE = int(os.getenv("KAFKA_CONSUMER_WORKER_QUEUE_SIZE", "100"))
+CONSUMER_COMMIT_INTERVAL = float(os.getenv("KAFKA_CONSUMER_COMMIT_INTERVAL", "1.0"))
+
+# Максимум одновременно обрабатываемых запросов (режим async)
+CONSUMER_ASYNC_MAX_IN_FLIGHT = int(os.getenv("KAFKA_CONSUMER_ASYNC_MAX_IN_FLIGHT", "1000"))
+# Потоки для действий без корутины-обработчика (режим async): записи и списочные чтения выполняются
+# синхронным обработчиком, и одновременно их обрабатывается не больше этого числа
+CONSUMER_ASYNC_THREADS = int(os.getenv("KAFKA_CONSUMER_ASYNC_THREADS", "32"))
+
 CONSUMER_CONFIG = {
     **KAFKA_CONFIG,
     "group.id": "event_ms",
     "auto.offset.reset": "earliest",
-    "enable.auto.commit": True,
+    "enable.auto.commit": CONSUMER_MODE == "single",
     "session.timeout.ms": 10000,
 }
 
-PRODUCER_CONFIG = {
-    **KAFKA_CONFIG,
+# Профили общего Producer: latency — ответ уходит сразу, throughput — крупные сжатые пачки,
+# balanced — короткое ожидание с дешёвым сжатием
+PRODUCER_PROFILES = {
+    "latency": {
+        "linger.ms": 0,
+        "batch.size": 16384,
+        "compression.type": "none",
+    },
+    "balanced": {
+        "linger.ms": 5,
+        "batch.size": 65536,
+        "compression.type": "lz4",
+    },
+    "throughput": {
+        "linger.ms": 50,
+        "batch.size": 1000000,
+        "compression.type": "zstd",
+    },
+}
+PRODUCER_PROFILE = os.getenv("KAFKA_PRODUCER_PROFILE", "balanced")
+
+# Отдельные параметры поверх профиля (если заданы)
+_PRODUCER_OVERRIDES = {
+    "linger.ms": ("KAFKA_LINGER_MS", int),
+    "batch.size": ("KAFKA_BATCH_SIZE", int),
+    "compression.type": ("KAFKA_COMPRESSION_TYPE", str),
 }
 
+# Как часто фоновый поток вызывает poll() для доставки callback'ов (сек)
+PRODUCER_POLL_INTERVAL = float(os.getenv("KAFKA_PRODUCER_POLL_INTERVAL", "0.1"))
+# Сколько ждать доставки оставшихся сообщений при остановке (сек)
+PRODUCER_FLUSH_TIMEOUT = float(os.getenv("KAFKA_PRODUCER_FLUSH_TIMEOUT", "10"))
+
+
+def producer_config(profile: str = PRODUCER_PROFILE, overrides: bool = True) -> dict:
+    """Конфигурация Producer по профилю; overrides — применить KAFKA_LINGER_MS и т. п. из окружения"""
+    if profile not in PRODUCER_PROFILES:
+        raise ValueError(f"Неизвестный профиль Producer: {profile} (доступны: {', '.join(PRODUCER_PROFILES)})")
+    config = {**KAFKA_CONFIG, **PRODUCER_PROFILES[profile]}
+    if overrides:
+        for option, (env, cast) in _PRODUCER_OVERRIDES.items():
+            value = os.getenv(env)
+            if value:
+                config[option] = cast(value)
+    return config
+
+
+PRODUCER_CONFIG = producer_config()
+
+# Ключ ответа: request_id — ответы равномерно расходятся по партициям топика ответов,
+# user — ответы одному пользователю (первому из forward_to) попадают в одну партицию по порядку
+RESPONSE_KEY = os.getenv("KAFKA_RESPONSE_KEY", "request_id")
+
 TOPICS = {
     "requests": REQUESTS_TOPIC,
     "responses": RESPONSES_TOPIC
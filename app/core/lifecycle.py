@@ -0,0 +1,93 @@
+import logging
+import os
+import signal
+import threading
+import time
+
+from app.core.service_config import SHUTDOWN_TIMEOUT, SHUTDOWN_FLUSH_RESERVE
+
+logger = logging.getLogger(__name__)
+
+
+class ShutdownEvent(threading.Event):
+    """Событие остановки с дедлайном: после set() на корректное завершение отводится timeout секунд"""
+
+    def __init__(self, timeout=SHUTDOWN_TIMEOUT):
+        super().__init__()
+        self.timeout = timeout
+        self._deadline = None
+
+    def set(self):
+        if self._deadline is None:
+            self._deadline = time.monotonic() + self.timeout
+        super().set()
+
+    def remaining(self, reserve=0.0):
+        """Сколько секунд осталось до дедлайна за вычетом reserve; None — остановка не запрошена"""
+        if self._deadline is None:
+            return None
+        return max(0.0, self._deadline - time.monotonic() - reserve)
+
+    def drain_timeout(self):
+        """Время на дообработку принятых сообщений: остаток за вычетом резерва на flush Producer'а"""
+        return self.remaining(reserve=min(SHUTDOWN_FLUSH_RESERVE, self.timeout / 2))
+
+
+class Lifecycle:
+    """Жизненный цикл процесса: запуск Consumer в потоке, ожидание сигнала и остановка в пределах дедлайна"""
+
+    def __init__(self, timeout=SHUTDOWN_TIMEOUT):
+        self.stop_event = ShutdownEvent(timeout)
+        self._thread = None
+        self._on_shutdown = []
+
+    def install_signal_handlers(self, signals=(signal.SIGINT, signal.SIGTERM)):
+        for signum in signals:
+            signal.signal(signum, self._handle_signal)
+
+    def _handle_signal(self, signum, frame):
+        if self.stop_event.is_set():
+            # Повторный сигнал — не ждём дедлайна
+            logger.warning("Повторный сигнал %s, принудительное завершение", signal.Signals(signum).name)
+            os._exit(1)
+        logger.info("Получен сигнал %s, остановка...", signal.Signals(signum).name)
+        self.stop_event.set()
+
+    def on_shutdown(self, fn, *args):
+        """Добавляет шаг остановки; шаги выполняются по порядку после завершения Consumer"""
+        self._on_shutdown.append((fn, args))
+
+    def start(self, target):
+        """Запускает target(stop_event) в отдельном потоке"""
+        self._thread = threading.Thread(target=self._run, args=(target,), name="consumer", daemon=True)
+        self._thread.start()
+
+    def _run(self, target):
+        try:
+            target(self.stop_event)
+        except Exception:
+            logger.exception("Consumer завершился с ошибкой")
+        finally:
+            # Consumer упал или вышел сам — процесс тоже останавливается
+            self.stop_event.set()
+
+    def wait(self):
+        """Блокируется до сигнала остановки (без активного ожидания)"""
+        self.stop_event.wait()
+
+    def shutdown(self) -> bool:
+        """Дожидается Consumer и выполняет шаги остановки. Возвращает False, если дедлайн был превышен"""
+        clean = True
+        if self._thread is not None:
+            self._thread.join(self.stop_event.remaining())
+            if self._thread.is_alive():
+                logger.warning("Consumer не завершился за %s с", self.stop_event.timeout)
+                clean = False
+
+        for fn, args in self._on_shutdown:
+            try:
+                fn(*args)
+            except Exception:
+                logger.exception("Ошибка при остановке: %s", getattr(fn, "__name__", fn))
+                clean = False
+        return clean
@@ -0,0 +1,88 @@
+import json
+import logging
+import os
+import random
+import sys
+
+from dotenv import load_dotenv
+
+from app.utils.serialization import dumps
+
+load_dotenv()
+
+# Уровень и формат логов: json — одна строка JSON на запись, text — для локальной отладки
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+
+# Доля записей о запросах, попадающих в лог: общая и по действиям ("get_event_by_id=0.01,get_upcoming_events=0.1")
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+LOG_SAMPLE_RATES = {
+    action.strip(): float(rate)
+    for action, rate in (
+        item.split("=", 1) for item in os.getenv("LOG_SAMPLE_RATES", "").split(",") if "=" in item
+    )
+}
+
+# Атрибуты LogRecord, которые не относятся к полям extra
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+
+def _extra_fields(record: logging.LogRecord) -> dict:
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRS}
+
+
+class JsonFormatter(logging.Formatter):
+    """Компактная запись в одну строку JSON; поля extra попадают в неё как есть"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(_extra_fields(record))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        try:
+            return dumps(entry).decode("utf-8")
+        except TypeError:
+            # В extra попал объект без JSON-представления — пишем его строкой, но запись не теряем
+            return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        extra = _extra_fields(record)
+        if extra:
+            line = f"{line} {dumps(extra).decode('utf-8')}"
+        return line
+
+
+class ActionSampler(logging.Filter):
+    """Пропускает лишь долю записей ниже WARNING, помеченных полем action; ошибки пишутся всегда"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        action = getattr(record, "action", None)
+        if action is None or record.levelno >= logging.WARNING:
+            return True
+        rate = LOG_SAMPLE_RATES.get(action, LOG_SAMPLE_RATE)
+        return rate >= 1.0 or random.random() < rate
+
+
+def setup_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT):
+    """Настраивает корневой логгер процесса: один обработчик в stdout"""
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+    handler.addFilter(ActionSampler())
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+
+    # Библиотечные логгеры шумят на уровне INFO
+    logging.getLogger("pymongo").setLevel(logging.WARNING)
@@ -0,0 +1,77 @@
+from dataclasses import dataclass, replace
+from typing import Callable, Optional, Tuple
+
+# Время (сек), после которого обработка действия считается медленной. В режимах single/batch/pool
+# это только порог предупреждения: синхронный обработчик не прерывается. В режиме async корутина-обработчик
+# отменяется по истечении времени, и клиент получает ответ с ошибкой timeout
+DEFAULT_ACTION_TIMEOUT = 5.0
+
+
+@dataclass(frozen=True)
+class ActionSpec:
+    """Описание действия Kafka: обработчик и его метаданные.
+
+    timeout — см. DEFAULT_ACTION_TIMEOUT; model — pydantic-модель, которой get_data проверяет data
+    до вызова обработчика."""
+    name: str
+    handler: Callable
+    write: bool = False
+    timeout: float = DEFAULT_ACTION_TIMEOUT
+    model: Optional[type] = None
+    data_required: bool = False
+    key_fields: Tuple[str, ...] = ()
+    async_handler: Optional[Callable] = None
+
+    def get_data(self, message: dict):
+        """Достаёт data из сообщения; для действий с обязательным data бросает KeyError.
+        При заданной model проверяет data моделью (pydantic.ValidationError) и возвращает её без изменений"""
+        data = message["data"] if self.data_required else message.get("data", {})
+        if self.model is not None:
+            self.model(**data)
+        return data
+
+    def ordering_key(self, data) -> Optional[str]:
+        """Ключ сущности, в пределах которой запросы обрабатываются по порядку"""
+        if not isinstance(data, dict):
+            return None
+        for field in self.key_fields:
+            value = data.get(field)
+            if value:
+                return str(value)
+        return None
+
+
+ACTIONS = {}
+
+
+def register_action(name: str, *, write: bool = False, timeout: float = DEFAULT_ACTION_TIMEOUT,
+                    model: Optional[type] = None, data_required: bool = False, key: Tuple[str, ...] = ()):
+    """Декоратор: регистрирует сервисную функцию как обработчик действия"""
+    def decorator(handler):
+        if name in ACTIONS:
+            raise ValueError(f"Действие {name} уже зарегистрировано")
+        ACTIONS[name] = ActionSpec(
+            name=name,
+            handler=handler,
+            write=write,
+            timeout=timeout,
+            model=model,
+            data_required=data_required,
+            key_fields=tuple(key),
+        )
+        return handler
+    return decorator
+
+
+def register_async_handler(name: str):
+    """Декоратор: привязывает корутину к уже зарегистрированному действию (режим async)"""
+    def decorator(handler):
+        if name not in ACTIONS:
+            raise ValueError(f"Действие {name} не зарегистрировано")
+        ACTIONS[name] = replace(ACTIONS[name], async_handler=handler)
+        return handler
+    return decorator
+
+
+def get_action(name: str) -> Optional[ActionSpec]:
+    return ACTIONS.get(name)
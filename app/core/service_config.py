@@ -0,0 +1,63 @@
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Чаты: сообщения хранятся пачками (bucket) фиксированного размера
+CHAT_BUCKET_SIZE = int(os.getenv("CHAT_BUCKET_SIZE", "100"))
+CHAT_PAGE_SIZE = int(os.getenv("CHAT_PAGE_SIZE", "50"))
+CHAT_MAX_PAGE_SIZE = int(os.getenv("CHAT_MAX_PAGE_SIZE", "200"))
+
+# Списки: размер страницы по умолчанию и максимальный
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "200"))
+
+# Кэш сериализованных мероприятий и задач (get_event_by_id, get_task_by_id)
+ENTITY_CACHE_ENABLED = os.getenv("ENTITY_CACHE_ENABLED", "true").lower() == "true"
+ENTITY_CACHE_SIZE = int(os.getenv("ENTITY_CACHE_SIZE", "10000"))
+ENTITY_CACHE_TTL = float(os.getenv("ENTITY_CACHE_TTL", "30"))
+# В режиме супервизора у каждого процесса свой кэш, а инвалидация при записи видна только процессу,
+# выполнившему запись: другие процессы отдают старый документ до истечения TTL. Поэтому там TTL
+# ограничивается этим значением (сек); 0 — кэш выключен, ответы всегда согласованы с базой
+ENTITY_CACHE_MULTIPROCESS_TTL = float(os.getenv("ENTITY_CACHE_MULTIPROCESS_TTL", "0"))
+
+# HTTP-эндпоинт /metrics в формате Prometheus
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+
+# Остановка: общий дедлайн (сек) и часть его, оставляемая на flush Producer'а и закрытие клиентов
+SHUTDOWN_TIMEOUT = float(os.getenv("SHUTDOWN_TIMEOUT", "30"))
+SHUTDOWN_FLUSH_RESERVE = float(os.getenv("SHUTDOWN_FLUSH_RESERVE", "5"))
+
+# Число процессов-обработчиков в одной группе Consumer'ов: больше 1 — режим супервизора
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", "1"))
+# Как часто супервизор пишет в лог пропускную способность процессов (сек)
+SUPERVISOR_REPORT_INTERVAL = float(os.getenv("SUPERVISOR_REPORT_INTERVAL", "30"))
+
+# Идемпотентность записи по request_id: ответы хранятся IDEMPOTENCY_TTL секунд (TTL-индекс processed_requests)
+IDEMPOTENCY_ENABLED = os.getenv("IDEMPOTENCY_ENABLED", "true").lower() == "true"
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", "86400"))
+# Аренда захвата (сек): владелец продлевает её, пока обработчик работает; просроченная аренда значит,
+# что владелец упал, и захват перехватывается. Должна быть меньше session.timeout.ms Consumer'а (10 с),
+# чтобы после ребаланса новый владелец партиции не ждал дольше, чем длится сам ребаланс
+IDEMPOTENCY_LEASE = float(os.getenv("IDEMPOTENCY_LEASE", "5"))
+# Сколько (сек) дубликат ждёт ответа живого владельца захвата, прежде чем оставить запрос ему.
+# Ждут только режимы pool и async: в single и batch поток Consumer'а один, и дубликат сразу
+# оставляется владельцу (упавшего владельца к концу ребаланса выдаёт истёкшая аренда)
+IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv("IDEMPOTENCY_WAIT_TIMEOUT", "30"))
+
+# Создание мероприятий: запись чата, события и счётчиков в одной транзакции (нужен replica set)
+EVENT_CREATE_TRANSACTION = os.getenv("EVENT_CREATE_TRANSACTION", "false").lower() == "true"
+# Максимум мероприятий в одном пакетном запросе create_event
+EVENT_CREATE_BATCH_LIMIT = int(os.getenv("EVENT_CREATE_BATCH_LIMIT", "1000"))
+
+# Каскадное удаление мероприятия: задачи и комментарии удаляются порциями по CLEANUP_BATCH_SIZE;
+# если задач больше CLEANUP_ASYNC_THRESHOLD, очистка уходит в фон (прогресс — в cleanup_jobs)
+CLEANUP_BATCH_SIZE = int(os.getenv("CLEANUP_BATCH_SIZE", "500"))
+CLEANUP_ASYNC_THRESHOLD = int(os.getenv("CLEANUP_ASYNC_THRESHOLD", "1000"))
+CLEANUP_WORKERS = int(os.getenv("CLEANUP_WORKERS", "1"))
+# Аренда задания очистки (сек): процесс продлевает её после каждой порции; задание с истёкшей арендой
+# (процесс упал) подхватывает другой процесс. Должна с запасом покрывать удаление одной порции
+CLEANUP_LEASE = float(os.getenv("CLEANUP_LEASE", "60"))
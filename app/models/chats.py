@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 
 from pydantic import BaseModel
 
@@ -11,5 +11,13 @@ class ChatMessage(BaseModel):
 
 
 class Chat(BaseModel):
-    event_id: str
-    messages: List[ChatMessage] = []
\ No newline at end of file
+    event_id: Optional[str] = None
+
+
+class ChatMessageBucket(BaseModel):
+    """Пачка сообщений чата (коллекция chat_message_buckets)"""
+    chat_id: str
+    count: int = 0
+    first_ts: Optional[datetime] = None
+    last_ts: Optional[datetime] = None
+    messages: List[ChatMessage] = []
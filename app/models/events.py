@@ -23,6 +23,7 @@ class Event(BaseModel):
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
     volunteers: List[str] = Field(default_factory=list)
+    waitlist: List[str] = Field(default_factory=list)
     report_files: Optional[List[HttpUrl]] = None
     chat_id: Optional[str] = None
     comments: Optional[List[str]] = Field(default_factory=list)
@@ -41,7 +42,6 @@ class EventUpdate(BaseModel):
     updated_by: Optional[str] = None
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
-    volunteers: Optional[List[str]] = None
     report_files: Optional[List[HttpUrl]] = None
     chat_id: Optional[str] = None
     comments: Optional[List[str]] = None
@@ -24,7 +24,10 @@ class VolunteerTask(BaseModel):
     status: str = "in_progress"
 
     attachments: List[HttpUrl] = []
+    # Принимаются при создании и сохраняются в task_comments; в задаче — счётчик и последний
     comments: List[Comment] = []
+    comments_count: int = 0
+    last_comment: Optional[Comment] = None
 
     created_by: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
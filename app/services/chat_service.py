@@ -1,35 +1,197 @@
 from datetime import datetime
 
-from bson import ObjectId
+from bson import ObjectId, errors
 
-from app.core.mongo_config import db
-from app.models.chats import Chat, ChatMessage
+from app.core.mongo_config import db, get_async_db
+from app.core.registry import register_action, register_async_handler
+from app.core.service_config import CHAT_BUCKET_SIZE, CHAT_PAGE_SIZE, CHAT_MAX_PAGE_SIZE
 
 
-def get_chat_messages_service(data: dict, action: str):
+def _parse_message_cursor(value, name):
+    if not value:
+        return None
+    try:
+        return ObjectId(value)
+    except (errors.InvalidId, TypeError):
+        raise ValueError(f"{name} должен быть _id сообщения")
+
+
+def _page_params(data: dict):
+    """Разбирает параметры страницы: chat_id, курсоры before/after и limit"""
     chat_id = data.get("chat_id")
-    if not chat_id:
-        return {"status": "error", "message": "chat_id is required", "action": action}
+    before = _parse_message_cursor(data.get("before"), "before")
+    after = _parse_message_cursor(data.get("after"), "after")
+    if before and after:
+        raise ValueError("Можно передать только один из курсоров: before или after")
 
-    chat = db.chats.find_one({"_id": ObjectId(chat_id)})
-    if not chat:
-        return {
-            "action": action,
-            "message": {
-                "status": "success",
-                "messages": []
-            }
-            }
+    limit = int(data.get("limit") or CHAT_PAGE_SIZE)
+    limit = max(1, min(limit, CHAT_MAX_PAGE_SIZE))
+    return chat_id, before, after, limit
+
+
+def bucket_query(chat_id, before=None, after=None):
+    """Фильтр и сортировка пачек, начиная с ближайшей к курсору страницы (без after — с самых новых)"""
+    if after:
+        return {"chat_id": chat_id, "last_id": {"$gt": after}}, [("first_id", 1)]
+
+    query = {"chat_id": chat_id}
+    if before:
+        query["first_id"] = {"$lt": before}
+    return query, [("last_id", -1)]
+
+
+def open_bucket_query(chat_id) -> dict:
+    """Последняя незаполненная пачка чата"""
+    return {"chat_id": chat_id, "count": {"$lt": CHAT_BUCKET_SIZE}}
+
+
+def event_by_chat_query(chat_id) -> dict:
+    return {"chat_id": chat_id}
+
+
+def query_shapes() -> list:
+    """Формы запросов чатов для проверки индексов (app.core.indexes.verify_query_shapes)"""
+    chat_id = str(ObjectId())
+    return [
+        ("event_by_chat", "events", event_by_chat_query(chat_id), None),
+        ("chat_latest_buckets", "chat_message_buckets", *bucket_query(chat_id)),
+        ("chat_older_buckets", "chat_message_buckets", *bucket_query(chat_id, before=ObjectId())),
+        ("chat_newer_buckets", "chat_message_buckets", *bucket_query(chat_id, after=ObjectId())),
+        ("chat_open_bucket", "chat_message_buckets", open_bucket_query(chat_id), None),
+    ]
+
+
+def _find_buckets(collection, chat_id, before, after, limit):
+    """Курсор по пачкам, начиная с ближайшей к курсору страницы"""
+    query, sort = bucket_query(chat_id, before, after)
+    batch = limit // CHAT_BUCKET_SIZE + 2
+    return collection.find(query, {"messages": 1, "first_id": 1, "last_id": 1}).sort(sort).batch_size(batch)
+
+
+class _PageCollector:
+    """Собирает limit + 1 ближайших к курсору сообщений из пачек.
+
+    Пачки могут пересекаться по диапазону _id: при гонке upsert'ов у чата бывает две открытые пачки,
+    а ObjectId из разных процессов не монотонны. Поэтому сообщения сливаются и сортируются по _id,
+    а чтение продолжается, пока следующая пачка может содержать сообщение ближе уже собранных.
+    """
+
+    def __init__(self, before, after, limit):
+        self.before = before
+        self.after = after
+        self.limit = limit
+        self.messages = []
+
+    def complete(self, bucket) -> bool:
+        """True, если ни в этой, ни в следующих пачках (по порядку чтения) нет сообщений для страницы"""
+        if len(self.messages) <= self.limit:
+            return False
+        boundary = self.messages[self.limit]["_id"]
+        if self.after:
+            first_id = bucket.get("first_id")
+            return first_id is not None and first_id > boundary
+        last_id = bucket.get("last_id")
+        return last_id is not None and last_id < boundary
+
+    def add(self, bucket):
+        messages = bucket.get("messages", [])
+        if self.before:
+            messages = [m for m in messages if m["_id"] < self.before]
+        elif self.after:
+            messages = [m for m in messages if m["_id"] > self.after]
+        self.messages.extend(messages)
+        self.messages.sort(key=lambda m: m["_id"], reverse=not self.after)
+
+
+def _page_response(action, collected, limit, after):
+    has_more = len(collected) > limit
+    page = collected[:limit]
+    # Страница всегда отдаётся в хронологическом порядке
+    if not after:
+        page.reverse()
 
     return {
         "action": action,
         "message": {
             "status": "success",
-            "messages": chat.get("messages", [])
+            "messages": page,
+            "has_more": has_more,
+            "next_before": str(page[0]["_id"]) if page else None,
+            "next_after": str(page[-1]["_id"]) if page else None,
+        }
+    }
+
+
+def _page_error(action, e):
+    return {
+        "action": action,
+        "message": {
+            "status": "error",
+            "details": str(e)
         }
     }
 
 
+def _page_request(data: dict, action: str):
+    """(параметры страницы, None) или (None, ответ об ошибке)"""
+    try:
+        chat_id, before, after, limit = _page_params(data)
+    except ValueError as e:
+        return None, _page_error(action, e)
+    if not chat_id:
+        return None, {"status": "error", "message": "chat_id is required", "action": action}
+    return (chat_id, before, after, limit), None
+
+
+# Синхронный и асинхронный обработчики отличаются только клиентом и циклом по курсору
+
+@register_action("get_chat_messages", key=("chat_id",))
+def get_chat_messages_service(data: dict, action: str):
+    params, error = _page_request(data, action)
+    if error:
+        return error
+
+    chat_id, before, after, limit = params
+    collector = _PageCollector(before, after, limit)
+    for bucket in _find_buckets(db.chat_message_buckets, *params):
+        if collector.complete(bucket):
+            break
+        collector.add(bucket)
+
+    return _page_response(action, collector.messages, limit, after)
+
+
+@register_async_handler("get_chat_messages")
+async def get_chat_messages_service_async(data: dict, action: str):
+    params, error = _page_request(data, action)
+    if error:
+        return error
+
+    chat_id, before, after, limit = params
+    collector = _PageCollector(before, after, limit)
+    async for bucket in _find_buckets(get_async_db().chat_message_buckets, *params):
+        if collector.complete(bucket):
+            break
+        collector.add(bucket)
+
+    return _page_response(action, collector.messages, limit, after)
+
+
+def append_chat_message(chat_id: str, message: dict):
+    """Дописывает сообщение в последнюю незаполненную пачку чата (или создаёт новую)"""
+    db.chat_message_buckets.update_one(
+        open_bucket_query(chat_id),
+        {
+            "$push": {"messages": message},
+            "$inc": {"count": 1},
+            "$min": {"first_id": message["_id"], "first_ts": message["timestamp"]},
+            "$max": {"last_id": message["_id"], "last_ts": message["timestamp"]},
+        },
+        upsert=True
+    )
+
+
+@register_action("add_chat_message", write=True, key=("chat_id",))
 def add_chat_message_service(data: dict, action: str):
     chat_id = data.get("chat_id")
     author = data.get("author")
@@ -45,24 +207,16 @@ def add_chat_message_service(data: dict, action: str):
         }
 
     new_message = {
+        "_id": ObjectId(),
         "author": author,
         "message": message,
         "timestamp": datetime.utcnow(),
     }
 
-    # Обновляем чат
-    chat = db.chats.find_one({"_id": ObjectId(chat_id)})
-    if chat:
-        db.chats.update_one(
-            {"event_id": chat_id},
-            {"$push": {"messages": new_message}}
-        )
-    else:
-        new_chat = Chat(event_id=chat_id, messages=[ChatMessage(**new_message)])
-        db.chats.insert_one(new_chat.dict())
+    append_chat_message(chat_id, new_message)
 
     try:
-        event = db.events.find_one({"chat_id": chat_id})
+        event = db.events.find_one(event_by_chat_query(chat_id), {"volunteers": 1, "created_by": 1})
     except Exception:
         return {
             "action": action,
@@ -74,7 +228,8 @@ def add_chat_message_service(data: dict, action: str):
 
     volunteers = event.get("volunteers", []) if event else []
     volunteers = [v for v in volunteers if v != author]
-    volunteers.append(event.get("created_by"))
+    if event and event.get("created_by"):
+        volunteers.append(event.get("created_by"))
 
     return {
         "action": action,
@@ -84,3 +239,23 @@ def add_chat_message_service(data: dict, action: str):
             "forward_to": volunteers
         }
     }
+
+
+def migrate_embedded_chat_messages():
+    """Переносит сообщения из старого массива chats.messages в пачки. Возвращает число перенесённых сообщений"""
+    migrated = 0
+    for chat in db.chats.find({"messages.0": {"$exists": True}}, {"messages": 1}):
+        chat_id = str(chat["_id"])
+        for message in chat["messages"]:
+            timestamp = message.get("timestamp") or datetime.utcnow()
+            # _id с временем исходного сообщения, чтобы курсоры страниц шли по хронологии
+            message_id = ObjectId(ObjectId.from_datetime(timestamp).binary[:4] + ObjectId().binary[4:])
+            append_chat_message(chat_id, {
+                "_id": message_id,
+                "author": message.get("author"),
+                "message": message.get("message"),
+                "timestamp": timestamp,
+            })
+            migrated += 1
+        db.chats.update_one({"_id": chat["_id"]}, {"$unset": {"messages": ""}})
+    return migrated
@@ -0,0 +1,251 @@
+import logging
+import os
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from bson import ObjectId, errors
+
+from app.core.mongo_config import db
+from app.core.registry import register_action
+from app.core.service_config import CLEANUP_ASYNC_THRESHOLD, CLEANUP_BATCH_SIZE, CLEANUP_LEASE, CLEANUP_WORKERS
+from app.utils.cache import task_cache
+
+logger = logging.getLogger(__name__)
+
+# Фоновые задания очистки; прерванные остановкой сервиса дочищаются при следующем запуске
+_executor = None
+_executor_lock = threading.Lock()
+_stop = threading.Event()
+# Периодический поиск заданий, брошенных упавшими процессами
+_watcher = None
+_watcher_stop = threading.Event()
+
+# Владелец аренды заданий: хост, pid и случайная часть (pid переиспользуется после перезапуска)
+OWNER = f"{socket.gethostname()}:{os.getpid()}:{ObjectId()}"
+
+
+class CleanupInterrupted(Exception):
+    """Очистка прервана остановкой сервиса или потерей аренды; задание останется в статусе running"""
+
+
+def event_id_filter(event_id: str) -> dict:
+    # event_id задач исторически хранится и строкой, и ObjectId
+    values = [event_id]
+    try:
+        values.append(ObjectId(event_id))
+    except (errors.InvalidId, TypeError):
+        pass
+    return {"event_id": {"$in": values}}
+
+
+def count_event_tasks(event_id: str) -> int:
+    return db.volunteer_tasks.count_documents(event_id_filter(event_id))
+
+
+def delete_event_tasks(event_id: str, progress=None) -> dict:
+    """Удаляет задачи мероприятия и их комментарии порциями. progress(chunk) получает счётчики каждой порции"""
+    counts = {"deleted_tasks": 0, "deleted_comments": 0}
+    query = event_id_filter(event_id)
+    while True:
+        if _stop.is_set():
+            raise CleanupInterrupted(event_id)
+
+        task_ids = [task["_id"] for task in db.volunteer_tasks.find(query, {"_id": 1}).limit(CLEANUP_BATCH_SIZE)]
+        if not task_ids:
+            break
+
+        # Сначала комментарии: при сбое между удалениями задачи остаются и будут найдены повторным проходом
+        comments = db.task_comments.delete_many({"task_id": {"$in": [str(task_id) for task_id in task_ids]}})
+        tasks = db.volunteer_tasks.delete_many({"_id": {"$in": task_ids}})
+        chunk = {"deleted_tasks": tasks.deleted_count, "deleted_comments": comments.deleted_count}
+        counts["deleted_tasks"] += chunk["deleted_tasks"]
+        counts["deleted_comments"] += chunk["deleted_comments"]
+        if progress is not None:
+            progress(chunk)
+
+    task_cache.invalidate_where(lambda task: str(task.get("event_id")) == event_id)
+    return counts
+
+
+def delete_chat(chat_id) -> dict:
+    """Удаляет чат и все пачки его сообщений"""
+    if not chat_id:
+        return {"deleted_buckets": 0, "deleted_chats": 0}
+    buckets = db.chat_message_buckets.delete_many({"chat_id": str(chat_id)})
+    try:
+        chats = db.chats.delete_one({"_id": ObjectId(chat_id)})
+        deleted_chats = chats.deleted_count
+    except (errors.InvalidId, TypeError):
+        deleted_chats = 0
+    return {"deleted_buckets": buckets.deleted_count, "deleted_chats": deleted_chats}
+
+
+def cleanup_event(event_id: str, chat_id, progress=None) -> dict:
+    """Каскадно удаляет всё, что принадлежало уже удалённому мероприятию"""
+    counts = delete_event_tasks(event_id, progress)
+    counts.update(delete_chat(chat_id))
+    return counts
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _stop.clear()
+            _executor = ThreadPoolExecutor(max_workers=CLEANUP_WORKERS, thread_name_prefix="cleanup")
+        return _executor
+
+
+def _claimable(now) -> dict:
+    """Задания, которые можно взять: новые и выполняемые процессом с истёкшей арендой"""
+    return {"$or": [
+        {"status": "pending"},
+        {"status": "running", "lease_until": {"$lt": now}},
+        # Задания, начатые до появления аренды
+        {"status": "running", "lease_until": {"$exists": False},
+         "updated_at": {"$lt": now - timedelta(seconds=CLEANUP_LEASE)}},
+    ]}
+
+
+def _run_job(job_id):
+    now = datetime.utcnow()
+    # Аренду берёт ровно один процесс: остальные, возобновляя то же задание, получат None
+    job = db.cleanup_jobs.find_one_and_update(
+        {"_id": job_id, **_claimable(now)},
+        {"$set": {"status": "running", "owner": OWNER, "lease_until": now + timedelta(seconds=CLEANUP_LEASE),
+                  "updated_at": now}}
+    )
+    if job is None:
+        return
+    owned = {"_id": job_id, "owner": OWNER}
+
+    # Прогресс копится через $inc: возобновлённое задание продолжает счёт прерванного.
+    # Каждая порция продлевает аренду; если её уже перехватили, прекращаем очистку
+    def progress(chunk):
+        now = datetime.utcnow()
+        renewed = db.cleanup_jobs.update_one(
+            owned,
+            {"$inc": chunk, "$set": {"lease_until": now + timedelta(seconds=CLEANUP_LEASE), "updated_at": now}}
+        )
+        if not renewed.matched_count:
+            raise CleanupInterrupted(job["event_id"])
+
+    try:
+        delete_event_tasks(job["event_id"], progress)
+        chat_counts = delete_chat(job.get("chat_id"))
+    except CleanupInterrupted:
+        logger.info("Очистка прервана", extra={"job_id": str(job_id)})
+        # Отпускаем аренду: задание подхватит первый процесс, который его найдёт
+        db.cleanup_jobs.update_one(owned, {"$set": {"lease_until": datetime.utcnow()}})
+        return
+    except Exception as e:
+        logger.exception("Ошибка фоновой очистки мероприятия", extra={"job_id": str(job_id)})
+        db.cleanup_jobs.update_one(
+            owned,
+            {"$set": {"status": "failed", "error": str(e), "updated_at": datetime.utcnow()}}
+        )
+        return
+
+    now = datetime.utcnow()
+    db.cleanup_jobs.update_one(
+        owned,
+        {"$set": {**chat_counts, "status": "done", "updated_at": now, "finished_at": now}}
+    )
+    logger.info("Фоновая очистка мероприятия завершена", extra={"job_id": str(job_id)})
+
+
+def start_cleanup_job(event_id: str, chat_id, total_tasks: int) -> dict:
+    """Создаёт задание очистки в cleanup_jobs и запускает его в фоне"""
+    now = datetime.utcnow()
+    job = {
+        "_id": ObjectId(),
+        "event_id": event_id,
+        "chat_id": chat_id,
+        "status": "pending",
+        "total_tasks": total_tasks,
+        "deleted_tasks": 0,
+        "deleted_comments": 0,
+        "created_at": now,
+        "updated_at": now,
+    }
+    db.cleanup_jobs.insert_one(job)
+    # Во время остановки сервиса задание только записывается: его возобновит следующий запуск
+    if not _stop.is_set():
+        _get_executor().submit(_run_job, job["_id"])
+    return job
+
+
+def _resume_claimable() -> int:
+    job_ids = [job["_id"] for job in db.cleanup_jobs.find(_claimable(datetime.utcnow()), {"_id": 1})]
+    for job_id in job_ids:
+        _get_executor().submit(_run_job, job_id)
+    if job_ids:
+        logger.info("Возобновлены задания очистки: %s", len(job_ids))
+    return len(job_ids)
+
+
+def _watch_jobs():
+    while not _watcher_stop.wait(CLEANUP_LEASE):
+        try:
+            _resume_claimable()
+        except Exception as e:
+            logger.error("Не удалось проверить задания очистки: %s", e)
+
+
+def resume_cleanup_jobs() -> int:
+    """Перезапускает незавершённые задания без живой аренды и затем периодически ищет задания,
+    брошенные упавшими процессами. Возвращает число заданий, найденных при запуске"""
+    global _watcher
+    # Сервис запущен: флаг прошлой остановки больше не прерывает очистку
+    _stop.clear()
+    resumed = _resume_claimable()
+    with _executor_lock:
+        if _watcher is None:
+            _watcher_stop.clear()
+            _watcher = threading.Thread(target=_watch_jobs, name="cleanup-watch", daemon=True)
+            _watcher.start()
+    return resumed
+
+
+def stop_cleanup_jobs():
+    """Прерывает фоновые задания между порциями; незавершённые будут возобновлены при запуске"""
+    global _executor, _watcher
+    with _executor_lock:
+        executor, _executor = _executor, None
+        watcher, _watcher = _watcher, None
+    if watcher is not None:
+        _watcher_stop.set()
+        watcher.join()
+    if executor is None:
+        return
+    _stop.set()
+    executor.shutdown(wait=True, cancel_futures=True)
+
+
+def cascade_delete(event_id: str, chat_id, background: bool = False) -> dict:
+    """Очистка после удаления мероприятия: небольшая — сразу, большая (или background) — фоновым заданием"""
+    total_tasks = count_event_tasks(event_id)
+    if background or total_tasks > CLEANUP_ASYNC_THRESHOLD:
+        job = start_cleanup_job(event_id, chat_id, total_tasks)
+        return {"job_id": str(job["_id"]), "status": job["status"], "total_tasks": total_tasks}
+    try:
+        return {"status": "done", **cleanup_event(event_id, chat_id)}
+    except Exception as e:
+        # Мероприятие уже удалено: без задания недочищенное осталось бы навсегда — доделываем в фоне
+        logger.warning("Очистка мероприятия %s не завершена, создано фоновое задание: %s", event_id, e)
+        job = start_cleanup_job(event_id, chat_id, total_tasks)
+        return {"job_id": str(job["_id"]), "status": job["status"], "total_tasks": total_tasks}
+
+
+@register_action("get_cleanup_job", data_required=True, key=("job_id",))
+def get_cleanup_job_service(data: dict, action: str):
+    try:
+        job = db.cleanup_jobs.find_one({"_id": ObjectId(data.get("job_id"))})
+    except (errors.InvalidId, TypeError):
+        return {"action": action, "message": {"status": "error", "details": "Невалидный job_id"}}
+
+    if job is None:
+        return {"action": action, "message": {"status": "error", "details": "Задание очистки не найдено"}}
+    return {"action": action, "message": {"status": "success", "job": job}}
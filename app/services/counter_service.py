@@ -0,0 +1,61 @@
+from app.core.mongo_config import db
+
+# Документ со счётчиками мероприятий по статусам (всего и по категориям)
+EVENT_COUNTERS_ID = "events"
+
+
+def counter_key(value) -> str:
+    """Имя поля для значения статуса/категории: точки и $ недопустимы в путях MongoDB"""
+    if value is None or value == "":
+        return "_none"
+    return str(value).replace(".", "_").replace("$", "_")
+
+
+def _counter_paths(status, category):
+    status_key = counter_key(status)
+    return [f"status.{status_key}", f"categories.{counter_key(category)}.{status_key}"]
+
+
+def event_counter_delta(status, category, sign: int) -> dict:
+    """$inc-изменения счётчиков для одного мероприятия (sign: +1 — добавлено, -1 — удалено)"""
+    return {path: sign for path in _counter_paths(status, category)}
+
+
+def merge_deltas(*deltas) -> dict:
+    merged = {}
+    for delta in deltas:
+        for path, value in delta.items():
+            merged[path] = merged.get(path, 0) + value
+    return {path: value for path, value in merged.items() if value}
+
+
+def apply_event_counter_delta(delta: dict, session=None) -> bool:
+    """Атомарно применяет изменения к документу счётчиков. Возвращает False, если документа ещё нет.
+
+    Документ не создаётся через upsert: частичный документ из одной дельты выглядел бы как готовый,
+    и ленту больше никогда бы не пересчитали. Без документа счётчики пересчитываются с нуля
+    (в транзакции — вызывающим после её фиксации, иначе пересчёт не увидит незафиксированные записи).
+    """
+    if not delta:
+        return True
+    result = db.event_counters.update_one({"_id": EVENT_COUNTERS_ID}, {"$inc": delta}, session=session)
+    if result.matched_count:
+        return True
+    if session is None:
+        reconcile_event_counters()
+    return False
+
+
+def reconcile_event_counters() -> dict:
+    """Пересчитывает счётчики с нуля по коллекции events и перезаписывает документ"""
+    counters = {"_id": EVENT_COUNTERS_ID, "status": {}, "categories": {}}
+    pipeline = [{"$group": {"_id": {"status": "$status", "category": "$category"}, "count": {"$sum": 1}}}]
+    for row in db.events.aggregate(pipeline):
+        status_key = counter_key(row["_id"].get("status"))
+        category_key = counter_key(row["_id"].get("category"))
+        counters["status"][status_key] = counters["status"].get(status_key, 0) + row["count"]
+        counters["categories"].setdefault(category_key, {})[status_key] = row["count"]
+
+    db.event_counters.replace_one({"_id": EVENT_COUNTERS_ID}, counters, upsert=True)
+    return counters
+
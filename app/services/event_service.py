@@ -1,96 +1,182 @@
+import logging
 from datetime import datetime
 
 from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
 
 from app.models.events import Event, EventUpdate
-from pydantic import ValidationError, HttpUrl
-from app.core.mongo_config import db
+from pydantic import ValidationError
+from app.core.mongo_config import client, db, get_async_db
+from app.core.registry import register_action, register_async_handler
+from app.services.cleanup_service import cascade_delete
+from app.services.counter_service import (
+    EVENT_COUNTERS_ID,
+    apply_event_counter_delta,
+    event_counter_delta,
+    merge_deltas,
+    counter_key,
+    reconcile_event_counters,
+)
+from app.core.service_config import EVENT_CREATE_BATCH_LIMIT, EVENT_CREATE_TRANSACTION
+from app.utils.cache import event_cache
+from app.utils.event_helper import (
+    MIN_TITLE_PREFIX_LENGTH,
+    SEARCHABLE_FIELDS,
+    SEARCH_INDEX_FIELDS,
+    SEARCH_FIELDS_PROJECTION,
+    build_search_fields,
+    search_query_tokens,
+    strip_search_fields,
+)
+from app.utils.pagination import page_limit, page_query, build_page, with_sort_fields
+from app.utils.projection import build_projection
+from app.utils.serialization import to_bson
 from bson import ObjectId, errors
 
+logger = logging.getLogger(__name__)
 
-def serialize_event(event: dict) -> dict:
-    event["_id"] = str(event["_id"])
 
-    if "created_at" in event and isinstance(event["created_at"], datetime):
-        event["created_at"] = event["created_at"].isoformat()
+# Облегчённый набор полей для карточек в списках; полный документ — fields: "all"
+EVENT_LIST_FIELDS = (
+    "title", "start_datetime", "status", "category", "location", "photo_url", "required_volunteers", "chat_id",
+)
+EVENT_LIST_COMPUTED = {"volunteers_count": {"$size": {"$ifNull": ["$volunteers", []]}}}
 
-    if "updated_at" in event and isinstance(event["updated_at"], datetime):
-        event["updated_at"] = event["updated_at"].isoformat()
 
-    if "start_datetime" in event and isinstance(event["start_datetime"], datetime):
-        event["start_datetime"] = event["start_datetime"].isoformat()
+# Списки мероприятий пользователя отдаются страницами по дате начала; _id — тай-брейкер для курсора
+EVENT_LIST_SORT = [("start_datetime", 1), ("_id", 1)]
+# Результаты поиска — по убыванию релевантности, при равной — как списки
+SEARCH_SORT = [("score", -1), *EVENT_LIST_SORT]
 
-    if "end_datetime" in event and isinstance(event.get("end_datetime"), datetime):
-        event["end_datetime"] = event["end_datetime"].isoformat()
+# Ближайшие мероприятия — по дате начала
+UPCOMING_SORT = [("start_datetime", 1)]
 
-    # Преобразуем ObjectId внутри volunteers если есть
-    if "volunteers" in event and isinstance(event["volunteers"], list):
-        event["volunteers"] = [str(v) for v in event["volunteers"]]
+# Состав участников меняется только register_volunteer/unregister_volunteer с атомарной проверкой лимита
+MEMBERSHIP_FIELDS = ("volunteers", "waitlist")
 
-    return event
 
+def event_list_projection(data: dict) -> dict:
+    """Проекция для списочных действий по параметру fields"""
+    return build_projection(data.get("fields"), EVENT_LIST_FIELDS, SEARCH_INDEX_FIELDS, EVENT_LIST_COMPUTED)
 
-def serialize_for_mongo(obj):
-    if isinstance(obj, ObjectId):
-        return str(obj)
-    elif isinstance(obj, HttpUrl):
-        return str(obj)
-    elif isinstance(obj, list):
-        return [serialize_for_mongo(item) for item in obj]
-    elif isinstance(obj, dict):
-        return {key: serialize_for_mongo(value) for key, value in obj.items()}
-    else:
-        return obj
 
+def upcoming_events_query(category: str, now: datetime) -> dict:
+    """Ближайшие активные мероприятия; category "all" — без фильтра по категории"""
+    query = {"start_datetime": {"$gt": now}, "status": "active"}
+    if category != "all":
+        query["category"] = category
+    return query
 
-def create_event_service(event_data: dict, action: str):
-    try:
-        event = Event(**event_data)
-        print(f"✅ Событие успешно создано: {event}")
 
-        event_dict = event.dict()
-        event_dict.setdefault("status", "Новое")
+def created_events_query(user_id: str) -> dict:
+    return {"created_by": user_id}
 
-        now = datetime.utcnow()
-        event_dict["created_at"] = now
-        event_dict["updated_at"] = now
-        event_dict["created_by"] = event_data.get("created_by")
-        event_dict["updated_by"] = event_data.get("created_by")
 
-        chat_data = {
-            "messages": []
-        }
-        inserted_chat = db.chats.insert_one(chat_data)
-        chat_id = str(inserted_chat.inserted_id)
+def volunteer_events_query(user_id: str) -> dict:
+    return {"volunteers": user_id}
 
-        event_dict["chat_id"] = chat_id
 
-        # Сохраняем событие
-        event_to_insert = {k: serialize_for_mongo(v) for k, v in event_dict.items()}
-        inserted_event = db.events.insert_one(event_to_insert)
-        inserted_event_id = str(inserted_event.inserted_id)
+def title_search_query(tokens: list) -> dict:
+    return {"search_title": {"$all": tokens}}
 
-        print(f"🗂️ Событие сохранено с _id: {inserted_event_id}")
 
-        db.chats.update_one(
-            {"_id": inserted_chat.inserted_id},
-            {"$set": {"event_id": inserted_event_id}}
-        )
+def search_match_query(tokens: list) -> dict:
+    return {"search_prefixes": {"$all": tokens}}
 
-        event_to_insert["_id"] = inserted_event_id
 
-        return {
-            "action": action,
-            "message": {
-                "status": "success",
-                "event": event_to_insert,
-                "only_forward": True,
-                "forward_to": "online_status"
-            }
+def query_shapes() -> list:
+    """Формы запросов мероприятий для проверки индексов (app.core.indexes.verify_query_shapes)"""
+    now = datetime.utcnow()
+    return [
+        ("upcoming_events", "events", upcoming_events_query("all", now), UPCOMING_SORT),
+        ("upcoming_events_by_category", "events", upcoming_events_query("category", now), UPCOMING_SORT),
+        ("events_by_creator", "events", created_events_query("user"), EVENT_LIST_SORT),
+        ("events_by_volunteer", "events", volunteer_events_query("user"), EVENT_LIST_SORT),
+        ("event_search", "events", search_match_query(search_query_tokens("эко парк")), None),
+        ("event_by_title", "events",
+         title_search_query(search_query_tokens("э парк", MIN_TITLE_PREFIX_LENGTH)), EVENT_LIST_SORT),
+    ]
+
+
+def _prepare_event(event_data: dict, now: datetime):
+    """Валидирует мероприятие и готовит документы события и его чата с заранее выданными _id"""
+    event = Event(**event_data)
+
+    event_dict = event.dict()
+    event_dict.setdefault("status", "Новое")
+    event_dict["created_at"] = now
+    event_dict["updated_at"] = now
+    event_dict["created_by"] = event_data.get("created_by")
+    event_dict["updated_by"] = event_data.get("created_by")
+
+    # _id выдаются на клиенте: событие и чат записываются уже со ссылками друг на друга
+    event_id = ObjectId()
+    chat_id = ObjectId()
+    event_dict["chat_id"] = str(chat_id)
+
+    event_to_insert = to_bson(event_dict)
+    event_to_insert["_id"] = event_id
+    event_to_insert.update(build_search_fields(event_to_insert))
+    # Сообщения чата хранятся отдельно, в коллекции chat_message_buckets
+    chat_to_insert = {"_id": chat_id, "event_id": str(event_id)}
+    return event_to_insert, chat_to_insert
+
+
+def _insert_events(events: list, chats: list):
+    """Записывает чаты, события и счётчики: в транзакции (EVENT_CREATE_TRANSACTION) или по порядку.
+
+    Без транзакции чаты пишутся первыми: при сбое между вставками может остаться чат без события,
+    но не событие со ссылкой на несуществующий чат.
+    """
+    delta = merge_deltas(*(
+        event_counter_delta(event.get("status"), event.get("category"), 1) for event in events
+    ))
+
+    def write(session=None):
+        db.chats.insert_many(chats, ordered=True, session=session)
+        db.events.insert_many(events, ordered=True, session=session)
+        return apply_event_counter_delta(delta, session=session)
+
+    if EVENT_CREATE_TRANSACTION:
+        with client.start_session() as session:
+            counted = session.with_transaction(write)
+        if not counted:
+            reconcile_event_counters()
+    else:
+        write()
+
+
+def _create_events_response(action: str, key: str, payload):
+    return {
+        "action": action,
+        "message": {
+            "status": "success",
+            key: payload,
+            "only_forward": True,
+            "forward_to": "online_status"
         }
+    }
+
+
+# Модель в реестре не задаётся: пакет {"events": [...]} проверяется поштучно с ошибками по индексам
+@register_action("create_event", write=True, data_required=True)
+def create_event_service(event_data: dict, action: str):
+    # Пакетное создание (импорт): {"events": [{...}, {...}]} — все мероприятия или ни одного
+    if isinstance(event_data.get("events"), list):
+        return create_events_batch(event_data["events"], action)
+
+    try:
+        event_to_insert, chat_to_insert = _prepare_event(event_data, datetime.utcnow())
+        logger.debug("Событие успешно создано: %s", event_to_insert)
+
+        _insert_events([event_to_insert], [chat_to_insert])
+        logger.info("Событие сохранено с _id: %s", event_to_insert["_id"])
+
+        event_to_insert["_id"] = str(event_to_insert["_id"])
+        return _create_events_response(action, "event", strip_search_fields(event_to_insert))
 
     except ValidationError as e:
-        print(f"❌ Ошибка валидации события: {e}")
+        logger.error("Ошибка валидации события: %s", e)
         return {
             "action": action,
             "message": {
@@ -100,12 +186,55 @@ def create_event_service(event_data: dict, action: str):
         }
 
 
+def create_events_batch(events_data: list, action: str):
+    """Создаёт пачку мероприятий одними insert_many и одним $inc счётчиков"""
+    if not events_data:
+        return {"action": action, "message": {"status": "error", "details": "Пустой список events"}}
+    if len(events_data) > EVENT_CREATE_BATCH_LIMIT:
+        return {
+            "action": action,
+            "message": {"status": "error", "details": f"Не больше {EVENT_CREATE_BATCH_LIMIT} мероприятий за запрос"}
+        }
+
+    now = datetime.utcnow()
+    events, chats, errors_by_index = [], [], []
+    for index, data in enumerate(events_data):
+        try:
+            if not isinstance(data, dict):
+                raise TypeError("ожидался объект мероприятия")
+            event_to_insert, chat_to_insert = _prepare_event(data, now)
+        except (ValidationError, TypeError) as e:
+            errors_by_index.append({"index": index, "details": str(e)})
+            continue
+        events.append(event_to_insert)
+        chats.append(chat_to_insert)
+
+    # Ошибка в одном мероприятии отклоняет весь запрос: импорт повторяется целиком после исправления
+    if errors_by_index:
+        logger.error("Ошибка валидации пакета мероприятий: %s из %s", len(errors_by_index), len(events_data))
+        return {"action": action, "message": {"status": "error", "details": errors_by_index}}
+
+    _insert_events(events, chats)
+    logger.info("Сохранено мероприятий: %s", len(events))
+
+    for event in events:
+        event["_id"] = str(event["_id"])
+    return _create_events_response(action, "events", [strip_search_fields(event) for event in events])
+
+
+@register_action("update_event", write=True, model=EventUpdate, data_required=True, key=("_id",))
 def update_event_service(event_data: dict, action: str):
     try:
         event_id = event_data.get("_id")
         if not event_id:
             raise ValueError("Не указан _id события для обновления")
 
+        membership = [field for field in MEMBERSHIP_FIELDS if field in event_data]
+        if membership:
+            raise ValueError(
+                f"Поля {', '.join(membership)} меняются только через register_volunteer/unregister_volunteer"
+            )
+
         update_fields = {k: v for k, v in event_data.items() if k != "_id"}
         update_model = EventUpdate(**update_fields)
         update_dict = update_model.dict(exclude_unset=True)
@@ -113,33 +242,63 @@ def update_event_service(event_data: dict, action: str):
         update_dict["updated_at"] = datetime.utcnow()
 
         # Сериализация всех значений в подходящий вид
-        update_serialized = {k: serialize_for_mongo(v) for k, v in update_dict.items()}
-
-        result = db.events.update_one(
+        update_serialized = to_bson(update_dict)
+
+        # Новый лимит мест: перевод из листа ожидания — в том же атомарном обновлении, что и $set
+        if "required_volunteers" in update_serialized:
+            update = [
+                {"$set": {field: {"$literal": value} for field, value in update_serialized.items()}},
+                _promotion_stage(),
+            ]
+        else:
+            update = {"$set": update_serialized}
+
+        # Прежняя версия документа нужна для счётчиков статусов; новая получается наложением $set
+        before = db.events.find_one_and_update(
             {"_id": ObjectId(event_id)},
-            {"$set": update_serialized}
+            update,
+            return_document=ReturnDocument.BEFORE
         )
 
-        if result.matched_count == 0:
+        if before is None:
             raise ValueError(f"Событие с _id {event_id} не найдено")
 
-        update_serialized["_id"] = event_id
-        updated_event = db.events.find_one({"_id": ObjectId(event_id)})
+        event_cache.invalidate(event_id)
+        updated_event = {**before, **update_serialized}
+
+        promoted_user_ids = []
+        if "required_volunteers" in update_serialized:
+            updated_event.update(_promote(before, update_serialized["required_volunteers"]))
+            promoted_user_ids = updated_event["volunteers"][len(before.get("volunteers", [])):]
+            if promoted_user_ids:
+                logger.info("Пользователи %s переведены из листа ожидания события %s", promoted_user_ids, event_id)
+
+        # Текстовые поля изменились — пересобираем поисковые токены
+        if any(field in update_serialized for field in SEARCHABLE_FIELDS):
+            db.events.update_one({"_id": ObjectId(event_id)}, {"$set": build_search_fields(updated_event)})
+        strip_search_fields(updated_event)
 
-        print(f"🔄 Событие {event_id} успешно обновлено")
+        if "status" in update_serialized or "category" in update_serialized:
+            apply_event_counter_delta(merge_deltas(
+                event_counter_delta(before.get("status"), before.get("category"), -1),
+                event_counter_delta(updated_event.get("status"), updated_event.get("category"), 1),
+            ))
+
+        logger.info("Событие %s успешно обновлено", event_id)
 
         return {
             "action": action,
             "message": {
                 "status": "success",
                 "event": updated_event,
+                "promoted_user_ids": promoted_user_ids,
                 "only_forward": True,
                 "forward_to": "online_status"
             }
         }
 
     except (ValidationError, ValueError) as e:
-        print(f"❌ Ошибка при обновлении события: {e}")
+        logger.error("Ошибка при обновлении события: %s", e)
         return {
             "action": action,
             "message": {
@@ -149,20 +308,32 @@ def update_event_service(event_data: dict, action: str):
         }
 
 
+@register_action("delete_event", write=True, data_required=True, key=("_id",))
 def delete_event_service(event_data: dict, action: str):
     try:
         event_id = event_data.get("_id")
         if not event_id:
             raise ValueError("Не указан _id события для удаления")
 
-        event = db.events.find_one({"_id": ObjectId(event_id)})
-        forward_to = event.get("volunteers", [])
-        result = db.events.delete_one({"_id": ObjectId(event_id)})
+        event = db.events.find_one_and_delete(
+            {"_id": ObjectId(event_id)},
+            projection={"status": 1, "category": 1, "chat_id": 1}
+        )
 
-        if result.deleted_count == 0:
+        if event is None:
             raise ValueError(f"Событие с _id {event_id} не найдено")
 
-        print(f"🗑️ Событие {event_id} успешно удалено")
+        event_cache.invalidate(event_id)
+        apply_event_counter_delta(event_counter_delta(event.get("status"), event.get("category"), -1))
+        logger.info("Событие %s успешно удалено", event_id)
+
+        # Чат, его сообщения, задачи и их комментарии удаляются каскадом; большие объёмы — в фоне
+        try:
+            cleanup = cascade_delete(event_id, event.get("chat_id"), bool(event_data.get("background")))
+        except Exception as e:
+            # Само мероприятие уже удалено — сообщаем об ошибке очистки, но не о неудаче удаления
+            logger.error("Ошибка каскадной очистки мероприятия %s: %s", event_id, e)
+            cleanup = {"status": "failed", "details": str(e)}
 
         return {
             "action": action,
@@ -170,12 +341,13 @@ def delete_event_service(event_data: dict, action: str):
                 "status": "success",
                 "only_forward": True,
                 "forward_to": "online_status",
-                "_id": event_id
+                "_id": event_id,
+                "cleanup": cleanup
             }
         }
 
     except ValueError as e:
-        print(f"❌ Ошибка при удалении события: {e}")
+        logger.error("Ошибка при удалении события: %s", e)
         return {
             "action": action,
             "message": {
@@ -185,6 +357,80 @@ def delete_event_service(event_data: dict, action: str):
         }
 
 
+def _registration_pipeline(user_id: str, now: datetime) -> list:
+    """Pipeline-обновление: записывает пользователя, если есть место, иначе ставит в лист ожидания"""
+    user = {"$literal": user_id}
+    volunteers = {"$ifNull": ["$volunteers", []]}
+    waitlist = {"$ifNull": ["$waitlist", []]}
+    is_member = {"$or": [{"$in": [user, volunteers]}, {"$in": [user, waitlist]}]}
+    has_slot = {"$lt": [{"$size": volunteers}, {"$ifNull": ["$required_volunteers", 0]}]}
+
+    return [{
+        "$set": {
+            "volunteers": {
+                "$cond": [{"$or": [is_member, {"$not": [has_slot]}]}, volunteers, {"$concatArrays": [volunteers, [user]]}]
+            },
+            "waitlist": {
+                "$cond": [{"$or": [is_member, has_slot]}, waitlist, {"$concatArrays": [waitlist, [user]]}]
+            },
+            "updated_at": {"$cond": [is_member, "$updated_at", now]},
+        }
+    }]
+
+
+def _unregistration_pipeline(user_id: str, now: datetime) -> list:
+    """Pipeline-обновление: удаляет пользователя и переводит первого из листа ожидания на освободившееся место"""
+    user = {"$literal": user_id}
+    volunteers = {"$ifNull": ["$volunteers", []]}
+    waitlist = {"$ifNull": ["$waitlist", []]}
+    remaining = {"$filter": {"input": volunteers, "cond": {"$ne": ["$$this", user]}}}
+    queue = {"$filter": {"input": waitlist, "cond": {"$ne": ["$$this", user]}}}
+    was_member = {"$or": [{"$in": [user, volunteers]}, {"$in": [user, waitlist]}]}
+    promote = {
+        "$and": [
+            {"$in": [user, volunteers]},
+            {"$gt": [{"$size": queue}, 0]},
+            {"$lt": [{"$size": remaining}, {"$ifNull": ["$required_volunteers", 0]}]},
+        ]
+    }
+
+    return [{
+        "$set": {
+            "volunteers": {"$cond": [promote, {"$concatArrays": [remaining, {"$slice": [queue, 1]}]}, remaining]},
+            "waitlist": {"$cond": [promote, {"$slice": [queue, 1, {"$max": [{"$size": queue}, 1]}]}, queue]},
+            "updated_at": {"$cond": [was_member, now, "$updated_at"]},
+        }
+    }]
+
+
+def _promotion_stage() -> dict:
+    """Стадия pipeline-обновления: свободные места занимают первые пользователи из листа ожидания"""
+    volunteers = {"$ifNull": ["$volunteers", []]}
+    waitlist = {"$ifNull": ["$waitlist", []]}
+    free = {"$max": [{"$subtract": [{"$ifNull": ["$required_volunteers", 0]}, {"$size": volunteers}]}, 0]}
+
+    return {
+        "$set": {
+            "volunteers": {"$let": {"vars": {"free": free}, "in": {
+                "$cond": [{"$gt": ["$$free", 0]}, {"$concatArrays": [volunteers, {"$slice": [waitlist, "$$free"]}]},
+                          volunteers]
+            }}},
+            "waitlist": {"$let": {"vars": {"free": free}, "in": {
+                "$slice": [waitlist, {"$min": ["$$free", {"$size": waitlist}]}, {"$max": [{"$size": waitlist}, 1]}]
+            }}},
+        }
+    }
+
+
+def _promote(event: dict, required_volunteers: int) -> dict:
+    """То же, что _promotion_stage, для документа до обновления: volunteers и waitlist после него"""
+    volunteers = list(event.get("volunteers", []))
+    waitlist = list(event.get("waitlist", []))
+    free = max((required_volunteers or 0) - len(volunteers), 0)
+    return {"volunteers": volunteers + waitlist[:free], "waitlist": waitlist[free:]}
+
+
+@register_action("register_volunteer", write=True, data_required=True, key=("_id",))
 def register_volunteer_service(event_data: dict, action: str):
     try:
         event_id = event_data.get("_id")
@@ -198,12 +444,20 @@ def register_volunteer_service(event_data: dict, action: str):
         except (errors.InvalidId, TypeError):
             raise ValueError(f"_id '{event_id}' — невалидный ObjectId")
 
-        event = db.events.find_one({"_id": event_oid})
-        if not event:
+        # Проверка лимита и запись выполняются атомарно на сервере одним запросом;
+        # по состоянию до обновления определяем, что именно произошло
+        before = db.events.find_one_and_update(
+            {"_id": event_oid},
+            _registration_pipeline(user_id, datetime.utcnow()),
+            projection={"volunteers": 1, "waitlist": 1, "required_volunteers": 1},
+            return_document=ReturnDocument.BEFORE
+        )
+        if not before:
             raise ValueError(f"Событие с _id {event_id} не найдено")
 
-        volunteers = event.get("volunteers", [])
-        max_volunteers = event.get("required_volunteers", 0)
+        event_cache.invalidate(event_id)
+        volunteers = before.get("volunteers", [])
+        waitlist = before.get("waitlist", [])
 
         # Уже записан?
         if user_id in volunteers:
@@ -215,29 +469,32 @@ def register_volunteer_service(event_data: dict, action: str):
                 }
             }
 
-        # Достигнут лимит?
-        if len(volunteers) >= max_volunteers:
+        if user_id in waitlist:
             return {
                 "action": action,
                 "message": {
                     "status": "error",
-                    "details": "Достигнут лимит волонтёров для мероприятия"
+                    "details": "Пользователь уже в листе ожидания мероприятия"
                 }
             }
 
-        # Обновляем
-        result = db.events.update_one(
-            {"_id": event_oid},
-            {
-                "$addToSet": {"volunteers": user_id},
-                "$set": {"updated_at": datetime.utcnow()}
+        # Мест не было — пользователь поставлен в лист ожидания
+        if len(volunteers) >= before.get("required_volunteers", 0):
+            logger.info("Пользователь %s поставлен в лист ожидания события %s", user_id, event_id)
+            return {
+                "action": action,
+                "message": {
+                    "status": "success",
+                    "_id": event_id,
+                    "user_id": user_id,
+                    "registration_status": "waitlisted",
+                    "waitlist_position": len(waitlist) + 1,
+                    "only_forward": True,
+                    "forward_to": "online_status"
+                }
             }
-        )
 
-        if result.modified_count == 0:
-            raise ValueError("Ошибка при добавлении волонтёра")
-
-        print(f"🤝 Пользователь {user_id} записан на событие {event_id}")
+        logger.info("Пользователь %s записан на событие %s", user_id, event_id)
 
         return {
             "action": action,
@@ -245,13 +502,14 @@ def register_volunteer_service(event_data: dict, action: str):
                 "status": "success",
                 "_id": event_id,
                 "user_id": user_id,
+                "registration_status": "registered",
                 "only_forward": True,
                 "forward_to": "online_status"
             }
         }
 
     except ValueError as e:
-        print(f"❌ Ошибка записи волонтёра: {e}")
+        logger.error("Ошибка записи волонтёра: %s", e)
         return {
             "action": action,
             "message": {
@@ -261,6 +519,7 @@ def register_volunteer_service(event_data: dict, action: str):
         }
 
 
+@register_action("unregister_volunteer", write=True, data_required=True, key=("_id",))
 def unregister_volunteer_service(event_data: dict, action: str):
     try:
         event_id = event_data.get("_id")
@@ -274,11 +533,21 @@ def unregister_volunteer_service(event_data: dict, action: str):
         except (errors.InvalidId, TypeError):
             raise ValueError(f"_id '{event_id}' — невалидный ObjectId")
 
-        event = db.events.find_one({"_id": event_oid})
-        if not event:
+        # Удаление и перевод из листа ожидания — одно атомарное обновление
+        before = db.events.find_one_and_update(
+            {"_id": event_oid},
+            _unregistration_pipeline(user_id, datetime.utcnow()),
+            projection={"volunteers": 1, "waitlist": 1, "required_volunteers": 1},
+            return_document=ReturnDocument.BEFORE
+        )
+        if not before:
             raise ValueError(f"Событие с _id {event_id} не найдено")
 
-        if user_id not in event.get("volunteers", []):
+        event_cache.invalidate(event_id)
+        volunteers = before.get("volunteers", [])
+        waitlist = before.get("waitlist", [])
+
+        if user_id not in volunteers and user_id not in waitlist:
             return {
                 "action": action,
                 "message": {
@@ -287,18 +556,14 @@ def unregister_volunteer_service(event_data: dict, action: str):
                 }
             }
 
-        result = db.events.update_one(
-            {"_id": event_oid},
-            {
-                "$pull": {"volunteers": user_id},
-                "$set": {"updated_at": datetime.utcnow()}
-            }
-        )
-
-        if result.modified_count == 0:
-            raise ValueError("Ошибка при удалении волонтёра")
+        promoted_user_id = None
+        if user_id in volunteers:
+            queue = [u for u in waitlist if u != user_id]
+            if queue and len(volunteers) - 1 < before.get("required_volunteers", 0):
+                promoted_user_id = queue[0]
+                logger.info("Пользователь %s переведён из листа ожидания события %s", promoted_user_id, event_id)
 
-        print(f"🚫 Пользователь {user_id} удалён из события {event_id}")
+        logger.info("Пользователь %s удалён из события %s", user_id, event_id)
 
         return {
             "action": action,
@@ -306,13 +571,14 @@ def unregister_volunteer_service(event_data: dict, action: str):
                 "status": "success",
                 "_id": event_id,
                 "user_id": user_id,
+                "promoted_user_id": promoted_user_id,
                 "only_forward": True,
                 "forward_to": "online_status"
             }
         }
 
     except ValueError as e:
-        print(f"❌ Ошибка при удалении волонтёра: {e}")
+        logger.error("Ошибка при удалении волонтёра: %s", e)
         return {
             "action": action,
             "message": {
@@ -322,60 +588,57 @@ def unregister_volunteer_service(event_data: dict, action: str):
         }
 
 
+@register_action("get_upcoming_events")
 def get_upcoming_events_service(event_data: dict, action: str):
     try:
-        limit = event_data.get("limit", 10)
+        # Лимит ограничен MAX_PAGE_SIZE: весь $lookup возвращается одним документом (лимит BSON 16 МБ)
+        limit = page_limit(event_data, default=10)
         category = event_data.get("category", "all")
         now = datetime.utcnow()
 
         # Запрос на получение ближайших активных мероприятий
-        query = {
-            "start_datetime": {"$gt": now},
-            "status": "active"
+        query = upcoming_events_query(category, now)
+
+        # Один запрос: документ счётчиков и через $lookup — страница ближайших мероприятий
+        pipeline = [
+            {"$match": {"_id": EVENT_COUNTERS_ID}},
+            {"$lookup": {
+                "from": "events",
+                "pipeline": [
+                    {"$match": query},
+                    {"$sort": dict(UPCOMING_SORT)},
+                    {"$limit": limit},
+                    {"$project": event_list_projection(event_data)},
+                ],
+                "as": "events"
+            }},
+        ]
+
+        counters = next(db.event_counters.aggregate(pipeline), None)
+        if counters is None:
+            # Счётчиков ещё нет — строим их и повторяем запрос
+            reconcile_event_counters()
+            counters = next(db.event_counters.aggregate(pipeline))
+
+        events = counters["events"]
+        status_counts = counters.get("status", {})
+
+        message = {
+            "status": "success",
+            "events": events,
+            "completed_events_count": status_counts.get("completed", 0),
+            "total_active_events_count": status_counts.get("active", 0)
         }
-
         if category != "all":
-            query["category"] = category
-
-        events_cursor = (
-            db.events
-            .find(query)
-            .sort("start_datetime", 1)
-            .limit(limit)
-        )
-
-        events = []
-        for event in events_cursor:
-            event["_id"] = str(event["_id"])
-            if "created_at" in event:
-                event["created_at"] = event["created_at"].isoformat()
-            if "updated_at" in event:
-                event["updated_at"] = event["updated_at"].isoformat()
-            if "start_datetime" in event:
-                event["start_datetime"] = event["start_datetime"].isoformat()
-            events.append(event)
-
-        # Подсчёт завершённых мероприятий
-        completed_query = {"status": "completed"}
-
-        completed_count = db.events.count_documents(completed_query)
-
-        active_query = {"status": "active"}
-
-        active_count = db.events.count_documents(active_query)
+            message["category_counts"] = counters.get("categories", {}).get(counter_key(category), {})
 
         return {
             "action": action,
-            "message": {
-                "status": "success",
-                "events": events,
-                "completed_events_count": completed_count,
-                "total_active_events_count": active_count
-            }
+            "message": message
         }
 
     except Exception as e:
-        print(f"Ошибка при получении ближайших событий: {e}")
+        logger.error("Ошибка при получении ближайших событий: %s", e)
         return {
             "action": action,
             "message": {
@@ -385,62 +648,85 @@ def get_upcoming_events_service(event_data: dict, action: str):
         }
 
 
-def get_event_by_id_service(data: dict, action: str) -> dict:
-    event_id = data.get("_id")
+# Синхронный и асинхронный обработчики отличаются только клиентом: запрос и ответ общие
+
+def _find_event_by_id(collection, event_id):
+    return collection.find_one({"_id": ObjectId(event_id)}, SEARCH_FIELDS_PROJECTION)
+
+
+def _event_by_id_response(action: str, event_id, event) -> dict:
     if not event_id:
         return {"status": "error", "message": "ID мероприятия не передан"}
-
-    event = db.events.find_one({"_id": ObjectId(event_id)})
     if not event:
         return {"status": "error", "message": "Мероприятие не найдено"}
-
-    serialized_event = serialize_event(event)
-
     return {
         "status": "success",
         "action": action,
-        "event": serialized_event
+        "event": dict(event)
     }
 
 
-def convert_datetime_fields(event: dict):
-    for field in ["start_datetime", "created_at", "updated_at"]:
-        if field in event and isinstance(event[field], datetime):
-            event[field] = event[field].isoformat()
-    return event
+@register_action("get_event_by_id", key=("_id",))
+def get_event_by_id_service(data: dict, action: str) -> dict:
+    event_id = data.get("_id")
+    event = event_id and event_cache.read_through(event_id, lambda: _find_event_by_id(db.events, event_id))
+    return _event_by_id_response(action, event_id, event)
+
+
+@register_async_handler("get_event_by_id")
+async def get_event_by_id_service_async(data: dict, action: str) -> dict:
+    event_id = data.get("_id")
+    event = event_id and await event_cache.read_through_async(
+        event_id, lambda: _find_event_by_id(get_async_db().events, event_id)
+    )
+    return _event_by_id_response(action, event_id, event)
 
 
+@register_action("get_user_events")
 def get_user_events_service(event_data: dict, action: str):
     try:
         user_id = event_data.get("user_id")
         if not user_id:
             raise ValueError("Не передан user_id")
 
-        # Мероприятия, созданные пользователем
-        created_cursor = db.events.find({"created_by": user_id})
-        created_events = []
-        for event in created_cursor:
-            event["_id"] = str(event["_id"])
-            created_events.append(convert_datetime_fields(event))
-
-        # Мероприятия, где он волонтер
-        volunteer_cursor = db.events.find({"volunteers": user_id})
-        volunteer_events = []
-        for event in volunteer_cursor:
-            event["_id"] = str(event["_id"])
-            volunteer_events.append(convert_datetime_fields(event))
+        # У каждой из двух выборок свой курсор: created_cursor и volunteer_cursor
+        limit = page_limit(event_data)
+        created_query = page_query(created_events_query(user_id), EVENT_LIST_SORT, event_data.get("created_cursor"))
+        volunteer_query = page_query(volunteer_events_query(user_id), EVENT_LIST_SORT, event_data.get("volunteer_cursor"))
+        output = [
+            {"$limit": limit + 1},
+            {"$project": with_sort_fields(event_list_projection(event_data), EVENT_LIST_SORT)},
+        ]
+
+        # Один проход: общий $match по индексам created_by/volunteers, затем $facet на две выборки
+        pipeline = [
+            {"$match": {"$or": [created_query, volunteer_query]}},
+            {"$sort": dict(EVENT_LIST_SORT)},
+            {"$facet": {
+                # Мероприятия, созданные пользователем
+                "created_events": [{"$match": created_query}, *output],
+                # Мероприятия, где он волонтер
+                "volunteer_events": [{"$match": volunteer_query}, *output],
+            }},
+        ]
+        result = next(db.events.aggregate(pipeline), {})
+
+        created_events, next_created_cursor = build_page(result.get("created_events", []), EVENT_LIST_SORT, limit)
+        volunteer_events, next_volunteer_cursor = build_page(result.get("volunteer_events", []), EVENT_LIST_SORT, limit)
 
         return {
             "action": action,
             "message": {
                 "status": "success",
                 "created_events": created_events,
-                "volunteer_events": volunteer_events
+                "volunteer_events": volunteer_events,
+                "next_created_cursor": next_created_cursor,
+                "next_volunteer_cursor": next_volunteer_cursor
             }
         }
 
     except Exception as e:
-        print(f"❌ Ошибка при получении событий пользователя: {e}")
+        logger.error("Ошибка при получении событий пользователя: %s", e)
         return {
             "action": action,
             "message": {
@@ -450,29 +736,35 @@ def get_user_events_service(event_data: dict, action: str):
         }
 
 
+@register_action("get_event_by_title")
 def get_event_by_title_service(data: dict, action: str) -> dict:
     try:
         title = data.get("title")
         if not title:
             raise ValueError("Не передано название мероприятия (title)")
 
-        events_cursor = db.events.find({"title": {"$regex": title, "$options": "i"}})
+        # Только по словам названия: каждое слово запроса — префикс слова названия (индекс search_title)
+        tokens = search_query_tokens(title, MIN_TITLE_PREFIX_LENGTH)
+        if not tokens:
+            return {"action": action, "message": {"status": "success", "events": [], "next_cursor": None}}
 
-        events = []
-        for event in events_cursor:
-            serialized = serialize_event(event)
-            events.append(serialized)
+        limit = page_limit(data)
+        query = page_query(title_search_query(tokens), EVENT_LIST_SORT, data.get("cursor"))
+        projection = with_sort_fields(event_list_projection(data), EVENT_LIST_SORT)
+        docs = list(db.events.find(query, projection).sort(EVENT_LIST_SORT).limit(limit + 1))
+        events, next_cursor = build_page(docs, EVENT_LIST_SORT, limit)
 
         return {
             "action": action,
             "message": {
                 "status": "success",
-                "events": events
+                "events": events,
+                "next_cursor": next_cursor
             }
         }
 
     except Exception as e:
-        print(f"❌ Ошибка при поиске события по title: {e}")
+        logger.error("Ошибка при поиске события по title: %s", e)
         return {
             "action": action,
             "message": {
@@ -482,24 +774,72 @@ def get_event_by_title_service(data: dict, action: str) -> dict:
         }
 
 
-def get_user_volunteer_count_service(event_data: dict, action: str):
+def search_events(query: str, filters: dict, limit: int, cursor, projection: dict):
+    """Ищет мероприятия по префиксам слов во всех SEARCHABLE_FIELDS с ранжированием.
+    Возвращает (events, next_cursor); next_cursor None — результатов больше нет"""
+    tokens = search_query_tokens(query)
+    if not tokens:
+        return [], None
+
+    projection = with_sort_fields(projection, SEARCH_SORT)
+
+    title_matches = {"$size": {"$setIntersection": [tokens, {"$ifNull": ["$search_title", []]}]}}
+    word_matches = {"$size": {"$setIntersection": [tokens, {"$ifNull": ["$search_tokens", []]}]}}
+
+    pipeline = [
+        {"$match": {**search_match_query(tokens), **filters}},
+        # Совпадения в названии весят больше, целые слова — больше префиксов
+        {"$set": {"score": {"$add": [{"$multiply": [3, title_matches]}, word_matches]}}},
+        # Курсор — по вычисленному score: условие keyset-пагинации применяется после $set
+        {"$match": page_query({}, SEARCH_SORT, cursor)},
+        {"$sort": dict(SEARCH_SORT)},
+        {"$limit": limit + 1},
+        {"$project": projection},
+    ]
+    return build_page(list(db.events.aggregate(pipeline)), SEARCH_SORT, limit)
+
+
+def _search_filters(data: dict) -> dict:
+    filters = {}
+    if data.get("category") and data["category"] != "all":
+        filters["category"] = data["category"]
+    if data.get("status"):
+        filters["status"] = data["status"]
+
+    date_range = {}
+    if data.get("date_from"):
+        date_range["$gte"] = datetime.fromisoformat(data["date_from"])
+    if data.get("date_to"):
+        date_range["$lte"] = datetime.fromisoformat(data["date_to"])
+    if date_range:
+        filters["start_datetime"] = date_range
+    return filters
+
+
+@register_action("search_events")
+def search_events_service(data: dict, action: str) -> dict:
     try:
-        user_id = event_data.get("user_id")
-        if not user_id:
-            raise ValueError("Не передан user_id")
+        query = data.get("query")
+        if not query:
+            raise ValueError("Не передан поисковый запрос (query)")
 
-        count = db.events.count_documents({"volunteers": user_id})
+        limit = page_limit(data)
+        events, next_cursor = search_events(
+            query, _search_filters(data), limit, data.get("cursor"), event_list_projection(data)
+        )
 
         return {
             "action": action,
-            "status": "success",
-            "data": {
-                "volunteer_count": count
+            "message": {
+                "status": "success",
+                "events": events,
+                "has_more": next_cursor is not None,
+                "next_cursor": next_cursor
             }
         }
 
     except Exception as e:
-        print(f"❌ Ошибка при получении количества волонтёрских событий: {e}")
+        logger.error("Ошибка при поиске мероприятий: %s", e)
         return {
             "action": action,
             "message": {
@@ -509,32 +849,92 @@ def get_user_volunteer_count_service(event_data: dict, action: str):
         }
 
 
+def reindex_search_fields(batch_size: int = 500) -> int:
+    """Пересобирает поисковые токены у всех мероприятий. Возвращает число обновлённых документов"""
+    projection = {field: 1 for field in SEARCHABLE_FIELDS}
+    requests = []
+    updated = 0
+    for event in db.events.find({}, projection):
+        requests.append(UpdateOne({"_id": event["_id"]}, {"$set": build_search_fields(event)}))
+        if len(requests) >= batch_size:
+            updated += db.events.bulk_write(requests, ordered=False).modified_count
+            requests = []
+    if requests:
+        updated += db.events.bulk_write(requests, ordered=False).modified_count
+    return updated
+
+
+def _volunteer_count_query(event_data: dict) -> dict:
+    user_id = event_data.get("user_id")
+    if not user_id:
+        raise ValueError("Не передан user_id")
+    return volunteer_events_query(user_id)
+
+
+def _volunteer_count_response(action: str, count: int) -> dict:
+    return {
+        "action": action,
+        "status": "success",
+        "data": {
+            "volunteer_count": count
+        }
+    }
+
+
+def _volunteer_count_error(action: str, e: Exception) -> dict:
+    logger.error("Ошибка при получении количества волонтёрских событий: %s", e)
+    return {
+        "action": action,
+        "message": {
+            "status": "error",
+            "details": str(e)
+        }
+    }
+
+
+@register_action("get_user_volunteer_count")
+def get_user_volunteer_count_service(event_data: dict, action: str):
+    try:
+        return _volunteer_count_response(action, db.events.count_documents(_volunteer_count_query(event_data)))
+    except Exception as e:
+        return _volunteer_count_error(action, e)
+
+
+@register_async_handler("get_user_volunteer_count")
+async def get_user_volunteer_count_service_async(event_data: dict, action: str):
+    try:
+        query = _volunteer_count_query(event_data)
+        return _volunteer_count_response(action, await get_async_db().events.count_documents(query))
+    except Exception as e:
+        return _volunteer_count_error(action, e)
+
+
+@register_action("get_events_with_user_as_volunteer")
 def get_events_with_user_as_volunteer_service(event_data: dict, action: str):
     try:
         user_id = event_data.get("user_id")
         if not user_id:
             raise ValueError("Не передан user_id")
 
-        events_cursor = db.events.find({"volunteers": user_id})
+        limit = page_limit(event_data)
+        query = page_query(volunteer_events_query(user_id), EVENT_LIST_SORT, event_data.get("cursor"))
+        projection = with_sort_fields(event_list_projection(event_data), EVENT_LIST_SORT)
 
-        events = []
-        for event in events_cursor:
-            event["_id"] = str(event["_id"])
-            convert_datetime_fields(event)
-            if "volunteers" in event:
-                event["volunteers"] = [str(v) for v in event["volunteers"]]
-            events.append(event)
+        docs = list(db.events.find(query, projection).sort(EVENT_LIST_SORT).limit(limit + 1))
+        events, next_cursor = build_page(docs, EVENT_LIST_SORT, limit)
 
         return {
             "action": action,
             "message": {
                 "status": "success",
-                "events": events
+                "events": events,
+                "has_more": next_cursor is not None,
+                "next_cursor": next_cursor
             }
         }
 
     except Exception as e:
-        print(f"❌ Ошибка при получении событий волонтёра: {e}")
+        logger.error("Ошибка при получении событий волонтёра: %s", e)
         return {
             "action": action,
             "message": {
@@ -0,0 +1,152 @@
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from app.core.mongo_config import db
+from app.core.service_config import IDEMPOTENCY_LEASE
+from app.utils.serialization import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+# Результаты захвата request_id
+CLAIMED = "claimed"          # запрос новый — выполняем обработчик
+REPLAY = "replay"            # запрос уже обработан — повторяем сохранённый ответ
+IN_PROGRESS = "in_progress"  # дубликат всё ещё обрабатывает живой владелец захвата — ответ отправит он
+
+# Владелец захватов этого процесса: хост, pid и случайная часть (pid переиспользуется после перезапуска)
+OWNER = f"{socket.gethostname()}:{os.getpid()}:{ObjectId()}"
+
+# Как часто дубликат перепроверяет захват, пока ждёт владельца (сек)
+POLL_INTERVAL = 0.2
+
+# Запись захвата удалили между вставкой и чтением — вставку можно сразу повторить
+_GONE = object()
+
+# Захваты, которыми владеет процесс; их аренду продлевает фоновый поток
+_held = set()
+_held_lock = threading.Lock()
+_heartbeat = None
+
+
+def _lease_until(now):
+    return now + timedelta(seconds=IDEMPOTENCY_LEASE)
+
+
+def _heartbeat_loop():
+    while True:
+        time.sleep(IDEMPOTENCY_LEASE / 3)
+        with _held_lock:
+            held = list(_held)
+        if not held:
+            continue
+        try:
+            db.processed_requests.update_many(
+                {"_id": {"$in": held}, "owner": OWNER, "status": "pending"},
+                {"$set": {"lease_until": _lease_until(datetime.utcnow())}}
+            )
+        except Exception as e:
+            logger.error("Не удалось продлить аренду захватов: %s", e)
+
+
+def _hold(request_id):
+    global _heartbeat
+    with _held_lock:
+        _held.add(request_id)
+        if _heartbeat is None:
+            _heartbeat = threading.Thread(target=_heartbeat_loop, name="idempotency-heartbeat", daemon=True)
+            _heartbeat.start()
+
+
+def _unhold(request_id):
+    with _held_lock:
+        _held.discard(request_id)
+
+
+def _try_claim(request_id: str, action: str):
+    """Одна попытка захвата: (результат, сохранённый ответ); None — захват ещё у живого владельца,
+    _GONE — запись захвата успели удалить"""
+    now = datetime.utcnow()
+    try:
+        db.processed_requests.insert_one({
+            "_id": request_id, "action": action, "status": "pending",
+            "owner": OWNER, "created_at": now, "lease_until": _lease_until(now),
+        })
+        return CLAIMED, None
+    except DuplicateKeyError:
+        pass
+
+    record = db.processed_requests.find_one({"_id": request_id})
+    if record is None:
+        # Запись успели удалить (TTL или release_request)
+        return _GONE
+
+    if record.get("status") == "done":
+        return REPLAY, loads(bytes(record["response"]))
+
+    # Аренда не продлена — владелец упал; перехватываем атомарно, чтобы это сделал только один процесс
+    taken = db.processed_requests.update_one(
+        {
+            "_id": request_id,
+            "status": "pending",
+            "$or": [
+                {"lease_until": {"$lt": now}},
+                {"lease_until": {"$exists": False}, "created_at": {"$lt": now - timedelta(seconds=IDEMPOTENCY_LEASE)}},
+            ],
+        },
+        {"$set": {"owner": OWNER, "lease_until": _lease_until(now)}}
+    )
+    if taken.modified_count:
+        logger.warning(
+            "Перехвачен захват упавшего процесса",
+            extra={"request_id": request_id, "action": action, "previous_owner": record.get("owner")}
+        )
+        return CLAIMED, None
+    return None
+
+
+def claim_request(request_id: str, action: str, wait: float = 0.0):
+    """Захватывает request_id. Возвращает (результат, сохранённый ответ или None).
+
+    Захват с истёкшей арендой (владелец упал) перехватывается сразу. Если владелец жив, дубликат
+    до wait секунд ждёт его ответа (REPLAY) или истечения аренды (CLAIMED); IN_PROGRESS — владелец
+    всё ещё обрабатывает запрос и ответит сам. wait > 0 — только там, где ожидание не держит
+    чтение партиций (пул обработчиков, режим async).
+    """
+    deadline = time.monotonic() + wait
+    retried = False
+    while True:
+        result = _try_claim(request_id, action)
+        if result is _GONE:
+            # Одна повторная вставка разрешена всегда, дальнейшие — в пределах wait
+            if not retried or time.monotonic() < deadline:
+                retried = True
+                continue
+            return IN_PROGRESS, None
+        if result is not None:
+            if result[0] == CLAIMED:
+                _hold(request_id)
+            return result
+        if time.monotonic() >= deadline:
+            return IN_PROGRESS, None
+        time.sleep(POLL_INTERVAL)
+
+
+def complete_request(request_id: str, response):
+    """Сохраняет ответ обработчика: дубликаты получат его без повторной записи"""
+    _unhold(request_id)
+    db.processed_requests.update_one(
+        {"_id": request_id, "owner": OWNER},
+        {"$set": {"status": "done", "response": dumps(response), "completed_at": datetime.utcnow()}}
+    )
+
+
+def release_request(request_id: str):
+    """Снимает захват, если обработчик упал: повторная доставка выполнит запрос заново"""
+    _unhold(request_id)
+    db.processed_requests.delete_one({"_id": request_id, "status": "pending", "owner": OWNER})
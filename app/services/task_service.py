@@ -1,12 +1,74 @@
 import json
+import logging
 from datetime import datetime
 
 from app.models.volunteer_task import VolunteerTask, VolunteerTaskUpdate
-from app.core.mongo_config import db
+from app.core.mongo_config import db, get_async_db
+from app.core.registry import register_action, register_async_handler
 from pydantic import ValidationError
 from bson import ObjectId, errors
 
+from app.services.cleanup_service import delete_event_tasks, event_id_filter
+from app.utils.cache import task_cache
+from app.utils.pagination import page_limit, page_query, build_page, with_sort_fields
+from app.utils.projection import build_projection
 
+logger = logging.getLogger(__name__)
+
+# Старый встроенный массив comments в ответы не попадает: комментарии читаются через get_task_comments
+TASK_PROJECTION = {"comments": 0}
+
+# Облегчённый набор полей для списков задач; полный документ — fields: "all"
+TASK_LIST_FIELDS = (
+    "title", "deadline", "status", "assigned_to", "event_id", "created_by", "comments_count", "last_comment",
+)
+
+
+# Списки задач отдаются страницами по сроку; _id — уникальный тай-брейкер для курсора
+TASK_LIST_SORT = [("deadline", 1), ("_id", 1)]
+# Комментарии задачи — от новых к старым
+TASK_COMMENTS_SORT = [("created_at", -1), ("_id", -1)]
+
+
+def tasks_by_user_query(user_id: str) -> dict:
+    return {"assigned_to": user_id}
+
+
+def tasks_by_creator_query(user_id: str) -> dict:
+    return {"created_by": user_id}
+
+
+def task_comments_query(task_id: str) -> dict:
+    return {"task_id": task_id}
+
+
+def query_shapes() -> list:
+    """Формы запросов задач для проверки индексов (app.core.indexes.verify_query_shapes)"""
+    some_id = str(ObjectId())
+    return [
+        ("tasks_by_user", "volunteer_tasks", tasks_by_user_query("user"), TASK_LIST_SORT),
+        ("tasks_by_event", "volunteer_tasks", event_id_filter(some_id), TASK_LIST_SORT),
+        ("tasks_by_creator", "volunteer_tasks", tasks_by_creator_query("user"), TASK_LIST_SORT),
+        ("task_comments", "task_comments", task_comments_query(some_id), TASK_COMMENTS_SORT),
+    ]
+
+
+def task_list_projection(data: dict) -> dict:
+    """Проекция для списочных действий по параметру fields"""
+    return build_projection(data.get("fields"), TASK_LIST_FIELDS, tuple(TASK_PROJECTION))
+
+
+def find_tasks_page(query: dict, data: dict):
+    """Страница задач по запросу: (задачи, next_cursor)"""
+    limit = page_limit(data)
+    projection = with_sort_fields(task_list_projection(data), TASK_LIST_SORT)
+    query = page_query(query, TASK_LIST_SORT, data.get("cursor"))
+
+    docs = list(db.volunteer_tasks.find(query, projection).sort(TASK_LIST_SORT).limit(limit + 1))
+    return build_page(docs, TASK_LIST_SORT, limit)
+
+
+@register_action("assign_task", write=True, model=VolunteerTask, data_required=True)
 def assign_task_service(task_data: dict, action: str):
     try:
         now = datetime.utcnow()
@@ -19,11 +81,20 @@ def assign_task_service(task_data: dict, action: str):
         task = VolunteerTask(**task_data)
         task_dict = task.dict(by_alias=True)
 
+        # Комментарии хранятся в отдельной коллекции, в задаче — только счётчик и последний
+        comments = task_dict.pop("comments", [])
+        if comments:
+            task_dict["comments_count"] = len(comments)
+            task_dict["last_comment"] = comments[-1]
+
         # Вставляем в MongoDB
         inserted = db.volunteer_tasks.insert_one(task_dict)
         inserted_id = str(inserted.inserted_id)
 
-        print(f"✅ Задача успешно создана с _id: {inserted_id}")
+        if comments:
+            db.task_comments.insert_many([{**comment, "task_id": inserted_id} for comment in comments])
+
+        logger.info("Задача успешно создана с _id: %s", inserted_id)
 
         task_dict["_id"] = inserted_id
 
@@ -38,7 +109,7 @@ def assign_task_service(task_data: dict, action: str):
         }
 
     except ValidationError as e:
-        print(f"❌ Ошибка валидации при назначении задачи: {e}")
+        logger.error("Ошибка валидации при назначении задачи: %s", e)
         return {
             "action": action,
             "message": {
@@ -47,7 +118,7 @@ def assign_task_service(task_data: dict, action: str):
             }
         }
     except Exception as e:
-        print(f"❌ Ошибка создания задачи: {e}")
+        logger.error("Ошибка создания задачи: %s", e)
         return {
             "action": action,
             "message": {
@@ -57,6 +128,7 @@ def assign_task_service(task_data: dict, action: str):
         }
 
 
+@register_action("update_task", write=True, model=VolunteerTaskUpdate, data_required=True, key=("_id",))
 def update_task_service(task_data: dict, action: str):
     try:
         task_id = task_data.get("_id")
@@ -79,7 +151,8 @@ def update_task_service(task_data: dict, action: str):
         if result.matched_count == 0:
             raise ValueError(f"Задача с _id {task_id} не найдена")
 
-        print(f"🔄 Задача {task_id} успешно обновлена")
+        task_cache.invalidate(task_id)
+        logger.info("Задача %s успешно обновлена", task_id)
 
         return {
             "action": action,
@@ -93,7 +166,7 @@ def update_task_service(task_data: dict, action: str):
         }
 
     except (ValidationError, ValueError) as e:
-        print(f"❌ Ошибка обновления задачи: {e}")
+        logger.error("Ошибка обновления задачи: %s", e)
         return {
             "action": action,
             "status": "error",
@@ -102,7 +175,7 @@ def update_task_service(task_data: dict, action: str):
             }
         }
     except Exception as e:
-        print(f"❌ Общая ошибка обновления задачи: {e}")
+        logger.error("Общая ошибка обновления задачи: %s", e)
         return {
             "action": action,
             "status": "error",
@@ -112,6 +185,7 @@ def update_task_service(task_data: dict, action: str):
         }
 
 
+@register_action("delete_task", write=True, data_required=True, key=("_id",))
 def delete_task_service(task_data: dict, action: str):
     try:
         task_id = task_data.get("_id")
@@ -128,6 +202,10 @@ def delete_task_service(task_data: dict, action: str):
         if result.deleted_count == 0:
             raise ValueError(f"Задача с _id {task_id} не найдена")
 
+        # Комментарии хранятся отдельно и удаляются вместе с задачей
+        db.task_comments.delete_many({"task_id": task_id})
+        task_cache.invalidate(task_id)
+
         return {
             "action": action,
             "status": "success",
@@ -137,7 +215,7 @@ def delete_task_service(task_data: dict, action: str):
         }
 
     except ValueError as e:
-        print(f"❌ Ошибка удаления задачи: {e}")
+        logger.error("Ошибка удаления задачи: %s", e)
         return {
             "status": "error",
             "action": action,
@@ -146,7 +224,7 @@ def delete_task_service(task_data: dict, action: str):
             }
         }
     except Exception as e:
-        print(f"❌ Общая ошибка удаления задачи: {e}")
+        logger.error("Общая ошибка удаления задачи: %s", e)
         return {
             "status": "error",
             "action": action,
@@ -156,47 +234,27 @@ def delete_task_service(task_data: dict, action: str):
         }
 
 
-def serialize_task(task: dict) -> dict:
-    task["_id"] = str(task["_id"])
-    task["assigned_to"] = str(task["assigned_to"])
-    if task.get("event_id"):
-        task["event_id"] = str(task["event_id"])
-
-    if "created_by" in task:
-        task["created_by"] = str(task["created_by"])
-
-    for dt_field in ["created_at", "updated_at", "deadline"]:
-        if dt_field in task and isinstance(task[dt_field], datetime):
-            task[dt_field] = task[dt_field].isoformat()
-
-    # сериализация комментариев
-    for comment in task.get("comments", []):
-        comment["user_id"] = str(comment["user_id"])
-        if "created_at" in comment and isinstance(comment["created_at"], datetime):
-            comment["created_at"] = comment["created_at"].isoformat()
-
-    return task
-
-
+@register_action("get_tasks_by_user")
 def get_tasks_by_user_service(task_data: dict, action: str):
     try:
         user_id = task_data.get("user_id")
         if not user_id:
             raise ValueError("Не передан user_id")
 
-        cursor = db.volunteer_tasks.find({"assigned_to": user_id}).sort("deadline", 1)
-        tasks = [serialize_task(task) for task in cursor]
+        tasks, next_cursor = find_tasks_page(tasks_by_user_query(user_id), task_data)
 
         return {
             "action": action,
             "status": "success",
             "data": {
-                "tasks": tasks
+                "tasks": tasks,
+                "has_more": next_cursor is not None,
+                "next_cursor": next_cursor
             }
         }
 
     except Exception as e:
-        print(f"❌ Ошибка при получении задач по user_id: {e}")
+        logger.error("Ошибка при получении задач по user_id: %s", e)
         return {
             "action": action,
             "message": {
@@ -206,27 +264,30 @@ def get_tasks_by_user_service(task_data: dict, action: str):
         }
 
 
+@register_action("get_tasks_by_event", key=("event_id",))
 def get_tasks_by_event_service(task_data: dict, action: str):
     try:
         event_id = task_data.get("event_id")
         if not event_id:
             raise ValueError("Не передан event_id")
 
-        object_id = ObjectId(event_id)
+        ObjectId(event_id)
 
-        cursor = db.volunteer_tasks.find({"event_id": object_id}).sort("deadline", 1)
-        tasks = [serialize_task(task) for task in cursor]
+        # event_id задач хранится строкой (assign_task), у старых записей — ObjectId
+        tasks, next_cursor = find_tasks_page(event_id_filter(event_id), task_data)
 
         return {
             "action": action,
             "message": {
                 "status": "success",
-                "tasks": tasks
+                "tasks": tasks,
+                "has_more": next_cursor is not None,
+                "next_cursor": next_cursor
             }
         }
 
     except Exception as e:
-        print(f"❌ Ошибка при получении задач по event_id: {e}")
+        logger.error("Ошибка при получении задач по event_id: %s", e)
         return {
             "action": action,
             "message": {
@@ -236,37 +297,65 @@ def get_tasks_by_event_service(task_data: dict, action: str):
         }
 
 
-def get_task_by_id_service(task_data: dict, action: str):
-    try:
-        task_id = task_data.get("task_id")
-        if not task_id:
-            raise ValueError("Не передан task_id")
+# Синхронный и асинхронный обработчики отличаются только клиентом: запрос и ответ общие
 
-        task = db.volunteer_tasks.find_one({"_id": ObjectId(task_id)})
-        if not task:
-            raise ValueError("Задача не найдена")
+def _task_id(task_data: dict) -> str:
+    task_id = task_data.get("task_id")
+    if not task_id:
+        raise ValueError("Не передан task_id")
+    return task_id
 
-        serialized = serialize_task(task)
 
-        return {
-            "action": action,
-            "message": {
-                "status": "success",
-                "task": serialized
-            }
+def _find_task_by_id(collection, task_id):
+    return collection.find_one({"_id": ObjectId(task_id)}, TASK_PROJECTION)
+
+
+def _task_by_id_response(action: str, task) -> dict:
+    if not task:
+        raise ValueError("Задача не найдена")
+    return {
+        "action": action,
+        "message": {
+            "status": "success",
+            "task": dict(task)
         }
+    }
 
-    except Exception as e:
-        print(f"❌ Ошибка при получении задачи по id: {e}")
-        return {
-            "action": action,
-            "message": {
-                "status": "error",
-                "details": str(e)
-            }
+
+def _task_by_id_error(action: str, e: Exception) -> dict:
+    logger.error("Ошибка при получении задачи по id: %s", e)
+    return {
+        "action": action,
+        "message": {
+            "status": "error",
+            "details": str(e)
         }
+    }
+
+
+@register_action("get_task_by_id", key=("task_id",))
+def get_task_by_id_service(task_data: dict, action: str):
+    try:
+        task_id = _task_id(task_data)
+        task = task_cache.read_through(task_id, lambda: _find_task_by_id(db.volunteer_tasks, task_id))
+        return _task_by_id_response(action, task)
+    except Exception as e:
+        return _task_by_id_error(action, e)
+
+
+@register_async_handler("get_task_by_id")
+async def get_task_by_id_service_async(task_data: dict, action: str):
+    try:
+        task_id = _task_id(task_data)
+        task = await task_cache.read_through_async(
+            task_id, lambda: _find_task_by_id(get_async_db().volunteer_tasks, task_id)
+        )
+        return _task_by_id_response(action, task)
+    except Exception as e:
+        return _task_by_id_error(action, e)
 
 
+@register_action("add_task_comment", write=True, data_required=True, key=("task_id",))
 def add_task_comment_service(data: dict, action: str):
     try:
         task_id = data.get("task_id")
@@ -277,11 +366,8 @@ def add_task_comment_service(data: dict, action: str):
         if not task_id or not user_id or not text:
             raise ValueError("Необходимы поля: task_id, user_id, text")
 
-        task = db.volunteer_tasks.find_one({"_id": ObjectId(task_id)})
-        if not task:
-            raise ValueError("Задача не найдена")
-
         comment = {
+            "_id": ObjectId(),
             "user_id": ObjectId(user_id),
             "text": text,
             "attachments": attachments,
@@ -289,6 +375,27 @@ def add_task_comment_service(data: dict, action: str):
             "task_id": task_id
         }
 
+        task_object_id = ObjectId(task_id)
+
+        # Сначала сам комментарий: счётчик задачи не должен учитывать несохранённый комментарий
+        db.task_comments.insert_one(comment)
+
+        # В задаче обновляем только счётчик и последний комментарий
+        try:
+            task = db.volunteer_tasks.find_one_and_update(
+                {"_id": task_object_id},
+                {"$inc": {"comments_count": 1}, "$set": {"last_comment": comment}},
+                projection={"assigned_to": 1, "created_by": 1}
+            )
+        except Exception:
+            db.task_comments.delete_one({"_id": comment["_id"]})
+            raise
+        if not task:
+            db.task_comments.delete_one({"_id": comment["_id"]})
+            raise ValueError("Задача не найдена")
+
+        task_cache.invalidate(task_id)
+
         # Определяем, кому форвардить (только в питоне, не в БД)
         forward_to_user = None
         if str(user_id) == task.get("assigned_to"):
@@ -296,15 +403,6 @@ def add_task_comment_service(data: dict, action: str):
         else:
             forward_to_user = task.get("assigned_to")
 
-        # Добавляем комментарий в MongoDB
-        result = db.volunteer_tasks.update_one(
-            {"_id": ObjectId(task_id)},
-            {"$push": {"comments": comment}}
-        )
-
-        if result.modified_count == 0:
-            raise ValueError("Комментарий не был добавлен")
-
         return {
             "action": action,
             "status": "success",
@@ -315,7 +413,7 @@ def add_task_comment_service(data: dict, action: str):
         }
 
     except Exception as e:
-        print(f"❌ Ошибка при добавлении комментария: {e}")
+        logger.error("Ошибка при добавлении комментария: %s", e)
         return {
             "action": action,
             "message": {
@@ -325,6 +423,7 @@ def add_task_comment_service(data: dict, action: str):
         }
 
 
+@register_action("add_task_attachment", write=True, data_required=True, key=("task_id",))
 def add_task_attachment_service(data: dict, action: str):
     try:
         task_id = data.get("task_id")
@@ -343,6 +442,8 @@ def add_task_attachment_service(data: dict, action: str):
         if result.modified_count == 0:
             raise ValueError("Задача не найдена")
 
+        task_cache.invalidate(task_id)
+
         # Получение обновлённой задачи
         task = db.volunteer_tasks.find_one({"_id": ObjectId(task_id)})
         if not task:
@@ -369,7 +470,7 @@ def add_task_attachment_service(data: dict, action: str):
         }
 
     except Exception as e:
-        print(f"❌ Ошибка при добавлении вложений: {e}")
+        logger.error("Ошибка при добавлении вложений: %s", e)
         return {
             "action": action,
             "message": {
@@ -379,6 +480,7 @@ def add_task_attachment_service(data: dict, action: str):
         }
 
 
+@register_action("change_task_status", write=True, data_required=True, key=("task_id",))
 def change_task_status_service(data: dict, action: str):
     try:
         task_id = data.get("task_id")
@@ -395,6 +497,8 @@ def change_task_status_service(data: dict, action: str):
         if result.modified_count == 0:
             raise ValueError("Задача не найдена или статус уже установлен")
 
+        task_cache.invalidate(task_id)
+
         return {
             "action": action,
             "message": {
@@ -405,7 +509,7 @@ def change_task_status_service(data: dict, action: str):
         }
 
     except Exception as e:
-        print(f"❌ Ошибка при смене статуса: {e}")
+        logger.error("Ошибка при смене статуса: %s", e)
         return {
             "action": action,
             "message": {
@@ -415,6 +519,7 @@ def change_task_status_service(data: dict, action: str):
         }
 
 
+@register_action("remove_task_attachment", write=True, data_required=True, key=("task_id",))
 def remove_task_attachment_service(data: dict, action: str):
     try:
         task_id = data.get("task_id")
@@ -427,6 +532,7 @@ def remove_task_attachment_service(data: dict, action: str):
             {"_id": ObjectId(task_id)},
             {"$pull": {"attachments": {"$in": attachments_to_remove}}}
         )
+        task_cache.invalidate(task_id)
 
         return {
             "action": action,
@@ -437,7 +543,7 @@ def remove_task_attachment_service(data: dict, action: str):
         }
 
     except Exception as e:
-        print(f"❌ Ошибка при удалении вложений: {e}")
+        logger.error("Ошибка при удалении вложений: %s", e)
         return {
             "action": action,
             "message": {
@@ -447,6 +553,7 @@ def remove_task_attachment_service(data: dict, action: str):
         }
 
 
+@register_action("get_task_comments", data_required=True, key=("task_id",))
 def get_task_comments_service(data: dict, action: str):
     try:
         task_id = data.get("task_id")
@@ -454,21 +561,26 @@ def get_task_comments_service(data: dict, action: str):
         if not task_id:
             raise ValueError("Не указан task_id")
 
-        task = db.volunteer_tasks.find_one({"_id": ObjectId(task_id)}, {"comments": 1})
+        # Страница от новых к старым; next_cursor ведёт к более старым комментариям
+        limit = page_limit(data)
+        query = page_query(task_comments_query(task_id), TASK_COMMENTS_SORT, data.get("cursor"))
 
-        if not task:
-            raise ValueError("Задача не найдена")
+        docs = list(db.task_comments.find(query).sort(TASK_COMMENTS_SORT).limit(limit + 1))
+        docs, next_cursor = build_page(docs, TASK_COMMENTS_SORT, limit)
+        docs.reverse()
 
         return {
             "action": action,
             "status": "success",
             "data": {
-                "comments": task.get("comments", [])
+                "comments": docs,
+                "has_more": next_cursor is not None,
+                "next_cursor": next_cursor
             }
         }
 
     except Exception as e:
-        print(f"❌ Ошибка при получении комментариев: {e}")
+        logger.error("Ошибка при получении комментариев: %s", e)
         return {
             "action": action,
             "message": {
@@ -478,26 +590,27 @@ def get_task_comments_service(data: dict, action: str):
         }
 
 
+@register_action("get_tasks_assigned_by_user")
 def get_tasks_assigned_by_user_service(data: dict, action: str):
     try:
         user_id = data.get("user_id")
         if not user_id:
             raise ValueError("user_id is required")
 
-        tasks = list(db.volunteer_tasks.find({"created_by": user_id}))
-        for task in tasks:
-            task["_id"] = str(task["_id"])
+        tasks, next_cursor = find_tasks_page(tasks_by_creator_query(user_id), data)
 
         return {
             "action": action,
             "status": "success",
             "data": {
-                "tasks": tasks
+                "tasks": tasks,
+                "has_more": next_cursor is not None,
+                "next_cursor": next_cursor
             }
         }
 
     except Exception as e:
-        print(f"❌ Ошибка при получении задач по user_id: {e}")
+        logger.error("Ошибка при получении задач по user_id: %s", e)
         return {
             "action": action,
             "status": "error",
@@ -507,6 +620,7 @@ def get_tasks_assigned_by_user_service(data: dict, action: str):
         }
 
 
+@register_action("get_task_attachments", data_required=True, key=("task_id",))
 def get_task_attachments_service(data: dict, action: str):
     try:
         task_id = data.get("task_id")
@@ -526,7 +640,7 @@ def get_task_attachments_service(data: dict, action: str):
         }
 
     except Exception as e:
-        print(f"❌ Ошибка при получении вложений задачи: {e}")
+        logger.error("Ошибка при получении вложений задачи: %s", e)
         return {
             "action": action,
             "message": {
@@ -536,14 +650,15 @@ def get_task_attachments_service(data: dict, action: str):
         }
 
 
+@register_action("delete_tasks_by_event_id", write=True, data_required=True, key=("_id",))
 def delete_tasks_by_event_id_service(data: dict, action: str):
     try:
         event_id = data.get("_id")
         if not event_id:
             raise ValueError("Не передан event_id")
 
-        result = db.volunteer_tasks.delete_many({"event_id": event_id})
-        deleted_count = result.deleted_count
+        # Вместе с задачами удаляются их комментарии
+        deleted_count = delete_event_tasks(event_id)["deleted_tasks"]
 
         return {
             "action": action,
@@ -561,4 +676,23 @@ def delete_tasks_by_event_id_service(data: dict, action: str):
                 "status": "error",
                 "error": str(e)
             }
-        }
\ No newline at end of file
+        }
+
+
+def migrate_embedded_task_comments():
+    """Переносит комментарии из старого массива volunteer_tasks.comments в task_comments. Возвращает число задач"""
+    migrated = 0
+    for task in db.volunteer_tasks.find({"comments.0": {"$exists": True}}, {"comments": 1}):
+        task_id = str(task["_id"])
+        comments = [{**comment, "_id": ObjectId(), "task_id": task_id} for comment in task["comments"]]
+        db.task_comments.insert_many(comments)
+        db.volunteer_tasks.update_one(
+            {"_id": task["_id"]},
+            {
+                "$unset": {"comments": ""},
+                "$inc": {"comments_count": len(comments)},
+                "$set": {"last_comment": comments[-1]},
+            }
+        )
+        migrated += 1
+    return migrated
@@ -0,0 +1,112 @@
+import threading
+import time
+from collections import OrderedDict
+
+from app.core.service_config import ENTITY_CACHE_ENABLED, ENTITY_CACHE_SIZE, ENTITY_CACHE_TTL
+
+
+class TTLCache:
+    """Потокобезопасный LRU-кэш с ограничением размера и временем жизни записей"""
+
+    def __init__(self, name, maxsize, ttl, enabled=True):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.enabled = enabled
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        # Растёт при каждой инвалидации: значение, прочитанное из БД до неё, в кэш не попадёт
+        self._generation = 0
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def generation(self):
+        return self._generation
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._data.move_to_end(key)
+            self._stats["hits"] += 1
+            return value
+
+    def read_through(self, key, load):
+        """Значение из кэша или из load(); найденное load() кладётся в кэш, если не было инвалидации"""
+        value = self.get(key)
+        if value is None:
+            generation = self.generation()
+            value = load()
+            if value:
+                self.set(key, value, generation)
+        return value
+
+    async def read_through_async(self, key, load):
+        """read_through для корутины load (режим async)"""
+        value = self.get(key)
+        if value is None:
+            generation = self.generation()
+            value = await load()
+            if value:
+                self.set(key, value, generation)
+        return value
+
+    def set(self, key, value, generation=None):
+        """Кладёт значение; если передан generation и с тех пор была инвалидация — пропускает"""
+        if not self.enabled:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._generation += 1
+            if self._data.pop(key, None) is not None:
+                self._stats["invalidations"] += 1
+
+    def invalidate_where(self, predicate):
+        """Удаляет все записи, значения которых удовлетворяют predicate"""
+        with self._lock:
+            self._generation += 1
+            keys = [key for key, (value, _) in self._data.items() if predicate(value)]
+            for key in keys:
+                del self._data[key]
+            self._stats["invalidations"] += len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "size": len(self._data), "enabled": self.enabled}
+
+
+event_cache = TTLCache("events", ENTITY_CACHE_SIZE, ENTITY_CACHE_TTL, enabled=ENTITY_CACHE_ENABLED)
+task_cache = TTLCache("tasks", ENTITY_CACHE_SIZE, ENTITY_CACHE_TTL, enabled=ENTITY_CACHE_ENABLED)
+
+
+def bound_cache_staleness(ttl: float):
+    """Ограничивает время, которое процесс может отдавать устаревший документ; ttl <= 0 выключает кэши"""
+    for cache in (event_cache, task_cache):
+        cache.clear()
+        if ttl <= 0:
+            cache.enabled = False
+        else:
+            cache.ttl = min(cache.ttl, ttl)
@@ -0,0 +1,70 @@
+import re
+
+# Поля мероприятия, по которым строится поисковый индекс
+SEARCHABLE_FIELDS = ("title", "description", "category", "location")
+
+# Служебные поля с токенами: индексируемые префиксы, префиксы названия и целые слова
+SEARCH_INDEX_FIELDS = ("search_prefixes", "search_title", "search_tokens")
+SEARCH_FIELDS_PROJECTION = {field: 0 for field in SEARCH_INDEX_FIELDS}
+
+MIN_PREFIX_LENGTH = 2
+MAX_PREFIX_LENGTH = 15
+# Префиксы названия — с одного символа: get_event_by_title находит мероприятия и по первой букве
+MIN_TITLE_PREFIX_LENGTH = 1
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize_text(text) -> str:
+    return str(text).casefold().replace("ё", "е")
+
+
+def tokenize(text) -> list:
+    """Разбивает текст на нормализованные слова"""
+    if not text:
+        return []
+    return _TOKEN_RE.findall(normalize_text(text))
+
+
+def token_prefixes(token: str, min_length: int = MIN_PREFIX_LENGTH) -> list:
+    """Префиксы слова от min_length до MAX_PREFIX_LENGTH символов"""
+    upper = min(len(token), MAX_PREFIX_LENGTH)
+    return [token[:n] for n in range(min_length, upper + 1)]
+
+
+def _prefix_set(tokens, min_length: int = MIN_PREFIX_LENGTH) -> set:
+    prefixes = set()
+    for token in tokens:
+        prefixes.update(token_prefixes(token, min_length))
+    return prefixes
+
+
+def build_search_fields(event: dict) -> dict:
+    """Значения служебных поисковых полей для документа мероприятия"""
+    tokens = set()
+    for field in SEARCHABLE_FIELDS:
+        tokens.update(tokenize(event.get(field)))
+    title_tokens = tokenize(event.get("title"))
+
+    return {
+        "search_prefixes": sorted(_prefix_set(tokens)),
+        "search_title": sorted(_prefix_set(title_tokens, MIN_TITLE_PREFIX_LENGTH)),
+        "search_tokens": sorted(token[:MAX_PREFIX_LENGTH] for token in tokens),
+    }
+
+
+def search_query_tokens(query, min_length: int = MIN_PREFIX_LENGTH) -> list:
+    """Токены поискового запроса в виде, сравнимом с search_prefixes (min_length=MIN_TITLE_PREFIX_LENGTH —
+    с search_title)"""
+    tokens = []
+    for token in tokenize(query):
+        token = token[:MAX_PREFIX_LENGTH]
+        if len(token) >= min_length and token not in tokens:
+            tokens.append(token)
+    return tokens
+
+
+def strip_search_fields(event: dict) -> dict:
+    for field in SEARCH_INDEX_FIELDS:
+        event.pop(field, None)
+    return event
@@ -1,5 +1,30 @@
-from confluent_kafka import Producer, Consumer
-from app.core.kafka_config import PRODUCER_CONFIG, CONSUMER_CONFIG, TOPICS
+import asyncio
+import logging
+import threading
+
+from confluent_kafka import Producer, Consumer, KafkaException
+from app.core.kafka_config import (
+    PRODUCER_CONFIG,
+    CONSUMER_CONFIG,
+    TOPICS,
+    PRODUCER_POLL_INTERVAL,
+    PRODUCER_FLUSH_TIMEOUT,
+)
+
+logger = logging.getLogger(__name__)
+
+_producer = None
+_producer_lock = threading.Lock()
+_poll_thread = None
+_poll_stop = threading.Event()
+
+_stats_lock = threading.Lock()
+_delivery_stats = {
+    "produced": 0,
+    "delivered": 0,
+    "failed": 0,
+    "last_error": None,
+}
 
 
 def get_producer():
@@ -7,15 +32,124 @@ def get_producer():
     return Producer(PRODUCER_CONFIG)
 
 
-def get_consumer(topics):
+def get_consumer(topics, on_revoke=None):
     """Создает Kafka Consumer"""
     consumer = Consumer(CONSUMER_CONFIG)
-    consumer.subscribe(topics)
+    if on_revoke is not None:
+        consumer.subscribe(topics, on_revoke=on_revoke)
+    else:
+        consumer.subscribe(topics)
     return consumer
 
 
+def _on_delivery(err, msg):
+    """Callback доставки: учитывает успешные и неуспешные отправки"""
+    with _stats_lock:
+        if err is not None:
+            _delivery_stats["failed"] += 1
+            _delivery_stats["last_error"] = str(err)
+        else:
+            _delivery_stats["delivered"] += 1
+    if err is not None:
+        logger.error("Ошибка доставки сообщения в %s: %s", msg.topic(), err)
+
+
+def _poll_loop(producer):
+    """Фоновый цикл, обслуживающий callback'и доставки общего Producer"""
+    while not _poll_stop.is_set():
+        producer.poll(PRODUCER_POLL_INTERVAL)
+
+
+def get_shared_producer():
+    """Возвращает общий для процесса Producer, создавая его при первом вызове"""
+    global _producer, _poll_thread
+    if _producer is not None:
+        return _producer
+
+    with _producer_lock:
+        if _producer is None:
+            producer = get_producer()
+            _poll_stop.clear()
+            _poll_thread = threading.Thread(
+                target=_poll_loop, args=(producer,), name="kafka-producer-poll", daemon=True
+            )
+            _poll_thread.start()
+            _producer = producer
+    return _producer
+
+
+def install_producer(producer):
+    """Подменяет общий Producer (например, заглушкой в бенчмарках); фоновый poll-поток не запускается"""
+    global _producer
+    with _producer_lock:
+        _producer = producer
+
+
+def produce(topic, value, key=None, on_delivery=_on_delivery):
+    """Асинхронно ставит сообщение в очередь общего Producer"""
+    producer = get_shared_producer()
+    try:
+        producer.produce(topic, key=key, value=value, on_delivery=on_delivery)
+    except BufferError:
+        # Локальная очередь переполнена — даём librdkafka отправить накопленное
+        producer.poll(1.0)
+        producer.produce(topic, key=key, value=value, on_delivery=on_delivery)
+
+    with _stats_lock:
+        _delivery_stats["produced"] += 1
+
+
+async def produce_async(topic, value, key=None):
+    """Отправляет сообщение через общий Producer и ждёт подтверждения доставки, не блокируя event loop"""
+    loop = asyncio.get_running_loop()
+    delivered = loop.create_future()
+
+    def on_delivery(err, msg):
+        _on_delivery(err, msg)
+
+        def resolve():
+            if delivered.done():
+                return
+            if err is not None:
+                delivered.set_exception(KafkaException(err))
+            else:
+                delivered.set_result(msg)
+
+        loop.call_soon_threadsafe(resolve)
+
+    produce(topic, value, key=key, on_delivery=on_delivery)
+    return await delivered
+
+
+def get_delivery_stats():
+    """Возвращает счётчики доставки общего Producer"""
+    producer = _producer
+    with _stats_lock:
+        stats = dict(_delivery_stats)
+    stats["pending"] = len(producer) if producer is not None else 0
+    return stats
+
+
+def flush_producer(timeout=PRODUCER_FLUSH_TIMEOUT):
+    """Дожидается доставки и останавливает общий Producer. Возвращает число недоставленных сообщений"""
+    global _producer, _poll_thread
+    with _producer_lock:
+        producer, poll_thread = _producer, _poll_thread
+        _producer, _poll_thread = None, None
+
+    if producer is None:
+        return 0
+
+    _poll_stop.set()
+    if poll_thread is not None:
+        poll_thread.join()
+
+    remaining = producer.flush(timeout)
+    if remaining:
+        logger.warning("Не доставлено сообщений при остановке Producer: %s", remaining)
+    return remaining
+
+
 def send_message(topic, message):
     """Отправляет сообщение в Kafka"""
-    producer = get_producer()
-    producer.produce(topic, key="chat", value=message)
-    producer.flush()
+    produce(topic, message, key="chat")
@@ -0,0 +1,230 @@
+import bisect
+import contextvars
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from confluent_kafka import TopicPartition
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм задержки (сек): от долей миллисекунды до секунд
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Действие, которое обрабатывается в текущем потоке/задаче: к нему относятся команды MongoDB
+current_action = contextvars.ContextVar("current_action", default="none")
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def _key(self, labels):
+        if len(labels) != len(self.label_names):
+            raise ValueError(f"{self.name}: ожидались метки {self.label_names}")
+        return tuple(str(value) for value in labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            series = dict(self._series)
+        for key, value in sorted(series.items()):
+            lines.extend(self._render_series(key, value))
+        return lines
+
+    def _render_series(self, key, value):
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def touch(self, *labels):
+        """Создаёт серию с нулевым значением, чтобы она была видна до первого события"""
+        key = self._key(labels)
+        with self._lock:
+            self._series.setdefault(key, 0)
+
+    def total(self):
+        """Сумма по всем сериям"""
+        with self._lock:
+            return sum(self._series.values())
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, *labels, value):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = value
+
+    def inc(self, *labels, amount=1):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_series(self):
+        # Счётчики по корзинам (последняя — +Inf), сумма и количество наблюдений
+        return [[0] * (len(self.buckets) + 1), 0.0, 0]
+
+    def observe(self, *labels, value):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = self._new_series()
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def touch(self, *labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series.setdefault(key, self._new_series())
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            series = {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+        for key, (counts, total, count) in sorted(series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.label_names, key, [("le", _format_value(float(bound)))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+REQUESTS = Counter("eventms_requests_total", "Обработанные запросы по действиям", ["action"])
+ERRORS = Counter("eventms_request_errors_total", "Запросы, завершившиеся ошибкой", ["action", "kind"])
+DECODE_SECONDS = Histogram("eventms_decode_seconds", "Разбор сообщения Kafka", ["action"])
+HANDLER_SECONDS = Histogram("eventms_handler_seconds", "Выполнение обработчика действия", ["action"])
+MONGO_SECONDS = Histogram("eventms_mongo_seconds", "Команды MongoDB", ["action", "command"])
+PRODUCE_SECONDS = Histogram("eventms_produce_seconds", "Сериализация и отправка ответа", ["action"])
+CONSUMER_LAG = Gauge("eventms_consumer_lag", "Отставание Consumer от конца партиции", ["topic", "partition"])
+IN_FLIGHT = Gauge("eventms_in_flight", "Запросы, принятые в обработку и ещё не завершённые")
+DUPLICATES = Counter(
+    "eventms_duplicate_requests_total", "Повторно доставленные запросы на запись", ["action", "outcome"]
+)
+
+METRICS = [
+    REQUESTS, ERRORS, DECODE_SECONDS, HANDLER_SECONDS, MONGO_SECONDS, PRODUCE_SECONDS, CONSUMER_LAG, IN_FLIGHT, DUPLICATES,
+]
+
+
+def init_action_metrics(actions):
+    """Заводит серии для всех зарегистрированных действий, чтобы редкие действия были видны с нулями"""
+    for name in actions:
+        REQUESTS.touch(name)
+        HANDLER_SECONDS.touch(name)
+    IN_FLIGHT.set(value=0)
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def record_lag(consumer, msgs):
+    """Отставание по последнему прочитанному сообщению каждой партиции (по кэшированным watermark'ам)"""
+    last = {}
+    for msg in msgs:
+        if not msg.error():
+            last[(msg.topic(), msg.partition())] = msg
+    for (topic, partition), msg in last.items():
+        try:
+            _, high = consumer.get_watermark_offsets(TopicPartition(topic, partition), cached=True)
+        except Exception:
+            continue
+        if high is not None and high >= 0:
+            CONSUMER_LAG.set(topic, partition, value=max(0, high - msg.offset() - 1))
+
+
+class MongoMetricsListener(monitoring.CommandListener):
+    """Время команд MongoDB с привязкой к действию, в рамках которого они выполняются"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_SECONDS.observe(current_action.get(), event.command_name, value=event.duration_micros / 1e6)
+
+    def failed(self, event):
+        MONGO_SECONDS.observe(current_action.get(), event.command_name, value=event.duration_micros / 1e6)
+        ERRORS.inc(current_action.get(), "mongo")
+
+
+mongo_listener = MongoMetricsListener()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_metrics().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(host: str, port: int):
+    """Поднимает HTTP-сервер /metrics в фоновом потоке"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True)
+    thread.start()
+    logger.info("Метрики доступны на http://%s:%s/metrics", host, port)
+    return server
@@ -0,0 +1,74 @@
+import base64
+
+from bson import json_util
+
+from app.core.service_config import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.utils.projection import is_inclusion
+
+
+def encode_cursor(values: list) -> str:
+    """Кодирует значения ключа сортировки последнего документа в непрозрачный токен"""
+    raw = json_util.dumps(values).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(token: str) -> list:
+    try:
+        return json_util.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+    except (ValueError, TypeError):
+        raise ValueError("Некорректный cursor")
+
+
+def page_limit(data: dict, default: int = DEFAULT_PAGE_SIZE) -> int:
+    limit = int(data.get("limit") or default)
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def _after_value(field, direction, value):
+    """Условие «значение поля идёт после value» с учётом того, что null сортируется первым"""
+    if direction == 1:
+        if value is None:
+            return {field: {"$ne": None}}
+        return {field: {"$gt": value}}
+
+    if value is None:
+        return None
+    return {"$or": [{field: {"$lt": value}}, {field: None}]}
+
+
+def keyset_filter(sort: list, values: list) -> dict:
+    """Фильтр документов, следующих за курсором, для сортировки [(field, direction), ...]"""
+    branches = []
+    for i, (field, direction) in enumerate(sort):
+        condition = _after_value(field, direction, values[i])
+        if condition is None:
+            continue
+        equal = {sort[j][0]: values[j] for j in range(i)}
+        branches.append({**equal, **condition})
+    return {"$or": branches} if branches else {"_id": {"$exists": False}}
+
+
+def page_query(query: dict, sort: list, cursor) -> dict:
+    """Добавляет к запросу условие keyset-пагинации, если передан cursor"""
+    if not cursor:
+        return query
+    values = decode_cursor(cursor)
+    if len(values) != len(sort):
+        raise ValueError("Некорректный cursor")
+    return {"$and": [query, keyset_filter(sort, values)]}
+
+
+def with_sort_fields(projection: dict, sort: list) -> dict:
+    """Гарантирует, что поля сортировки попадут в документ — из них строится next_cursor"""
+    if not is_inclusion(projection):
+        return projection
+    return {**projection, **{field: 1 for field, _ in sort if field != "_id"}}
+
+
+def build_page(docs: list, sort: list, limit: int):
+    """Обрезает выборку из limit + 1 документов до страницы и возвращает (docs, next_cursor)"""
+    if len(docs) <= limit:
+        return docs, None
+    docs = docs[:limit]
+    last = docs[-1]
+    return docs, encode_cursor([last.get(field) for field, _ in sort])
@@ -0,0 +1,38 @@
+import re
+
+_FIELD_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*$")
+
+# Значения параметра fields, означающие «документ целиком»
+ALL_FIELDS = ("all", "*")
+
+
+def build_projection(fields, default_fields, hidden_fields=(), computed=None) -> dict:
+    """Строит серверную проекцию по параметру fields.
+
+    fields не передан — используется облегчённый набор default_fields (и вычисляемые поля computed);
+    "all" — весь документ без служебных hidden_fields; список или строка через запятую — только эти поля.
+    """
+    if fields in ALL_FIELDS:
+        return {field: 0 for field in hidden_fields}
+
+    if not fields:
+        projection = {field: 1 for field in default_fields}
+        projection.update(computed or {})
+        return projection
+
+    if isinstance(fields, str):
+        fields = fields.split(",")
+
+    projection = {}
+    for field in fields:
+        field = str(field).strip()
+        if not _FIELD_RE.match(field):
+            raise ValueError(f"Некорректное имя поля: {field}")
+        if field.split(".")[0] not in hidden_fields:
+            projection[field] = 1
+    return projection or {"_id": 1}
+
+
+def is_inclusion(projection: dict) -> bool:
+    """True, если проекция перечисляет нужные поля (а не исключает лишние)"""
+    return any(value != 0 for field, value in projection.items() if field != "_id")
@@ -0,0 +1,59 @@
+import json
+from datetime import date, datetime
+
+from bson import ObjectId
+from pydantic import HttpUrl
+
+try:
+    import orjson
+except ImportError:  # orjson не установлен — работаем на стандартном json
+    orjson = None
+
+# Документы MongoDB уходят в ответы как есть: ObjectId, datetime и HttpUrl
+# преобразуются прямо при кодировании, без предварительного обхода словаря
+
+
+def _default(obj):
+    if isinstance(obj, (ObjectId, HttpUrl)):
+        return str(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    JSON_BACKEND = "orjson"
+
+    def dumps(obj) -> bytes:
+        """Кодирует объект в JSON (UTF-8) за один проход"""
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+    def dumps_pretty(obj) -> str:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_INDENT_2).decode("utf-8")
+
+    def loads(data):
+        return orjson.loads(data)
+
+else:
+    JSON_BACKEND = "json"
+
+    def dumps(obj) -> bytes:
+        """Кодирует объект в JSON (UTF-8) за один проход"""
+        return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def dumps_pretty(obj) -> str:
+        return json.dumps(obj, default=_default, ensure_ascii=False, indent=2)
+
+    def loads(data):
+        return json.loads(data)
+
+
+def to_bson(obj):
+    """Приводит данные модели к виду для записи в MongoDB: HttpUrl и ObjectId хранятся строками"""
+    if isinstance(obj, (ObjectId, HttpUrl)):
+        return str(obj)
+    if isinstance(obj, list):
+        return [to_bson(item) for item in obj]
+    if isinstance(obj, dict):
+        return {key: to_bson(value) for key, value in obj.items()}
+    return obj
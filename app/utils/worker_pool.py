@@ -0,0 +1,128 @@
+import itertools
+import logging
+import queue
+import threading
+import time
+
+from confluent_kafka import TopicPartition
+
+logger = logging.getLogger(__name__)
+
+
+class KeyedWorkerPool:
+    """Пул потоков: задачи с одинаковым ключом выполняются строго по порядку одним потоком"""
+
+    def __init__(self, size, queue_size):
+        self._size = size
+        self._queues = [queue.Queue(maxsize=queue_size) for _ in range(size)]
+        self._round_robin = itertools.count()
+        # Дедлайн остановки истёк: потоки завершают текущую задачу и выходят, не беря следующих
+        self._abandon = threading.Event()
+        self._threads = [
+            threading.Thread(target=self._worker, args=(q,), name=f"handler-worker-{i}", daemon=True)
+            for i, q in enumerate(self._queues)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, key, fn, *args):
+        """Ставит задачу в очередь потока, закреплённого за ключом. Блокирует, если очередь заполнена"""
+        if key is None:
+            index = next(self._round_robin) % self._size
+        else:
+            index = hash(key) % self._size
+        self._queues[index].put((fn, args))
+
+    def in_flight(self):
+        return sum(q.unfinished_tasks for q in self._queues)
+
+    def shutdown(self, wait=True, timeout=None):
+        """Дорабатывает уже поставленные задачи и останавливает потоки.
+
+        С timeout ждёт не дольше указанного времени (включая постановку сигнала остановки в заполненную
+        очередь); возвращает True, если все потоки завершились. Если не успели, ещё не начатые задачи
+        не выполняются: потоки завершают текущую задачу и выходят (дождаться их — join).
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for q in self._queues:
+            try:
+                q.put(None, timeout=self._remaining(deadline))
+            except queue.Full:
+                pass
+        if not wait:
+            return False
+        if self.join(self._remaining(deadline)):
+            return True
+        self._abandon.set()
+        return False
+
+    def join(self, timeout=None):
+        """Ждёт завершения потоков не дольше timeout. Возвращает True, если все завершились"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(self._remaining(deadline))
+        return not any(thread.is_alive() for thread in self._threads)
+
+    @staticmethod
+    def _remaining(deadline):
+        return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+    def _worker(self, q):
+        while not self._abandon.is_set():
+            item = q.get()
+            try:
+                if item is None:
+                    return
+                fn, args = item
+                fn(*args)
+            except Exception as e:
+                logger.error("Ошибка в обработчике пула: %s", e)
+            finally:
+                q.task_done()
+
+
+class OffsetTracker:
+    """Отслеживает незавершённые offset'ы по партициям, чтобы коммитить только обработанный префикс"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._next = {}
+        self._committed = {}
+
+    def start(self, topic, partition, offset):
+        tp = (topic, partition)
+        with self._lock:
+            self._pending.setdefault(tp, set()).add(offset)
+            self._next[tp] = max(self._next.get(tp, 0), offset + 1)
+
+    def done(self, topic, partition, offset):
+        with self._lock:
+            pending = self._pending.get((topic, partition))
+            if pending is not None:
+                pending.discard(offset)
+
+    def committable(self):
+        """Возвращает offset'ы для коммита: до наименьшего незавершённого сообщения в каждой партиции"""
+        offsets = []
+        with self._lock:
+            for tp, next_offset in self._next.items():
+                pending = self._pending.get(tp)
+                position = min(pending) if pending else next_offset
+                if self._committed.get(tp) != position:
+                    offsets.append(TopicPartition(tp[0], tp[1], position))
+        return offsets
+
+    def mark_committed(self, offsets):
+        with self._lock:
+            for tp in offsets:
+                self._committed[(tp.topic, tp.partition)] = tp.offset
+
+    def forget(self, partitions):
+        """Сбрасывает состояние отозванных при ребалансе партиций"""
+        with self._lock:
+            for tp in partitions:
+                key = (tp.topic, tp.partition)
+                self._pending.pop(key, None)
+                self._next.pop(key, None)
+                self._committed.pop(key, None)
@@ -0,0 +1,422 @@
+"""Офлайн-бенчмарк: смесь действий из Event.md через process_new_message на заглушках MongoDB и Kafka.
+
+Не требует брокера и сервера MongoDB: база — in-memory mongomock (MONGO_BACKEND=mongomock),
+Producer — заглушка, сразу подтверждающая доставку. Для каждого действия печатает ops/sec, p50 и p99.
+
+    python -m benchmarks.bench_action_mix --requests 5000
+    python -m benchmarks.bench_action_mix --save-baseline      # записать benchmarks/baselines/action_mix.json
+    python -m benchmarks.bench_action_mix --compare            # сравнить с сохранённой базовой линией
+
+--target services вызывает обработчики из реестра напрямую, минуя разбор сообщения и отправку ответа.
+
+Ограничение mongomock: он не выполняет $lookup с pipeline и $setIntersection и неверно выполняет
+update-pipeline (записывает {"$literal": ...} вместо значения и не проверяет лимит мест), поэтому
+get_upcoming_events (лента), search_events (поиск), register_volunteer и unregister_volunteer на нём
+не измеряются. Такие действия определяются пробным прогоном: действие считается поддерживаемым, если оно
+ответило без ошибки и, для записей из VERIFIERS, сохранило в базе ожидаемое состояние. Неподдерживаемые
+исключаются из смеси, а отчёт начинается с покрытия смеси и списка исключённых.
+Покрытие записывается в базовую линию, и --compare предупреждает, если оно у прогонов разное.
+
+Полная смесь — на настоящем mongod (отдельная база, она очищается перед прогоном):
+
+    MONGO_BACKEND=mongodb MONGO_URI=mongodb://localhost:27017 MONGO_DB_NAME=events_bench \
+        python -m benchmarks.bench_action_mix --save-baseline
+"""
+import os
+
+os.environ.setdefault("MONGO_BACKEND", "mongomock")
+os.environ.setdefault("MONGO_ENSURE_INDEXES", "false")
+os.environ.setdefault("ENTITY_CACHE_ENABLED", "true")
+
+import argparse  # noqa: E402
+import itertools  # noqa: E402
+import json  # noqa: E402
+import random  # noqa: E402
+import time  # noqa: E402
+from datetime import datetime, timedelta  # noqa: E402
+from pathlib import Path  # noqa: E402
+
+from bson import ObjectId  # noqa: E402
+
+from app.cli.consumer import decode_message, is_error_response, process_new_message  # noqa: E402
+from app.core.mongo_config import MONGO_BACKEND, MONGO_DB_NAME, client, db  # noqa: E402
+from app.core.logging_config import setup_logging  # noqa: E402
+from app.core.registry import get_action  # noqa: E402
+from app.utils.kafka_helper import install_producer  # noqa: E402
+from app.utils.serialization import dumps, loads  # noqa: E402
+
+DEFAULT_BASELINE = Path(__file__).parent / "baselines" / "action_mix.json"
+
+# Доли действий в смеси: чтение преобладает, как в рабочем трафике клиента
+ACTION_MIX = {
+    "get_event_by_id": 16,
+    "get_upcoming_events": 8,
+    "get_user_events": 6,
+    "search_events": 6,
+    "get_events_with_user_as_volunteer": 3,
+    "get_tasks_by_user": 8,
+    "get_tasks_by_event": 5,
+    "get_task_by_id": 8,
+    "get_task_comments": 4,
+    "get_tasks_assigned_by_user": 2,
+    "get_chat_messages": 8,
+    "add_chat_message": 6,
+    "add_task_comment": 3,
+    "register_volunteer": 3,
+    "unregister_volunteer": 2,
+    "update_event": 2,
+    "create_event": 1,
+    "assign_task": 2,
+    "change_task_status": 2,
+    "update_task": 1,
+}
+
+CATEGORIES = ["Экология", "Спорт", "Образование", "Культура", "Помощь животным"]
+TASK_STATUSES = ["pending", "in_progress", "completed"]
+WORDS = ["субботник", "парк", "марафон", "лекция", "приют", "фестиваль", "уборка", "турнир", "выставка"]
+
+
+class FakeMessage:
+    """Минимальный аналог confluent_kafka.Message для callback'ов доставки и decode_message"""
+
+    def __init__(self, topic, value, key=None):
+        self._topic, self._value, self._key = topic, value, key
+
+    def topic(self):
+        return self._topic
+
+    def value(self):
+        return self._value
+
+    def key(self):
+        return self._key
+
+    def partition(self):
+        return 0
+
+    def offset(self):
+        return 0
+
+    def error(self):
+        return None
+
+
+class FakeProducer:
+    """Producer, мгновенно «доставляющий» сообщения; хранит только последнее для проверки ответа"""
+
+    def __init__(self):
+        self.produced = 0
+        self.last = None
+
+    def produce(self, topic, key=None, value=None, on_delivery=None):
+        self.produced += 1
+        self.last = value
+        if on_delivery is not None:
+            on_delivery(None, FakeMessage(topic, value, key))
+
+    def poll(self, timeout=0):
+        return 0
+
+    def flush(self, timeout=None):
+        return 0
+
+
+class Workload:
+    """Генерирует данные запросов по идентификаторам, созданным при наполнении базы"""
+
+    def __init__(self, rng):
+        self.rng = rng
+        # Идентификаторы пользователей — в формате ObjectId, как их присылает сервис пользователей
+        self.users = [f"{i:024x}" for i in range(1, 201)]
+        self.events = []
+        self.chats = []
+        self.tasks = []
+        # Записи (event_id, user_id), которые можно отменить через unregister_volunteer
+        self.registrations = []
+
+    def event_payload(self):
+        title = " ".join(self.rng.sample(WORDS, 2)).capitalize()
+        return {
+            "title": title,
+            "description": f"{title}: приглашаем волонтёров, " + " ".join(self.rng.sample(WORDS, 4)),
+            "start_datetime": (datetime.utcnow() + timedelta(days=self.rng.randint(1, 90))).isoformat(),
+            "location": "Москва",
+            "required_volunteers": self.rng.randint(5, 30),
+            "category": self.rng.choice(CATEGORIES),
+            "status": "active",
+            "created_by": self.rng.choice(self.users),
+        }
+
+    def task_payload(self):
+        return {
+            "title": f"Задача: {self.rng.choice(WORDS)}",
+            "description": "Подготовить инвентарь",
+            "assigned_to": self.rng.choice(self.users),
+            "event_id": self.rng.choice(self.events),
+            "created_by": self.rng.choice(self.users),
+            "deadline": (datetime.utcnow() + timedelta(hours=self.rng.randint(1, 500))).isoformat(),
+        }
+
+    def registration(self):
+        event_id, user_id = self.rng.choice(self.events), self.rng.choice(self.users)
+        self.registrations.append((event_id, user_id))
+        return {"_id": event_id, "user_id": user_id}
+
+    def unregistration(self):
+        if not self.registrations:
+            return self.registration()
+        event_id, user_id = self.registrations.pop(self.rng.randrange(len(self.registrations)))
+        return {"_id": event_id, "user_id": user_id}
+
+    def data(self, action):
+        rng = self.rng
+        user_id = rng.choice(self.users)
+        builders = {
+            "get_event_by_id": lambda: {"_id": rng.choice(self.events)},
+            "get_upcoming_events": lambda: {"limit": 10, "category": rng.choice(CATEGORIES + ["all"])},
+            "get_user_events": lambda: {"user_id": user_id, "limit": 20},
+            "search_events": lambda: {"query": rng.choice(WORDS)[:rng.randint(3, 6)], "limit": 20},
+            "get_events_with_user_as_volunteer": lambda: {"user_id": user_id, "limit": 20},
+            "get_tasks_by_user": lambda: {"user_id": user_id, "limit": 20},
+            "get_tasks_by_event": lambda: {"event_id": rng.choice(self.events), "limit": 20},
+            "get_task_by_id": lambda: {"task_id": rng.choice(self.tasks)},
+            "get_task_comments": lambda: {"task_id": rng.choice(self.tasks), "limit": 20},
+            "get_tasks_assigned_by_user": lambda: {"user_id": user_id, "limit": 20},
+            "get_chat_messages": lambda: {"chat_id": rng.choice(self.chats), "limit": 50},
+            "add_chat_message": lambda: {"chat_id": rng.choice(self.chats), "author": user_id, "message": "Привет!"},
+            "add_task_comment": lambda: {"task_id": rng.choice(self.tasks), "user_id": user_id, "text": "Сделано"},
+            "register_volunteer": self.registration,
+            "unregister_volunteer": self.unregistration,
+            "update_event": lambda: {"_id": rng.choice(self.events), "description": "Обновлённое описание"},
+            "create_event": self.event_payload,
+            "assign_task": self.task_payload,
+            "change_task_status": lambda: {"task_id": rng.choice(self.tasks), "status": rng.choice(TASK_STATUSES)},
+            "update_task": lambda: {"_id": rng.choice(self.tasks), "description": "Уточнённое описание"},
+        }
+        return builders[action]()
+
+
+def call_handler(action, data):
+    spec = get_action(action)
+    return spec.handler(data, action)
+
+
+def seed(workload, events, tasks, messages):
+    """Наполняет базу через сами обработчики, чтобы документы совпадали с рабочими"""
+    for _ in range(events):
+        event = call_handler("create_event", workload.event_payload())["message"]["event"]
+        workload.events.append(str(event["_id"]))
+        workload.chats.append(event["chat_id"])
+
+    for _ in range(tasks):
+        task = call_handler("assign_task", workload.task_payload())["message"]["task"]
+        workload.tasks.append(str(task["_id"]))
+
+    for _ in range(messages):
+        call_handler("add_chat_message", workload.data("add_chat_message"))
+        call_handler("add_task_comment", workload.data("add_task_comment"))
+
+
+def seed_registrations(workload, count):
+    """Записи волонтёров — только если хранилище выполняет их правильно (иначе они испортят документы)"""
+    for _ in range(count):
+        call_handler("register_volunteer", workload.data("register_volunteer"))
+
+
+def _event_members(event_id):
+    event = db.events.find_one({"_id": ObjectId(event_id)}, {"volunteers": 1, "waitlist": 1, "required_volunteers": 1})
+    return event.get("volunteers", []), event.get("waitlist", []), event.get("required_volunteers", 0)
+
+
+def _verify_members(data, registered):
+    volunteers, waitlist, required = _event_members(data["_id"])
+    if not all(isinstance(user, str) for user in volunteers + waitlist) or len(volunteers) > required:
+        return False
+    return (data["user_id"] in volunteers + waitlist) == registered
+
+
+def _verify_update_event(data):
+    event = db.events.find_one({"_id": ObjectId(data["_id"])}, {"description": 1})
+    return event.get("description") == data["description"]
+
+
+# Записи, для которых ответа без ошибки мало: проверяем, что в базе сохранено ожидаемое состояние
+VERIFIERS = {
+    "register_volunteer": lambda data: _verify_members(data, True),
+    "unregister_volunteer": lambda data: _verify_members(data, False),
+    "update_event": _verify_update_event,
+}
+
+
+def make_runner(target, producer):
+    if target == "services":
+        def run(action, data):
+            return not is_error_response(call_handler(action, data))
+        return run
+
+    request_ids = itertools.count()
+
+    def run(action, data):
+        # Полный путь сообщения: JSON из Kafka -> decode_message -> process_new_message -> ответ в Producer.
+        # request_id уникален: иначе запись отвечала бы сохранённым ответом без обращения к обработчику
+        raw = dumps({"request_id": f"bench-{next(request_ids)}", "message": {"action": action, "data": data}})
+        request_id, action, message = decode_message(FakeMessage("event_requests", raw))
+        process_new_message(action, request_id, message)
+        return producer.last is not None and not is_error_response(loads(producer.last)["message"])
+    return run
+
+
+def probe(actions, workload, run, attempts=3):
+    """Оставляет действия, которые хранилище выполняет правильно: хотя бы одна попытка без ошибки,
+    а у записей из VERIFIERS каждый успешный ответ подтверждён состоянием базы"""
+    supported, skipped = [], []
+    for action in actions:
+        verify = VERIFIERS.get(action)
+        answered = wrong = False
+        for _ in range(attempts):
+            data = workload.data(action)
+            try:
+                ok = run(action, data)
+                wrong = ok and verify is not None and not verify(data)
+            except Exception:
+                ok = False
+            answered = answered or ok
+            if wrong:
+                break
+        (supported if answered and not wrong else skipped).append(action)
+    return supported, skipped
+
+
+def percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+def run_mix(workload, run, actions, requests):
+    weights = [ACTION_MIX[action] for action in actions]
+    timings = {action: [] for action in actions}
+    errors = {action: 0 for action in actions}
+
+    started = time.perf_counter()
+    for action in workload.rng.choices(actions, weights=weights, k=requests):
+        data = workload.data(action)
+        call_started = time.perf_counter()
+        if not run(action, data):
+            errors[action] += 1
+        timings[action].append(time.perf_counter() - call_started)
+    wall = time.perf_counter() - started
+
+    results = {}
+    for action, values in timings.items():
+        if not values:
+            continue
+        values.sort()
+        busy = sum(values)
+        results[action] = {
+            "count": len(values),
+            "errors": errors[action],
+            "ops_per_sec": round(len(values) / busy, 1),
+            "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+            "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+        }
+    results["_total"] = {"count": requests, "ops_per_sec": round(requests / wall, 1)}
+    return results
+
+
+def coverage(actions, skipped) -> dict:
+    """Какая доля смеси (по весам ACTION_MIX) реально измерена и на каком хранилище"""
+    total = sum(ACTION_MIX.values())
+    return {
+        "backend": MONGO_BACKEND,
+        "covered_weight_pct": round(sum(ACTION_MIX[action] for action in actions) / total * 100, 1),
+        "excluded": sorted(skipped),
+    }
+
+
+def print_coverage(meta, baseline_meta=None, comparing=False):
+    total = sum(ACTION_MIX.values())
+    print(f"Хранилище: {meta['backend']}; измерено {meta['covered_weight_pct']}% смеси по весам")
+    if meta["excluded"]:
+        excluded = ", ".join(f"{action} ({ACTION_MIX[action] / total:.0%})" for action in meta["excluded"])
+        print(f"НЕ ИЗМЕРЕНЫ (не поддерживаются хранилищем): {excluded}")
+        print("Итоговые ops/s и сравнение с базовой линией не отражают эти действия")
+    if comparing and baseline_meta != meta:
+        print(f"ВНИМАНИЕ: покрытие базовой линии другое: {baseline_meta} — сравнение итогов некорректно")
+    print()
+
+
+def print_report(results, baseline=None):
+    header = f"{'действие':<36} {'n':>6} {'ops/s':>10} {'p50, мс':>9} {'p99, мс':>9}"
+    if baseline:
+        header += f" {'Δ ops/s':>9} {'Δ p99':>8}"
+    print(header)
+    for action, row in sorted(results.items()):
+        if action.startswith("_"):
+            continue
+        line = f"{action:<36} {row['count']:>6} {row['ops_per_sec']:>10.1f} {row['p50_ms']:>9.3f} {row['p99_ms']:>9.3f}"
+        base = (baseline or {}).get(action)
+        if base:
+            line += f" {_delta(row['ops_per_sec'], base['ops_per_sec']):>9} {_delta(row['p99_ms'], base['p99_ms']):>8}"
+        if row.get("errors"):
+            line += f"  ошибок: {row['errors']}"
+        print(line)
+    total = results["_total"]
+    print(f"{'всего':<36} {total['count']:>6} {total['ops_per_sec']:>10.1f}")
+    if baseline and "_total" in baseline:
+        print(f"Δ общей пропускной способности: {_delta(total['ops_per_sec'], baseline['_total']['ops_per_sec'])}")
+
+
+def _delta(current, base):
+    if not base:
+        return "—"
+    return f"{(current - base) / base * 100:+.1f}%"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=["pipeline", "services"], default="pipeline")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--events", type=int, default=300)
+    parser.add_argument("--tasks", type=int, default=1000)
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="записать результаты как базовую линию")
+    parser.add_argument("--compare", action="store_true", help="сравнить с базовой линией")
+    args = parser.parse_args(argv)
+
+    # Ошибки обработчиков учитываются в отчёте, в лог пишем только критичное
+    setup_logging("CRITICAL", "text")
+    producer = FakeProducer()
+    install_producer(producer)
+
+    if MONGO_BACKEND == "mongodb":
+        # Прогон пишет и очищает базу — рабочую по умолчанию не трогаем
+        if MONGO_DB_NAME == "events":
+            parser.error("на настоящем mongod задайте отдельную базу: MONGO_DB_NAME=events_bench")
+        client.drop_database(MONGO_DB_NAME)
+
+    workload = Workload(random.Random(args.seed))
+    seed(workload, args.events, args.tasks, args.messages)
+
+    run = make_runner(args.target, producer)
+    actions, skipped = probe(list(ACTION_MIX), workload, run)
+    if "register_volunteer" in actions:
+        seed_registrations(workload, args.messages)
+
+    results = run_mix(workload, run, actions, args.requests)
+    results["_meta"] = coverage(actions, skipped)
+
+    baselines = json.loads(args.baseline.read_text("utf-8")) if args.baseline.exists() else {}
+    baseline = baselines.get(args.target) if args.compare else None
+    print_coverage(results["_meta"], (baseline or {}).get("_meta"), comparing=baseline is not None)
+    print_report(results, baseline)
+
+    if args.save_baseline:
+        baselines[args.target] = results
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(baselines, indent=2, ensure_ascii=False, sort_keys=True) + "\n", "utf-8")
+        print(f"Базовая линия сохранена: {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
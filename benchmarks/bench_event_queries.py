@@ -0,0 +1,104 @@
+"""Сравнение задержки однопроходных запросов ($facet/$lookup) с прежними многозапросными версиями.
+
+Обе стороны читают одинаковые данные — ту же проекцию (карточки или fields=all), сортировку и размер страницы,
+так что разница показывает только цену нескольких запросов против одного.
+
+Запуск против базы из app/core/mongo_config.py:
+
+    python -m benchmarks.bench_event_queries --user-id USER_ID --iterations 200
+"""
+import argparse
+import statistics
+import time
+from datetime import datetime
+
+from app.core.mongo_config import db
+from app.services.event_service import (
+    EVENT_LIST_SORT,
+    event_list_projection,
+    get_upcoming_events_service,
+    get_user_events_service,
+)
+from app.utils.pagination import page_limit, with_sort_fields
+
+
+def convert_datetime_fields(event):
+    for field in ["start_datetime", "created_at", "updated_at"]:
+        if field in event and isinstance(event[field], datetime):
+            event[field] = event[field].isoformat()
+    return event
+
+
+def legacy_get_user_events(data):
+    """Прежняя версия: два отдельных курсора по created_by и volunteers (с той же страницей, что и $facet)"""
+    projection = with_sort_fields(event_list_projection(data), EVENT_LIST_SORT)
+    limit = page_limit(data) + 1
+
+    created_events = []
+    for event in db.events.find({"created_by": data["user_id"]}, projection).sort(EVENT_LIST_SORT).limit(limit):
+        event["_id"] = str(event["_id"])
+        created_events.append(convert_datetime_fields(event))
+
+    volunteer_events = []
+    for event in db.events.find({"volunteers": data["user_id"]}, projection).sort(EVENT_LIST_SORT).limit(limit):
+        event["_id"] = str(event["_id"])
+        volunteer_events.append(convert_datetime_fields(event))
+
+    return created_events, volunteer_events
+
+
+def legacy_get_upcoming_events(data):
+    """Прежняя версия: выборка и два полных count_documents (с той же проекцией, что и $lookup)"""
+    query = {"start_datetime": {"$gt": datetime.utcnow()}, "status": "active"}
+    events = []
+    cursor = db.events.find(query, event_list_projection(data)).sort("start_datetime", 1).limit(data["limit"])
+    for event in cursor:
+        event["_id"] = str(event["_id"])
+        events.append(convert_datetime_fields(event))
+
+    completed_count = db.events.count_documents({"status": "completed"})
+    active_count = db.events.count_documents({"status": "active"})
+    return events, completed_count, active_count
+
+
+def measure(fn, iterations):
+    fn()  # прогрев соединения и кэшей сервера
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        "mean": statistics.fmean(timings),
+        "p50": timings[len(timings) // 2],
+        "p99": timings[min(len(timings) - 1, int(len(timings) * 0.99))],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user-id", required=True)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--page-size", type=int, default=None, help="limit страницы get_user_events")
+    parser.add_argument("--fields", default=None, help="проекция обеих сторон, например all (по умолчанию карточки)")
+    parser.add_argument("--iterations", type=int, default=100)
+    args = parser.parse_args(argv)
+
+    user_data = {"user_id": args.user_id, "limit": args.page_size, "fields": args.fields}
+    upcoming_data = {"limit": args.limit, "fields": args.fields}
+    cases = [
+        ("get_user_events / legacy", lambda: legacy_get_user_events(user_data)),
+        ("get_user_events / $facet", lambda: get_user_events_service(dict(user_data), "get_user_events")),
+        ("get_upcoming_events / legacy", lambda: legacy_get_upcoming_events(upcoming_data)),
+        ("get_upcoming_events / $lookup", lambda: get_upcoming_events_service(dict(upcoming_data), "get_upcoming_events")),
+    ]
+
+    print(f"{'вариант':<32} {'mean, мс':>10} {'p50, мс':>10} {'p99, мс':>10}")
+    for name, fn in cases:
+        result = measure(fn, args.iterations)
+        print(f"{name:<32} {result['mean']:>10.2f} {result['p50']:>10.2f} {result['p99']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
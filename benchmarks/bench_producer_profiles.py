@@ -0,0 +1,163 @@
+"""Сравнение профилей Producer (latency / balanced / throughput) на потоке типичных ответов сервиса.
+
+Отправляет --messages ответов в --topic через отдельный Producer каждого профиля и измеряет пропускную
+способность, задержку подтверждения доставки (p50/p99) и степень сжатия по статистике librdkafka.
+Нужен доступный брокер (KAFKA_BROKERS); топик лучше завести отдельный, чтобы не мешать потребителям ответов:
+
+    python -m benchmarks.bench_producer_profiles --topic event_responses_bench --messages 20000
+
+Без брокера (--spread-only) считается только распределение ответов по партициям для разных ключей —
+прежнего постоянного "user", request_id и адресата ответа:
+
+    python -m benchmarks.bench_producer_profiles --spread-only --partitions 12
+"""
+import argparse
+import json
+import random
+import time
+import zlib
+from collections import Counter
+from datetime import datetime
+
+from bson import ObjectId
+from confluent_kafka import Producer
+
+from app.cli.producer import build_response, response_key
+from app.core.kafka_config import KAFKA_BROKERS, PRODUCER_PROFILES, producer_config
+from app.utils.serialization import dumps
+from benchmarks.bench_serialization import make_event, make_task
+
+
+def make_responses(count, users, rng):
+    """Смесь ответов: карточка мероприятия, список задач, уведомление о задаче конкретному пользователю"""
+    now = datetime.utcnow()
+    user_ids = [str(ObjectId()) for _ in range(users)]
+    responses = []
+    for i in range(count):
+        kind = rng.random()
+        if kind < 0.4:
+            message = {"action": "get_event_by_id", "message": {"status": "success", "event": make_event(i, now)}}
+        elif kind < 0.7:
+            tasks = [make_task(j, now) for j in range(10)]
+            message = {"action": "get_tasks_by_event", "message": {"status": "success", "tasks": tasks}}
+        else:
+            message = {
+                "action": "assign_task",
+                "message": {
+                    "status": "success",
+                    "task": make_task(i, now),
+                    "forward_to": [rng.choice(user_ids)],
+                },
+            }
+        responses.append((str(ObjectId()), message))
+    return responses
+
+
+def partition_for(key, partitions):
+    # consistent_random в librdkafka: CRC32 ключа по модулю числа партиций, без ключа — случайная партиция
+    if key is None:
+        return random.randrange(partitions)
+    return zlib.crc32(key.encode("utf-8")) % partitions
+
+
+def report_spread(responses, partitions):
+    modes = [
+        ("константа \"user\"", lambda request_id, message: "user"),
+        ("request_id", lambda request_id, message: response_key(request_id, message, mode="request_id")),
+        ("адресат (user)", lambda request_id, message: response_key(request_id, message, mode="user")),
+    ]
+    print(f"{'ключ':<22} {'партиций занято':>16} {'макс. доля':>12} {'мин. доля':>12}")
+    for name, key_fn in modes:
+        counts = Counter(partition_for(key_fn(request_id, message), partitions) for request_id, message in responses)
+        shares = [counts.get(p, 0) / len(responses) for p in range(partitions)]
+        print(f"{name:<22} {len(counts):>16} {max(shares):>12.1%} {min(shares):>12.1%}")
+
+
+def run_profile(profile, topic, payloads, key_mode):
+    stats = {}
+    latencies = []
+    config = producer_config(profile, overrides=False)
+    config["statistics.interval.ms"] = 500
+    config["stats_cb"] = lambda raw: stats.update(json.loads(raw))
+    producer = Producer(config)
+
+    def on_delivery(sent_at):
+        def callback(err, msg):
+            if err is None:
+                latencies.append(time.perf_counter() - sent_at)
+        return callback
+
+    # Прогрев: соединение с брокером и метаданные топика не входят в замер
+    producer.produce(topic, value=b"warmup")
+    producer.flush(10)
+
+    started = time.perf_counter()
+    for request_id, message, value in payloads:
+        while True:
+            try:
+                producer.produce(
+                    topic, value=value, key=response_key(request_id, message, mode=key_mode),
+                    on_delivery=on_delivery(time.perf_counter())
+                )
+                break
+            except BufferError:
+                producer.poll(0.1)
+        producer.poll(0)
+    remaining = producer.flush(60)
+    elapsed = time.perf_counter() - started
+
+    # Последняя порция статистики приходит по интервалу — ждём её, чтобы учесть все пачки
+    time.sleep(1.0)
+    producer.poll(0)
+
+    latencies.sort()
+    uncompressed = sum(broker.get("txbytes", 0) for broker in stats.get("brokers", {}).values())
+    message_bytes = stats.get("txmsg_bytes", 0)
+    return {
+        "profile": profile,
+        "msg_per_sec": len(payloads) / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000 if latencies else float("nan"),
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else float("nan"),
+        "wire_ratio": uncompressed / message_bytes if message_bytes else float("nan"),
+        "undelivered": remaining,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--topic", default="event_responses_bench")
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=1000, help="различных адресатов ответов")
+    parser.add_argument("--profiles", default=",".join(PRODUCER_PROFILES))
+    parser.add_argument("--key", choices=["request_id", "user"], default="request_id")
+    parser.add_argument("--partitions", type=int, default=12, help="партиций топика ответов для --spread-only")
+    parser.add_argument("--spread-only", action="store_true", help="только распределение по партициям, без брокера")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    responses = make_responses(args.messages, args.users, rng)
+    report_spread(responses, args.partitions)
+    if args.spread_only:
+        return
+    if not KAFKA_BROKERS:
+        parser.error("не задан KAFKA_BROKERS (или используйте --spread-only)")
+
+    # Ответы сериализуются заранее: замеряется только Producer
+    payloads = [
+        (request_id, message, dumps(build_response(request_id, message)))
+        for request_id, message in responses
+    ]
+    average = sum(len(value) for _, _, value in payloads) / len(payloads)
+    print(f"\nответов: {len(payloads)}, средний размер {average:.0f} байт, ключ {args.key}")
+    print(f"{'профиль':<12} {'сообщ/с':>10} {'p50, мс':>9} {'p99, мс':>9} {'байт в сети/исходно':>20} {'не доставлено':>14}")
+    for profile in args.profiles.split(","):
+        result = run_profile(profile.strip(), args.topic, payloads, args.key)
+        print(
+            f"{result['profile']:<12} {result['msg_per_sec']:>10.0f} {result['p50_ms']:>9.2f} "
+            f"{result['p99_ms']:>9.2f} {result['wire_ratio']:>20.2f} {result['undelivered']:>14}"
+        )
+
+
+if __name__ == "__main__":
+    main()
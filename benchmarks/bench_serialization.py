@@ -0,0 +1,142 @@
+"""Сравнение прежней сериализации ответов (обход словаря + json.dumps с MongoJSONEncoder) с однопроходной.
+
+Работает без MongoDB и Kafka, на синтетических документах мероприятий и задач:
+
+    python -m benchmarks.bench_serialization --iterations 2000 --items 50
+"""
+import argparse
+import copy
+import json
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pydantic import HttpUrl, TypeAdapter
+
+from app.utils.serialization import JSON_BACKEND, dumps
+
+
+class MongoJSONEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, ObjectId):
+            return str(obj)
+        if isinstance(obj, datetime):
+            return obj.isoformat()
+        return super().default(obj)
+
+
+def legacy_serialize_event(event):
+    event["_id"] = str(event["_id"])
+    for field in ["created_at", "updated_at", "start_datetime", "end_datetime"]:
+        if field in event and isinstance(event[field], datetime):
+            event[field] = event[field].isoformat()
+    if "volunteers" in event and isinstance(event["volunteers"], list):
+        event["volunteers"] = [str(v) for v in event["volunteers"]]
+    return event
+
+
+def legacy_serialize_task(task):
+    task["_id"] = str(task["_id"])
+    task["assigned_to"] = str(task["assigned_to"])
+    if task.get("event_id"):
+        task["event_id"] = str(task["event_id"])
+    if "created_by" in task:
+        task["created_by"] = str(task["created_by"])
+    for field in ["created_at", "updated_at", "deadline"]:
+        if field in task and isinstance(task[field], datetime):
+            task[field] = task[field].isoformat()
+    if task.get("last_comment"):
+        comment = dict(task["last_comment"])
+        comment["_id"] = str(comment["_id"])
+        comment["created_at"] = comment["created_at"].isoformat()
+        task["last_comment"] = comment
+    return task
+
+
+def make_event(i, now):
+    return {
+        "_id": ObjectId(),
+        "title": f"Субботник в парке №{i}",
+        "description": "Уборка территории, посадка деревьев и покраска скамеек. " * 3,
+        "start_datetime": now + timedelta(days=i),
+        "location": "Москва, Парк Горького",
+        "required_volunteers": 20,
+        "photo_url": TypeAdapter(HttpUrl).validate_python(f"https://cdn.example.com/events/{i}.jpg"),
+        "category": "Экология",
+        "status": "active",
+        "created_by": str(ObjectId()),
+        "created_at": now,
+        "updated_at": now,
+        "volunteers": [str(ObjectId()) for _ in range(15)],
+        "waitlist": [],
+        "chat_id": str(ObjectId()),
+    }
+
+
+def make_task(i, now):
+    return {
+        "_id": ObjectId(),
+        "title": f"Задача {i}",
+        "description": "Подготовить инвентарь и встретить волонтёров",
+        "assigned_to": str(ObjectId()),
+        "event_id": ObjectId(),
+        "created_by": str(ObjectId()),
+        "status": "in_progress",
+        "deadline": now + timedelta(hours=i),
+        "created_at": now,
+        "updated_at": now,
+        "comments_count": 3,
+        "last_comment": {"_id": ObjectId(), "user_id": str(ObjectId()), "text": "Готово", "created_at": now},
+    }
+
+
+def legacy_response(key, docs, serialize):
+    # Прежний путь копирует документы (как и чтение из Mongo), обходит их, затем кодирует заново
+    docs = [serialize(copy.copy(doc)) for doc in docs]
+    return json.dumps({"request_id": "r", "message": {"status": "success", key: docs}}, cls=MongoJSONEncoder)
+
+
+def fast_response(key, docs):
+    return dumps({"request_id": "r", "message": {"status": "success", key: docs}})
+
+
+def measure(fn, iterations):
+    fn()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--items", type=int, default=50, help="документов в одном ответе")
+    args = parser.parse_args(argv)
+
+    now = datetime.utcnow()
+    events = [make_event(i, now) for i in range(args.items)]
+    tasks = [make_task(i, now) for i in range(args.items)]
+    # HttpUrl прежний encoder не умел: в базе он хранился строкой
+    legacy_events = [{**event, "photo_url": str(event["photo_url"])} for event in events]
+
+    cases = [
+        ("events / legacy", lambda: legacy_response("events", legacy_events, legacy_serialize_event)),
+        (f"events / {JSON_BACKEND}", lambda: fast_response("events", events)),
+        ("tasks / legacy", lambda: legacy_response("tasks", tasks, legacy_serialize_task)),
+        (f"tasks / {JSON_BACKEND}", lambda: fast_response("tasks", tasks)),
+    ]
+
+    print(f"{'вариант':<24} {'мкс/ответ':>12}")
+    results = {}
+    for name, fn in cases:
+        results[name] = measure(fn, args.iterations)
+        print(f"{name:<24} {results[name]:>12.1f}")
+
+    for kind in ("events", "tasks"):
+        speedup = results[f"{kind} / legacy"] / results[f"{kind} / {JSON_BACKEND}"]
+        print(f"{kind}: ускорение x{speedup:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,38 +1,15 @@
-import threading
-import signal
 import sys
-from app.cli.consumer import consume_messages
-
-# Глобальная переменная для управления Consumer
-consumer_running = True
-
-
-def signal_handler(sig, frame):
-    """Обрабатывает сигнал завершения программы (Ctrl+C)"""
-    global consumer_running
-    print("\n⏹️ Остановка Consumer...")
-    consumer_running = False
-
-
-def start_consumer():
-    """Запускает Consumer в отдельном потоке"""
-    thread = threading.Thread(target=consume_messages, daemon=True)
-    thread.start()
-    print("🔄 Consumer запущен...")
+from app.core.logging_config import setup_logging
+from app.core.service_config import WORKER_PROCESSES
 
 
 if __name__ == "__main__":
-    # Перехватываем сигналы остановки (Ctrl+C, kill)
-    signal.signal(signal.SIGINT, signal_handler)
-    signal.signal(signal.SIGTERM, signal_handler)
-
-    start_consumer()
+    setup_logging()
 
-    try:
-        while consumer_running:
-            pass
-    except KeyboardInterrupt:
-        signal_handler(None, None)
+    # WORKER_PROCESSES > 1 — несколько процессов в одной группе Consumer'ов под присмотром супервизора
+    if WORKER_PROCESSES > 1:
+        from app.cli.supervisor import run_supervisor
+        sys.exit(run_supervisor(WORKER_PROCESSES))
 
-    print("✅ Программа завершена.")
-    sys.exit(0)
+    from app.cli.service import run_service
+    sys.exit(run_service())
@@ -0,0 +1,30 @@
+import os
+
+# Тесты работают без сервера MongoDB и брокера Kafka: база — in-memory mongomock
+os.environ.setdefault("MONGO_BACKEND", "mongomock")
+os.environ.setdefault("MONGO_ENSURE_INDEXES", "false")
+os.environ.setdefault("METRICS_ENABLED", "false")
+
+import pytest  # noqa: E402
+
+from app.core.mongo_config import client, MONGO_BACKEND, MONGO_DB_NAME  # noqa: E402
+from app.utils.cache import event_cache, task_cache  # noqa: E402
+
+# С реальным сервером (MONGO_BACKEND=mongodb) тесты удаляют базу MONGO_DB_NAME — рабочую базу не трогаем
+if MONGO_BACKEND != "mongomock" and MONGO_DB_NAME == "events":
+    pytest.exit("Для тестов на реальном MongoDB укажите отдельную базу в MONGO_DB_NAME", returncode=2)
+
+# Pipeline-обновления ($expr, $literal, $slice) mongomock выполняет неверно: такие тесты требуют сервер
+requires_mongod = pytest.mark.skipif(
+    MONGO_BACKEND == "mongomock", reason="нужен реальный MongoDB: MONGO_BACKEND=mongodb, MONGO_URI, MONGO_DB_NAME"
+)
+
+
+@pytest.fixture(autouse=True)
+def clean_db():
+    """Каждый тест начинает с пустой базы и пустых кэшей"""
+    client.drop_database(MONGO_DB_NAME)
+    event_cache.clear()
+    task_cache.clear()
+    yield
+    client.drop_database(MONGO_DB_NAME)
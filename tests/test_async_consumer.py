@@ -0,0 +1,110 @@
+import asyncio
+from dataclasses import replace
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from app.cli import async_consumer
+from app.core import registry
+
+
+@pytest.fixture
+def slow_action(monkeypatch):
+    async def slow_handler(data, action):
+        await asyncio.sleep(1)
+        return {"action": action, "message": {"status": "success"}}
+
+    spec = registry.ACTIONS["get_event_by_id"]
+    monkeypatch.setitem(
+        registry.ACTIONS, "get_event_by_id", replace(spec, async_handler=slow_handler, timeout=0.01)
+    )
+
+
+def test_timeout_sends_error_response(slow_action, monkeypatch):
+    sent = []
+
+    async def fake_send(request_id, message):
+        sent.append((request_id, message))
+
+    monkeypatch.setattr(async_consumer, "send_response_async", fake_send)
+    asyncio.run(async_consumer.process_message_async("get_event_by_id", "r-1", {"data": {"_id": "x"}}))
+
+    assert sent == [("r-1", {"action": "get_event_by_id", "message": {"status": "error", "details": "timeout"}})]
+
+
+class _AsyncCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def sort(self, *args):
+        self._cursor = self._cursor.sort(*args)
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._cursor)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class _AsyncCollection:
+    """Асинхронный фасад над коллекцией mongomock с методами, которые используют корутины-обработчики"""
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    async def find_one(self, *args, **kwargs):
+        return self._collection.find_one(*args, **kwargs)
+
+    async def count_documents(self, *args, **kwargs):
+        return self._collection.count_documents(*args, **kwargs)
+
+    def find(self, *args, **kwargs):
+        return _AsyncCursor(self._collection.find(*args, **kwargs))
+
+
+class _AsyncDb:
+    def __getattr__(self, name):
+        from app.core.mongo_config import db
+        return _AsyncCollection(db[name])
+
+
+@pytest.mark.parametrize("action, data", [
+    ("get_event_by_id", lambda ids: {"_id": ids["event"]}),
+    ("get_event_by_id", lambda ids: {"_id": str(ObjectId())}),
+    ("get_event_by_id", lambda ids: {}),
+    ("get_task_by_id", lambda ids: {"task_id": ids["task"]}),
+    ("get_task_by_id", lambda ids: {}),
+    ("get_user_volunteer_count", lambda ids: {"user_id": "u-1"}),
+    ("get_user_volunteer_count", lambda ids: {}),
+    ("get_chat_messages", lambda ids: {"chat_id": "c-1", "limit": 2}),
+    ("get_chat_messages", lambda ids: {"chat_id": "c-1", "before": "x"}),
+])
+def test_async_twins_answer_like_sync_handlers(action, data, monkeypatch):
+    from app.core.mongo_config import db
+    from app.services import chat_service, event_service, task_service
+    from app.utils.cache import event_cache, task_cache
+
+    for module in (chat_service, event_service, task_service):
+        monkeypatch.setattr(module, "get_async_db", lambda: _AsyncDb())
+    ids = {
+        "event": str(db.events.insert_one({"title": "e", "volunteers": ["u-1"]}).inserted_id),
+        "task": str(db.volunteer_tasks.insert_one({"title": "t"}).inserted_id),
+    }
+    for _ in range(3):
+        chat_service.append_chat_message("c-1", {"_id": ObjectId(), "timestamp": datetime.utcnow(), "text": "m"})
+
+    spec = registry.ACTIONS[action]
+    payload = data(ids)
+    expected = spec.handler(payload, action)
+    event_cache.clear()
+    task_cache.clear()
+
+    assert asyncio.run(spec.async_handler(payload, action)) == expected
@@ -0,0 +1,34 @@
+import pytest
+
+from app.utils.cache import TTLCache, bound_cache_staleness, event_cache, task_cache
+
+
+@pytest.fixture
+def restore_caches():
+    saved = [(cache, cache.ttl, cache.enabled) for cache in (event_cache, task_cache)]
+    yield
+    for cache, ttl, enabled in saved:
+        cache.ttl, cache.enabled = ttl, enabled
+
+
+def test_set_skipped_after_invalidation():
+    cache = TTLCache("t", maxsize=10, ttl=60)
+    generation = cache.generation()
+    cache.invalidate("a")
+    cache.set("a", {"v": 1}, generation=generation)
+    assert cache.get("a") is None
+
+
+def test_multiprocess_mode_disables_caches(restore_caches):
+    event_cache.set("e", {"v": 1})
+    bound_cache_staleness(0)
+    assert event_cache.get("e") is None
+    event_cache.set("e", {"v": 1})
+    assert event_cache.get("e") is None
+    assert task_cache.enabled is False
+
+
+def test_multiprocess_mode_caps_ttl(restore_caches):
+    bound_cache_staleness(2)
+    assert event_cache.enabled
+    assert event_cache.ttl <= 2
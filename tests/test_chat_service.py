@@ -0,0 +1,80 @@
+from datetime import datetime
+
+from bson import ObjectId
+
+from app.core.mongo_config import db
+from app.services.chat_service import append_chat_message, get_chat_messages_service
+
+CHAT_ID = "chat-1"
+
+
+def make_messages(count):
+    ids = sorted(ObjectId() for _ in range(count))
+    return [{"_id": oid, "author": "u", "message": f"m{i}", "timestamp": datetime.utcnow()} for i, oid in enumerate(ids)]
+
+
+def insert_bucket(messages):
+    db.chat_message_buckets.insert_one({
+        "chat_id": CHAT_ID,
+        "messages": messages,
+        "count": len(messages),
+        "first_id": min(m["_id"] for m in messages),
+        "last_id": max(m["_id"] for m in messages),
+    })
+
+
+def page(**data):
+    return get_chat_messages_service({"chat_id": CHAT_ID, **data}, "get_chat_messages")["message"]
+
+
+def read_backward(limit):
+    """Листает историю от новых к старым и возвращает тексты в хронологическом порядке"""
+    texts = []
+    result = page(limit=limit)
+    while True:
+        texts = [m["message"] for m in result["messages"]] + texts
+        if not result["has_more"]:
+            return texts
+        result = page(limit=limit, before=result["next_before"])
+
+
+def read_forward(limit, after):
+    texts = []
+    result = page(limit=limit, after=after)
+    while True:
+        texts += [m["message"] for m in result["messages"]]
+        if not result["has_more"]:
+            return texts
+        result = page(limit=limit, after=result["next_after"])
+
+
+def test_pages_through_sequential_buckets():
+    messages = make_messages(12)
+    for message in messages:
+        append_chat_message(CHAT_ID, message)
+
+    expected = [m["message"] for m in messages]
+    assert read_backward(limit=5) == expected
+    assert read_forward(limit=5, after=str(messages[0]["_id"])) == expected[1:]
+
+
+def test_pages_through_interleaved_buckets():
+    # Две открытые пачки после гонки upsert'ов: диапазоны _id перекрываются
+    messages = make_messages(10)
+    insert_bucket(messages[0::2])
+    insert_bucket(messages[1::2])
+
+    expected = [m["message"] for m in messages]
+    assert read_backward(limit=3) == expected
+    assert read_forward(limit=3, after=str(messages[0]["_id"])) == expected[1:]
+
+
+def test_latest_page_with_nested_bucket_ranges():
+    messages = make_messages(9)
+    # Пачка с широким диапазоном и старшим last_id, внутри которого лежит другая пачка
+    insert_bucket([messages[0], messages[8]])
+    insert_bucket(messages[1:8])
+
+    result = page(limit=3)
+    assert [m["message"] for m in result["messages"]] == ["m6", "m7", "m8"]
+    assert result["has_more"] is True
@@ -0,0 +1,143 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from app.core.mongo_config import db
+from app.services import cleanup_service
+
+
+class _Executor:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, fn, *args):
+        self.submitted.append(args)
+
+
+@pytest.fixture
+def executor(monkeypatch):
+    fake = _Executor()
+    monkeypatch.setattr(cleanup_service, "_get_executor", lambda: fake)
+    yield fake
+    cleanup_service.stop_cleanup_jobs()
+
+
+def _job(status="running", owner="other-host:1:x", lease=60, event_id="e-1"):
+    now = datetime.utcnow()
+    job = {
+        "_id": ObjectId(), "event_id": event_id, "chat_id": None, "status": status,
+        "deleted_tasks": 0, "deleted_comments": 0, "created_at": now, "updated_at": now,
+    }
+    if status == "running":
+        job.update(owner=owner, lease_until=now + timedelta(seconds=lease))
+    db.cleanup_jobs.insert_one(job)
+    return job["_id"]
+
+
+def test_resume_skips_jobs_with_live_lease(executor):
+    live = _job(lease=60)
+    expired = _job(lease=-1)
+    pending = _job(status="pending")
+
+    assert cleanup_service.resume_cleanup_jobs() == 2
+    assert {args[0] for args in executor.submitted} == {expired, pending}
+    assert live not in {args[0] for args in executor.submitted}
+
+
+def test_run_job_leaves_live_lease_alone():
+    job_id = _job(lease=60)
+    db.volunteer_tasks.insert_one({"event_id": "e-1", "title": "t"})
+
+    cleanup_service._run_job(job_id)
+
+    assert db.cleanup_jobs.find_one({"_id": job_id})["owner"] == "other-host:1:x"
+    assert db.volunteer_tasks.count_documents({}) == 1
+
+
+def test_run_job_takes_over_expired_lease():
+    job_id = _job(lease=-1)
+    db.volunteer_tasks.insert_many([{"event_id": "e-1", "title": str(i)} for i in range(3)])
+
+    cleanup_service._run_job(job_id)
+
+    job = db.cleanup_jobs.find_one({"_id": job_id})
+    assert job["status"] == "done"
+    assert job["owner"] == cleanup_service.OWNER
+    assert job["deleted_tasks"] == 3
+    assert db.volunteer_tasks.count_documents({}) == 0
+
+
+def test_lost_lease_stops_cleanup(monkeypatch):
+    monkeypatch.setattr(cleanup_service, "CLEANUP_BATCH_SIZE", 1)
+    job_id = _job(status="pending")
+    db.volunteer_tasks.insert_many([{"event_id": "e-1", "title": str(i)} for i in range(3)])
+
+    # Другой процесс перехватывает задание после первой порции
+    delete_many = db.volunteer_tasks.delete_many
+
+    def steal(query):
+        result = delete_many(query)
+        db.cleanup_jobs.update_one({"_id": job_id}, {"$set": {"owner": "other-host:1:x"}})
+        return result
+
+    monkeypatch.setattr(cleanup_service.db.volunteer_tasks, "delete_many", steal)
+    cleanup_service._run_job(job_id)
+
+    job = db.cleanup_jobs.find_one({"_id": job_id})
+    assert job["status"] == "running"
+    assert job["owner"] == "other-host:1:x"
+    assert db.volunteer_tasks.count_documents({}) == 2
+
+
+def _event_with_tasks(tasks=2):
+    chat_id = ObjectId()
+    event_id = db.events.insert_one({"title": "e", "status": "active", "category": "c", "chat_id": str(chat_id)}).inserted_id
+    db.chats.insert_one({"_id": chat_id, "event_id": str(event_id)})
+    db.chat_message_buckets.insert_one({"chat_id": str(chat_id), "count": 0, "messages": []})
+    db.volunteer_tasks.insert_many([{"event_id": str(event_id), "title": str(i)} for i in range(tasks)])
+    return str(event_id)
+
+
+def test_failed_inline_cascade_is_resumed(executor, monkeypatch):
+    from app.services.event_service import delete_event_service
+
+    event_id = _event_with_tasks()
+
+    def broken(chat_id):
+        raise RuntimeError("mongo unavailable")
+
+    monkeypatch.setattr(cleanup_service, "delete_chat", broken)
+    response = delete_event_service({"_id": event_id}, "delete_event")
+
+    job = db.cleanup_jobs.find_one({"event_id": event_id})
+    assert response["message"]["cleanup"]["job_id"] == str(job["_id"])
+    assert job["status"] == "pending"
+
+    monkeypatch.undo()
+    monkeypatch.setattr(cleanup_service, "_get_executor", lambda: executor)
+    executor.submitted.clear()
+    assert cleanup_service.resume_cleanup_jobs() == 1
+    cleanup_service._run_job(*executor.submitted[0])
+
+    assert db.cleanup_jobs.find_one({"_id": job["_id"]})["status"] == "done"
+    assert db.volunteer_tasks.count_documents({}) == 0
+    assert db.chats.count_documents({}) == 0
+    assert db.chat_message_buckets.count_documents({}) == 0
+
+
+def test_cascade_interrupted_by_shutdown_is_resumed(executor):
+    from app.services.event_service import delete_event_service
+
+    event_id = _event_with_tasks()
+    cleanup_service._stop.set()
+    delete_event_service({"_id": event_id}, "delete_event")
+
+    # Сервис останавливается: задание записано, но не запущено
+    job = db.cleanup_jobs.find_one({"event_id": event_id})
+    assert job["status"] == "pending"
+    assert executor.submitted == []
+
+    assert cleanup_service.resume_cleanup_jobs() == 1
+    cleanup_service._run_job(*executor.submitted[0])
+    assert db.volunteer_tasks.count_documents({}) == 0
@@ -0,0 +1,105 @@
+import json
+import threading
+
+import pytest
+
+from app.cli import consumer
+
+
+class FakeKafkaMessage:
+    def __init__(self, value, offset, error=None):
+        self._value = value
+        self._offset = offset
+        self._error = error
+
+    def value(self):
+        return self._value
+
+    def topic(self):
+        return "requests"
+
+    def partition(self):
+        return 0
+
+    def offset(self):
+        return self._offset
+
+    def error(self):
+        return self._error
+
+
+def request(request_id, offset, action="get_event_by_id"):
+    value = json.dumps({"request_id": request_id, "message": {"action": action, "data": {}}}).encode()
+    return FakeKafkaMessage(value, offset)
+
+
+class FakeConsumer:
+    """Отдаёт заранее заданные пачки и записывает коммиты в общий журнал; после пачек останавливает цикл"""
+
+    def __init__(self, batches, log, stop_event):
+        self.batches = list(batches)
+        self.log = log
+        self.stop_event = stop_event
+        self.closed = False
+
+    def consume(self, num_messages, timeout):
+        if not self.batches:
+            self.stop_event.set()
+            return []
+        return self.batches.pop(0)
+
+    def get_watermark_offsets(self, partition, cached=False):
+        return 0, 100
+
+    def commit(self, asynchronous=True):
+        assert asynchronous is False
+        self.log.append("commit")
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def log(monkeypatch):
+    entries = []
+    monkeypatch.setattr(
+        consumer, "process_new_message",
+        lambda action, request_id, message, duplicate_wait=0.0: entries.append(request_id)
+    )
+    return entries
+
+
+def run_batches(monkeypatch, batches, log):
+    stop_event = threading.Event()
+    fake = FakeConsumer(batches, log, stop_event)
+    monkeypatch.setattr(consumer, "get_consumer", lambda topics, on_revoke=None: fake)
+    consumer.consume_batches(stop_event)
+    return fake
+
+
+def test_batch_is_committed_after_all_handlers(monkeypatch, log):
+    fake = run_batches(monkeypatch, [
+        [request("r-1", 0), request("r-2", 1)],
+        [],
+        [request("r-3", 2)],
+    ], log)
+
+    assert log == ["r-1", "r-2", "commit", "r-3", "commit"]
+    assert fake.closed
+
+
+def test_broken_messages_are_skipped_but_committed(monkeypatch, log):
+    run_batches(monkeypatch, [[
+        FakeKafkaMessage(b"not json", 0),
+        FakeKafkaMessage(None, 1, error="partition EOF"),
+        request("r-1", 2),
+    ]], log)
+
+    assert log == ["r-1", "commit"]
+
+
+def test_decode_message_unwraps_request():
+    assert consumer.decode_message(request("r-1", 0)) == (
+        "r-1", "get_event_by_id", {"action": "get_event_by_id", "data": {}}
+    )
+    assert consumer.decode_message(FakeKafkaMessage(b"{}", 0)) is None
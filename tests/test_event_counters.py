@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from app.core.mongo_config import db
+from app.core.service_config import MAX_PAGE_SIZE
+from app.services import event_service
+from app.services.counter_service import EVENT_COUNTERS_ID
+from app.services.event_service import create_event_service, get_upcoming_events_service
+
+
+def event_payload(title="Субботник"):
+    return {
+        "title": title,
+        "start_datetime": (datetime.utcnow() + timedelta(days=3)).isoformat(),
+        "location": "Парк",
+        "required_volunteers": 5,
+        "category": "Экология",
+        "status": "active",
+        "created_by": "user-1",
+    }
+
+
+def test_first_write_rebuilds_missing_counters():
+    # События, созданные до появления документа счётчиков
+    for i in range(5):
+        db.events.insert_one({"title": f"e{i}", "status": "active", "category": "Экология"})
+
+    create_event_service(event_payload(), "create_event")
+
+    counters = db.event_counters.find_one({"_id": EVENT_COUNTERS_ID})
+    assert counters["status"] == {"active": 6}
+    assert counters["categories"] == {"Экология": {"active": 6}}
+
+
+def test_existing_counters_are_incremented():
+    create_event_service(event_payload("a"), "create_event")
+    create_event_service(event_payload("b"), "create_event")
+
+    counters = db.event_counters.find_one({"_id": EVENT_COUNTERS_ID})
+    assert counters["status"] == {"active": 2}
+
+
+def test_upcoming_events_limit_is_clamped(monkeypatch):
+    # $lookup с pipeline mongomock не выполняет — проверяем сам запрос
+    pipelines = []
+
+    class Counters:
+        def aggregate(self, pipeline):
+            pipelines.append(pipeline)
+            return iter([{"_id": EVENT_COUNTERS_ID, "events": []}])
+
+    monkeypatch.setattr(event_service, "db", SimpleNamespace(event_counters=Counters()))
+
+    response = get_upcoming_events_service({"limit": 10 ** 6}, "get_upcoming_events")
+
+    assert response["message"]["status"] == "success"
+    assert {"$limit": MAX_PAGE_SIZE} in pipelines[0][1]["$lookup"]["pipeline"]
@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from app.core.mongo_config import db
+from app.services import event_service
+from app.services.counter_service import EVENT_COUNTERS_ID
+from app.services.event_service import create_event_service
+
+
+def event_payload(title="Субботник"):
+    return {
+        "title": title,
+        "start_datetime": (datetime.utcnow() + timedelta(days=3)).isoformat(),
+        "location": "Парк",
+        "required_volunteers": 5,
+        "category": "Экология",
+        "status": "active",
+        "created_by": "user-1",
+    }
+
+
+def test_event_and_chat_are_written_cross_referenced():
+    event = create_event_service(event_payload(), "create_event")["message"]["event"]
+
+    stored = db.events.find_one({"_id": ObjectId(event["_id"])})
+    chat = db.chats.find_one({"_id": ObjectId(event["chat_id"])})
+    assert stored["chat_id"] == event["chat_id"]
+    assert chat["event_id"] == event["_id"]
+    assert "search_prefixes" not in event
+
+
+def test_batch_creates_all_events_with_one_counter_update():
+    response = create_event_service(
+        {"events": [event_payload("a"), event_payload("b"), event_payload("c")]}, "create_event"
+    )
+
+    events = response["message"]["events"]
+    assert [event["title"] for event in events] == ["a", "b", "c"]
+    assert db.events.count_documents({}) == db.chats.count_documents({}) == 3
+    assert db.event_counters.find_one({"_id": EVENT_COUNTERS_ID})["status"] == {"active": 3}
+
+
+def test_invalid_event_rejects_whole_batch():
+    invalid = {**event_payload("b"), "required_volunteers": "many"}
+
+    response = create_event_service({"events": [event_payload("a"), invalid, "c"]}, "create_event")
+
+    assert response["message"]["status"] == "error"
+    assert [error["index"] for error in response["message"]["details"]] == [1, 2]
+    assert db.events.count_documents({}) == db.chats.count_documents({}) == 0
+
+
+def test_batch_size_is_limited(monkeypatch):
+    monkeypatch.setattr(event_service, "EVENT_CREATE_BATCH_LIMIT", 1)
+
+    assert create_event_service({"events": []}, "create_event")["message"]["status"] == "error"
+    response = create_event_service({"events": [event_payload("a"), event_payload("b")]}, "create_event")
+    assert response["message"]["status"] == "error"
+    assert db.events.count_documents({}) == 0
+
+
+def test_chat_is_written_before_event(monkeypatch):
+    def fail(documents, **kwargs):
+        raise RuntimeError("insert failed")
+
+    monkeypatch.setattr(db.events, "insert_many", fail)
+
+    # Чат пишется первым: при сбое остаётся чат без события, но не событие без чата
+    with pytest.raises(RuntimeError):
+        create_event_service(event_payload(), "create_event")
+    assert db.chats.count_documents({}) == 1
@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta
+
+from app.services.event_service import create_event_service, get_event_by_title_service, search_events_service
+from tests.conftest import requires_mongod
+
+
+def _create(title, description="", category="Спорт", days=1):
+    return create_event_service({
+        "title": title,
+        "description": description,
+        "start_datetime": (datetime.utcnow() + timedelta(days=days)).isoformat(),
+        "location": "Москва",
+        "required_volunteers": 5,
+        "category": category,
+        "created_by": "u-1",
+    }, "create_event")["message"]["event"]["_id"]
+
+
+def _titles(action, data, handler):
+    # fields: mongomock не поддерживает вычисляемый volunteers_count ($size) в проекции find
+    data = {"fields": ["title"], **data}
+    pages, cursor = [], None
+    while True:
+        message = handler({**data, "cursor": cursor}, action)["message"]
+        pages.append([event["title"] for event in message["events"]])
+        cursor = message["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+def test_title_search_ignores_other_fields():
+    _create("Уборка парка", description="Экологическая акция", category="Экология")
+
+    assert _titles("get_event_by_title", {"title": "парк"}, get_event_by_title_service) == [["Уборка парка"]]
+    assert _titles("get_event_by_title", {"title": "эко"}, get_event_by_title_service) == [[]]
+
+
+def test_title_search_accepts_single_letter():
+    _create("Уборка парка")
+    _create("Марафон")
+
+    assert _titles("get_event_by_title", {"title": "У"}, get_event_by_title_service) == [["Уборка парка"]]
+
+
+def test_title_search_pages_all_matches():
+    for day in range(5):
+        _create(f"Марафон {day}", days=day + 1)
+
+    pages = _titles("get_event_by_title", {"title": "мар", "limit": 2}, get_event_by_title_service)
+
+    assert pages == [["Марафон 0", "Марафон 1"], ["Марафон 2", "Марафон 3"], ["Марафон 4"]]
+
+
+@requires_mongod
+def test_search_events_matches_all_fields_and_pages():
+    _create("Уборка парка", description="Экологическая акция")
+    for day in range(4):
+        _create(f"Лекция {day}", description="Экология города", days=day + 1)
+
+    message = search_events_service({"query": "эко", "limit": 3}, "search_events")["message"]
+    assert message["has_more"] is True
+
+    pages = _titles("search_events", {"query": "эко", "limit": 3}, search_events_service)
+    titles = [title for page in pages for title in page]
+    assert sorted(titles) == sorted(["Уборка парка"] + [f"Лекция {day}" for day in range(4)])
+    assert len(pages) == 2
@@ -0,0 +1,149 @@
+import threading
+import time
+from dataclasses import replace
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.cli import consumer
+from app.core import registry
+from app.core.mongo_config import db
+from app.services import idempotency_service
+from app.services.idempotency_service import (
+    CLAIMED, IN_PROGRESS, REPLAY, claim_request, complete_request, release_request,
+)
+
+
+@pytest.fixture(autouse=True)
+def short_lease(monkeypatch):
+    monkeypatch.setattr(idempotency_service, "IDEMPOTENCY_LEASE", 0.3)
+    monkeypatch.setattr(idempotency_service, "POLL_INTERVAL", 0.02)
+
+
+def _foreign_claim(request_id, lease_until):
+    db.processed_requests.insert_one({
+        "_id": request_id, "action": "create_event", "status": "pending",
+        "owner": "other-host:1:x", "created_at": datetime.utcnow(), "lease_until": lease_until,
+    })
+
+
+def test_claim_complete_replay():
+    response = {"action": "create_event", "message": {"status": "success"}}
+
+    assert claim_request("r-1", "create_event") == (CLAIMED, None)
+    complete_request("r-1", response)
+
+    assert claim_request("r-1", "create_event") == (REPLAY, response)
+
+
+def test_release_allows_new_claim():
+    assert claim_request("r-1", "create_event") == (CLAIMED, None)
+    release_request("r-1")
+
+    assert claim_request("r-1", "create_event") == (CLAIMED, None)
+
+
+def test_expired_lease_of_dead_owner_is_taken_over():
+    _foreign_claim("r-1", datetime.utcnow() - timedelta(seconds=1))
+
+    assert claim_request("r-1", "create_event", wait=0) == (CLAIMED, None)
+    assert db.processed_requests.find_one({"_id": "r-1"})["owner"] == idempotency_service.OWNER
+
+
+def test_duplicate_waits_for_live_owner_and_replays():
+    response = {"action": "create_event", "message": {"status": "success"}}
+    _foreign_claim("r-1", datetime.utcnow() + timedelta(seconds=10))
+
+    def finish():
+        time.sleep(0.1)
+        db.processed_requests.update_one(
+            {"_id": "r-1"}, {"$set": {"status": "done", "response": idempotency_service.dumps(response)}}
+        )
+
+    threading.Thread(target=finish).start()
+    assert claim_request("r-1", "create_event", wait=5) == (REPLAY, response)
+
+
+def test_live_owner_keeps_claim_after_wait():
+    _foreign_claim("r-1", datetime.utcnow() + timedelta(seconds=10))
+
+    assert claim_request("r-1", "create_event", wait=0.1) == (IN_PROGRESS, None)
+
+
+def test_heartbeat_renews_held_lease():
+    assert claim_request("r-1", "create_event") == (CLAIMED, None)
+    time.sleep(0.6)
+
+    assert db.processed_requests.find_one({"_id": "r-1"})["lease_until"] > datetime.utcnow()
+    assert claim_request("r-1", "create_event", wait=0) == (IN_PROGRESS, None)
+    release_request("r-1")
+
+
+def test_redelivered_write_replays_response(monkeypatch):
+    calls = []
+    sent = []
+
+    def handler(data, action):
+        calls.append(data)
+        return {"action": action, "message": {"status": "success", "n": len(calls)}}
+
+    spec = registry.ACTIONS["create_event"]
+    monkeypatch.setitem(registry.ACTIONS, "create_event", replace(spec, handler=handler))
+    monkeypatch.setattr(consumer, "send_response", lambda request_id, message: sent.append((request_id, message)))
+
+    message = {"data": {"title": "t"}}
+    consumer.process_new_message("create_event", "r-1", message)
+    consumer.process_new_message("create_event", "r-1", message)
+
+    assert len(calls) == 1
+    assert sent[0] == sent[1]
+
+
+def test_failed_write_is_released(monkeypatch):
+    def handler(data, action):
+        raise RuntimeError("boom")
+
+    spec = registry.ACTIONS["create_event"]
+    monkeypatch.setitem(registry.ACTIONS, "create_event", replace(spec, handler=handler))
+    monkeypatch.setattr(consumer, "send_response", lambda request_id, message: None)
+
+    consumer.process_new_message("create_event", "r-1", {"data": {}})
+
+    assert db.processed_requests.find_one({"_id": "r-1"}) is None
+
+
+def test_duplicate_does_not_wait_by_default():
+    _foreign_claim("r-1", datetime.utcnow() + timedelta(seconds=10))
+
+    started = time.monotonic()
+    assert claim_request("r-1", "create_event") == (IN_PROGRESS, None)
+    assert time.monotonic() - started < idempotency_service.POLL_INTERVAL
+
+
+def test_vanishing_record_is_retried_within_deadline(monkeypatch):
+    _foreign_claim("r-1", datetime.utcnow() + timedelta(seconds=10))
+    lookups = []
+
+    def vanished(query):
+        lookups.append(query)
+        return None
+
+    monkeypatch.setattr(db.processed_requests, "find_one", vanished)
+
+    assert claim_request("r-1", "create_event") == (IN_PROGRESS, None)
+    assert len(lookups) == 2
+
+
+def test_single_consumer_thread_does_not_block_on_duplicate(monkeypatch):
+    handled = []
+    spec = registry.ACTIONS["create_event"]
+    monkeypatch.setitem(registry.ACTIONS, "create_event", replace(spec, handler=lambda data, action: handled.append(1)))
+    monkeypatch.setattr(consumer, "send_response", lambda request_id, message: None)
+    monkeypatch.setattr(idempotency_service, "POLL_INTERVAL", 5)
+    _foreign_claim("r-1", datetime.utcnow() + timedelta(seconds=10))
+
+    started = time.monotonic()
+    consumer.process_new_message("create_event", "r-1", {"data": {}})
+
+    assert handled == []
+    assert time.monotonic() - started < 1
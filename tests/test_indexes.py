@@ -0,0 +1,95 @@
+from pymongo.errors import OperationFailure
+
+from app.cli import maintenance
+from app.core.indexes import DROPPED_INDEXES, INDEXES, ensure_indexes, query_shapes, verify_query_shapes
+from app.core.mongo_config import db
+
+
+class FakeCursor:
+    def __init__(self, plan):
+        self.plan = plan
+
+    def sort(self, sort):
+        return self
+
+    def explain(self):
+        return {"queryPlanner": {"winningPlan": self.plan}}
+
+
+class FakeCollection:
+    def __init__(self, plan):
+        self.plan = plan
+
+    def find(self, query):
+        return FakeCursor(self.plan)
+
+
+class FakeDatabase:
+    """explain возвращает COLLSCAN для коллекций из scanned, для остальных — выборку по индексу"""
+
+    def __init__(self, scanned=()):
+        self.scanned = scanned
+
+    def __getitem__(self, name):
+        if name in self.scanned:
+            return FakeCollection({"stage": "SORT", "inputStage": {"stage": "COLLSCAN"}})
+        return FakeCollection({"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}})
+
+
+def test_ensure_indexes_applies_manifest_idempotently():
+    first = ensure_indexes(database=db)
+    second = ensure_indexes(database=db)
+
+    assert first == second
+    for collection, models in INDEXES.items():
+        names = set(db[collection].index_information())
+        assert {model.document["name"] for model in models} <= names
+
+
+def test_ensure_indexes_continues_after_failed_collection(monkeypatch):
+    def fail(models):
+        raise OperationFailure("index build failed")
+
+    monkeypatch.setattr(db.events, "create_indexes", fail)
+
+    ensured = ensure_indexes(database=db)
+
+    assert "events" not in ensured
+    assert "chat_id_last_id" in ensured["chat_message_buckets"]
+
+
+def test_verify_flags_collection_scans():
+    report = {name: (stages, collscan) for name, stages, collscan in verify_query_shapes(FakeDatabase({"events"}))}
+
+    assert report["events_by_creator"] == (["SORT", "COLLSCAN"], True)
+    assert report["tasks_by_user"] == (["FETCH", "IXSCAN"], False)
+
+
+def test_verify_command_fails_on_collection_scan(monkeypatch):
+    report = [("a", ["IXSCAN"], False), ("b", ["COLLSCAN"], True)]
+    monkeypatch.setattr(maintenance, "verify_query_shapes", lambda: report)
+    assert maintenance.cmd_verify_indexes(None) == 1
+
+    monkeypatch.setattr(maintenance, "verify_query_shapes", lambda: [("a", ["IXSCAN"], False)])
+    assert maintenance.cmd_verify_indexes(None) == 0
+
+
+def test_ensure_indexes_drops_replaced_indexes():
+    db.events.create_index("volunteers", name="volunteers")
+    db.volunteer_tasks.create_index([("event_id", 1), ("deadline", 1)], name="event_id_deadline")
+
+    ensure_indexes(database=db)
+
+    for collection, names in DROPPED_INDEXES.items():
+        assert not set(names) & set(db[collection].index_information())
+    assert "event_id_deadline_id" in db.volunteer_tasks.index_information()
+    assert "volunteers_start_datetime" in db.events.index_information()
+
+
+def test_tasks_by_event_shape_matches_both_id_types():
+    shapes = {name: (collection, query, sort) for name, collection, query, sort in query_shapes()}
+
+    collection, query, sort = shapes["tasks_by_event"]
+    assert collection == "volunteer_tasks"
+    assert len(query["event_id"]["$in"]) == 2
+    assert sort == [("deadline", 1), ("_id", 1)]
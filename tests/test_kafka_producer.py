@@ -0,0 +1,185 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from confluent_kafka import KafkaException
+
+from app.cli import producer as producer_module
+from app.core.kafka_config import PRODUCER_PROFILES, RESPONSE_KEY, TOPICS, producer_config
+from app.utils import kafka_helper
+from app.utils.serialization import loads
+
+
+class FakeMessage:
+    def __init__(self, topic):
+        self._topic = topic
+
+    def topic(self):
+        return self._topic
+
+
+class FakeProducer:
+    """Заглушка Producer: сообщения доставляются при poll()/flush(), error — ошибка доставки"""
+
+    def __init__(self, error=None, undelivered=0):
+        self.error = error
+        self.undelivered = undelivered
+        self.sent = []
+        self.polls = 0
+        self.full = 0
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def produce(self, topic, key=None, value=None, on_delivery=None):
+        if self.full:
+            self.full -= 1
+            raise BufferError("queue full")
+        with self._lock:
+            self._pending.append((topic, key, value, on_delivery))
+
+    def poll(self, timeout):
+        self.polls += 1
+        with self._lock:
+            pending, self._pending = self._pending, []
+        for topic, key, value, on_delivery in pending:
+            self.sent.append((topic, key, value))
+            on_delivery(self.error, FakeMessage(topic))
+        time.sleep(0.001)
+        return len(pending)
+
+    def flush(self, timeout):
+        self.poll(0)
+        return self.undelivered
+
+    def __len__(self):
+        return len(self._pending)
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    created = FakeProducer()
+    monkeypatch.setattr(kafka_helper, "get_producer", lambda: created)
+    yield created
+    kafka_helper.flush_producer(timeout=0)
+
+
+def _wait_for(condition, timeout=1.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+
+def test_shared_producer_is_created_once_and_polled_in_background(fake, monkeypatch):
+    created = []
+    monkeypatch.setattr(kafka_helper, "get_producer", lambda: created.append(1) or fake)
+
+    assert kafka_helper.get_shared_producer() is kafka_helper.get_shared_producer() is fake
+    assert created == [1]
+
+    kafka_helper.produce("t", b"v")
+    assert _wait_for(lambda: fake.sent == [("t", None, b"v")])
+
+
+def test_delivery_callbacks_are_counted(fake):
+    kafka_helper.install_producer(fake)
+    before = kafka_helper.get_delivery_stats()
+
+    kafka_helper.produce("t", b"ok")
+    assert kafka_helper.get_delivery_stats()["pending"] == 1
+    fake.poll(0)
+    fake.error = "broker down"
+    kafka_helper.produce("t", b"lost")
+    fake.poll(0)
+
+    stats = kafka_helper.get_delivery_stats()
+    assert stats["produced"] - before["produced"] == 2
+    assert stats["delivered"] - before["delivered"] == 1
+    assert stats["failed"] - before["failed"] == 1
+    assert stats["last_error"] == "broker down"
+    assert stats["pending"] == 0
+
+
+def test_full_queue_is_polled_before_retry(fake):
+    kafka_helper.install_producer(fake)
+    fake.full = 1
+
+    kafka_helper.produce("t", b"v")
+
+    assert fake.polls == 1
+    assert len(fake) == 1
+
+
+def test_flush_stops_polling_and_reports_undelivered(fake):
+    kafka_helper.get_shared_producer()
+    poll_thread = kafka_helper._poll_thread
+    fake.undelivered = 3
+
+    assert kafka_helper.flush_producer(timeout=0) == 3
+    assert not poll_thread.is_alive()
+    assert kafka_helper.flush_producer(timeout=0) == 0
+
+
+def test_send_response_does_not_wait_for_delivery(fake):
+    kafka_helper.install_producer(fake)
+
+    producer_module.send_response("r-1", {"action": "a", "message": {"status": "success", "forward_to": ["u"]}})
+
+    assert fake.sent == []
+    topic, key, value, _ = fake._pending[0]
+    assert topic == TOPICS["responses"]
+    assert loads(value)["forward_to"] == ["u"]
+
+
+def test_produce_async_waits_for_delivery(fake):
+    kafka_helper.install_producer(fake)
+
+    async def send():
+        delivery = asyncio.ensure_future(kafka_helper.produce_async("t", b"v"))
+        await asyncio.sleep(0)
+        assert not delivery.done()
+        fake.poll(0)
+        return await delivery
+
+    assert asyncio.run(send()).topic() == "t"
+
+    fake.error = "broker down"
+    with pytest.raises(KafkaException):
+        asyncio.run(send())
+
+
+def test_profiles_set_batching_and_compression():
+    assert producer_config("latency", overrides=False)["linger.ms"] == 0
+    assert producer_config("throughput", overrides=False)["compression.type"] == "zstd"
+    for profile, options in PRODUCER_PROFILES.items():
+        assert options.items() <= producer_config(profile, overrides=False).items()
+
+    with pytest.raises(ValueError):
+        producer_config("fastest")
+
+
+def test_env_overrides_apply_on_top_of_profile(monkeypatch):
+    monkeypatch.setenv("KAFKA_LINGER_MS", "20")
+    monkeypatch.setenv("KAFKA_COMPRESSION_TYPE", "lz4")
+
+    config = producer_config("throughput")
+    assert (config["linger.ms"], config["compression.type"], config["batch.size"]) == (20, "lz4", 1000000)
+    assert producer_config("throughput", overrides=False)["linger.ms"] == 50
+
+
+def test_response_key_spreads_by_request_or_groups_by_user():
+    message = {"message": {"status": "success", "forward_to": ["user-1", "user-2"]}}
+
+    assert producer_module.response_key("r-1", message, mode="request_id") == "r-1"
+    assert producer_module.response_key("r-1", message, mode="user") == "user-1"
+    assert producer_module.response_key("r-1", {"message": {}}, mode="user") == "r-1"
+    assert producer_module.response_key(None, {"message": {}}) is None
+
+
+def test_send_response_uses_configured_key(fake):
+    kafka_helper.install_producer(fake)
+
+    producer_module.send_response("r-1", {"action": "a", "message": {"status": "success", "forward_to": ["u"]}})
+
+    assert fake._pending[0][1] == ("u" if RESPONSE_KEY == "user" else "r-1")
@@ -0,0 +1,91 @@
+import signal
+import threading
+import time
+
+from app.cli import service
+from app.core.lifecycle import Lifecycle, ShutdownEvent
+
+
+def test_deadline_starts_at_first_set():
+    event = ShutdownEvent(timeout=10)
+    assert event.remaining() is None
+
+    event.set()
+    first = event.remaining()
+    time.sleep(0.02)
+    event.set()
+
+    assert 9 < event.remaining() < first <= 10
+    assert event.drain_timeout() < event.remaining()
+
+
+def test_signal_stops_consumer_and_runs_shutdown_steps_in_order():
+    lifecycle = Lifecycle(timeout=5)
+    steps = []
+
+    def consumer(stop_event):
+        stop_event.wait()
+        steps.append("consumer drained")
+
+    lifecycle.on_shutdown(steps.append, "flush")
+    lifecycle.on_shutdown(steps.append, "close")
+    lifecycle.start(consumer)
+
+    lifecycle._handle_signal(signal.SIGTERM, None)
+    lifecycle.wait()
+
+    assert lifecycle.shutdown() is True
+    assert steps == ["consumer drained", "flush", "close"]
+
+
+def test_failed_step_does_not_skip_the_rest():
+    lifecycle = Lifecycle(timeout=1)
+    steps = []
+
+    def broken():
+        raise RuntimeError("flush failed")
+
+    lifecycle.on_shutdown(broken)
+    lifecycle.on_shutdown(steps.append, "close")
+    lifecycle.stop_event.set()
+
+    assert lifecycle.shutdown() is False
+    assert steps == ["close"]
+
+
+def test_consumer_past_deadline_is_reported():
+    lifecycle = Lifecycle(timeout=0.1)
+    release = threading.Event()
+    lifecycle.start(lambda stop_event: release.wait())
+    lifecycle.stop_event.set()
+
+    assert lifecycle.shutdown() is False
+    release.set()
+
+
+def test_crashed_consumer_stops_the_process():
+    lifecycle = Lifecycle(timeout=1)
+
+    def crash(stop_event):
+        raise RuntimeError("broker gone")
+
+    lifecycle.start(crash)
+
+    assert lifecycle.stop_event.wait(1)
+    assert lifecycle.shutdown() is True
+
+
+def test_run_service_flushes_and_closes_after_consumer(monkeypatch):
+    steps = []
+
+    def consumer(stop_event):
+        steps.append("consumer")
+
+    monkeypatch.setattr(service, "consume_messages", consumer)
+    monkeypatch.setattr(service, "resume_cleanup_jobs", lambda: steps.append("resume cleanup"))
+    monkeypatch.setattr(service, "stop_cleanup_jobs", lambda: steps.append("stop cleanup"))
+    monkeypatch.setattr(service, "flush_producer", lambda timeout: steps.append("flush") or 0)
+    monkeypatch.setattr(service, "close_client", lambda: steps.append("close"))
+
+    assert service.run_service(ensure=False, signals=()) == 0
+    assert steps == ["resume cleanup", "consumer", "stop cleanup", "flush", "close"]
@@ -0,0 +1,78 @@
+import json
+import logging
+
+import pytest
+
+from app.cli import consumer
+from app.core import logging_config
+from app.core.logging_config import ActionSampler, JsonFormatter, TextFormatter, setup_logging
+
+
+def record(level=logging.INFO, msg="Запрос обработан", args=(), **extra):
+    entry = logging.LogRecord("app.test", level, __file__, 1, msg, args, None)
+    entry.__dict__.update(extra)
+    return entry
+
+
+def test_json_format_is_one_line_with_extra_fields():
+    line = JsonFormatter().format(record(msg="Обработано %s из %s", args=(2, 3), action="create_event"))
+
+    assert "\n" not in line
+    entry = json.loads(line)
+    assert entry["msg"] == "Обработано 2 из 3"
+    assert (entry["level"], entry["logger"], entry["action"]) == ("info", "app.test", "create_event")
+
+
+def test_json_format_keeps_record_with_unserializable_extra():
+    entry = json.loads(JsonFormatter().format(record(payload=object())))
+
+    assert entry["payload"].startswith("<object object")
+
+
+def test_text_format_appends_extra_fields():
+    line = TextFormatter().format(record(request_id="r-1"))
+
+    assert line.endswith('app.test: Запрос обработан {"request_id":"r-1"}')
+
+
+def test_sampler_drops_only_sampled_info_records(monkeypatch):
+    monkeypatch.setattr(logging_config, "LOG_SAMPLE_RATE", 0.0)
+    monkeypatch.setattr(logging_config, "LOG_SAMPLE_RATES", {"create_event": 1.0})
+    sampler = ActionSampler()
+
+    assert not sampler.filter(record(action="get_event_by_id"))
+    assert sampler.filter(record(action="create_event"))
+    assert sampler.filter(record(level=logging.WARNING, action="get_event_by_id"))
+    assert sampler.filter(record())
+
+
+def test_payload_is_logged_only_at_debug(monkeypatch, caplog):
+    monkeypatch.setattr(consumer, "send_response", lambda request_id, message: None)
+
+    with caplog.at_level(logging.INFO):
+        consumer.process_new_message("get_event_by_id", "r-1", {"data": {"_id": "bad"}})
+    assert caplog.records
+    assert not any(hasattr(entry, "payload") for entry in caplog.records)
+
+    caplog.clear()
+    with caplog.at_level(logging.DEBUG, logger=consumer.logger.name):
+        consumer.process_new_message("get_event_by_id", "r-1", {"data": {"_id": "bad"}})
+    assert any(getattr(entry, "payload", None) == {"data": {"_id": "bad"}} for entry in caplog.records)
+
+
+@pytest.fixture
+def root_logger():
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    yield root
+    root.handlers[:] = handlers
+    root.setLevel(level)
+
+
+def test_setup_logging_installs_single_sampled_handler(root_logger):
+    setup_logging(level="WARNING", fmt="text")
+
+    [handler] = root_logger.handlers
+    assert isinstance(handler.formatter, TextFormatter)
+    assert any(isinstance(f, ActionSampler) for f in handler.filters)
+    assert root_logger.level == logging.WARNING
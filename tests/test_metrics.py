@@ -0,0 +1,131 @@
+import urllib.error
+import urllib.request
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+
+from app.cli import consumer
+from app.utils import metrics
+from app.utils.metrics import Counter, Gauge, Histogram, current_action, record_lag, start_metrics_server
+
+
+def sample(metric, *labels):
+    """Значение серии из текстового представления Prometheus (0, если серии нет)"""
+    prefix = metric.name + metrics._format_labels(metric.label_names, labels) + " "
+    for line in metric.render():
+        if line.startswith(prefix):
+            return float(line[len(prefix):])
+    return 0.0
+
+
+def test_counter_renders_labels_escaped():
+    counter = Counter("test_total", "Тестовый счётчик", ["action"])
+    counter.inc('say "hi"')
+    counter.inc('say "hi"', amount=2)
+
+    assert counter.render() == [
+        "# HELP test_total Тестовый счётчик",
+        "# TYPE test_total counter",
+        'test_total{action="say \\"hi\\""} 3',
+    ]
+
+
+def test_series_require_declared_labels():
+    with pytest.raises(ValueError):
+        Counter("test_total", "", ["action"]).inc()
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("test_seconds", "", ["action"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        histogram.observe("a", value=value)
+
+    assert histogram.render()[2:] == [
+        'test_seconds_bucket{action="a",le="0.1"} 1',
+        'test_seconds_bucket{action="a",le="1.0"} 3',
+        'test_seconds_bucket{action="a",le="+Inf"} 4',
+        'test_seconds_sum{action="a"} 4.25',
+        'test_seconds_count{action="a"} 4',
+    ]
+
+
+class FakeMessage:
+    def __init__(self, partition, offset):
+        self._partition = partition
+        self._offset = offset
+
+    def topic(self):
+        return "requests"
+
+    def partition(self):
+        return self._partition
+
+    def offset(self):
+        return self._offset
+
+    def error(self):
+        return None
+
+
+def test_lag_is_measured_from_last_message_of_each_partition(monkeypatch):
+    lag = Gauge("test_lag", "", ["topic", "partition"])
+    monkeypatch.setattr(metrics, "CONSUMER_LAG", lag)
+    fake = SimpleNamespace(get_watermark_offsets=lambda tp, cached: (0, {0: 10, 1: 5}[tp.partition]))
+
+    record_lag(fake, [FakeMessage(0, 3), FakeMessage(0, 7), FakeMessage(1, 4)])
+
+    assert sample(lag, "requests", 0) == 2
+    assert sample(lag, "requests", 1) == 0
+
+
+def test_pipeline_counts_requests_and_errors(monkeypatch):
+    monkeypatch.setattr(consumer, "send_response", lambda request_id, message: None)
+    before = (
+        sample(metrics.REQUESTS, "get_event_by_id"),
+        sample(metrics.ERRORS, "get_event_by_id", "handler"),
+        sample(metrics.REQUESTS, "unknown"),
+    )
+
+    # Мероприятия нет: обработчик отвечает статусом error
+    consumer.process_new_message("get_event_by_id", "r-1", {"data": {"_id": str(ObjectId())}})
+    consumer.process_new_message("no_such_action", "r-2", {"data": {}})
+
+    after = (
+        sample(metrics.REQUESTS, "get_event_by_id"),
+        sample(metrics.ERRORS, "get_event_by_id", "handler"),
+        sample(metrics.REQUESTS, "unknown"),
+    )
+    assert [b - a for a, b in zip(before, after)] == [1, 1, 1]
+
+
+def test_mongo_commands_are_attributed_to_current_action(monkeypatch):
+    histogram = Histogram("test_mongo_seconds", "", ["action", "command"])
+    monkeypatch.setattr(metrics, "MONGO_SECONDS", histogram)
+
+    token = current_action.set("get_event_by_id")
+    try:
+        metrics.mongo_listener.succeeded(SimpleNamespace(command_name="find", duration_micros=1500))
+    finally:
+        current_action.reset(token)
+
+    rendered = histogram.render()
+    assert 'test_mongo_seconds_count{action="get_event_by_id",command="find"} 1' in rendered
+    assert 'test_mongo_seconds_sum{action="get_event_by_id",command="find"} 0.0015' in rendered
+
+
+def test_metrics_endpoint_serves_prometheus_text():
+    server = start_metrics_server("127.0.0.1", 0)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        with urllib.request.urlopen(f"{base}/metrics") as response:
+            body = response.read().decode("utf-8")
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+        assert "# TYPE eventms_requests_total counter" in body
+
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(f"{base}/other")
+        assert error.value.code == 404
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.mongo_config import db
+from app.utils.pagination import build_page, decode_cursor, encode_cursor, page_query
+
+BASE = datetime(2030, 1, 1)
+
+
+def seed():
+    # Повторяющиеся и пустые ключи сортировки: null, отсутствующее поле и несколько одинаковых дат
+    deadlines = [None, None, BASE, BASE, BASE, BASE + timedelta(days=1), None, BASE + timedelta(days=2), BASE]
+    for i, deadline in enumerate(deadlines):
+        doc = {"n": i}
+        if i != 6:
+            doc["deadline"] = deadline
+        db.volunteer_tasks.insert_one(doc)
+
+
+def read_all(sort, limit):
+    seen, cursor = [], None
+    while True:
+        query = page_query({}, sort, cursor)
+        docs = list(db.volunteer_tasks.find(query).sort(sort).limit(limit + 1))
+        docs, cursor = build_page(docs, sort, limit)
+        seen.extend(doc["_id"] for doc in docs)
+        if cursor is None:
+            return seen
+
+
+@pytest.mark.parametrize("direction", [1, -1])
+@pytest.mark.parametrize("limit", [1, 2, 3, 4])
+def test_keyset_pages_cover_every_document_once(direction, limit):
+    seed()
+    sort = [("deadline", direction), ("_id", direction)]
+    expected = [doc["_id"] for doc in db.volunteer_tasks.find({}).sort(sort)]
+
+    assert read_all(sort, limit) == expected
+
+
+def test_last_page_has_no_cursor():
+    seed()
+    sort = [("deadline", 1), ("_id", 1)]
+    docs = list(db.volunteer_tasks.find({}).sort(sort).limit(100))
+    page, cursor = build_page(docs, sort, 100)
+    assert len(page) == 9
+    assert cursor is None
+
+
+def test_cursor_roundtrip_keeps_types():
+    values = [BASE, None]
+    assert decode_cursor(encode_cursor(values)) == values
+
+
+def test_malformed_cursor_is_rejected():
+    with pytest.raises(ValueError):
+        page_query({}, [("deadline", 1), ("_id", 1)], "не-курсор")
+    with pytest.raises(ValueError):
+        page_query({}, [("deadline", 1), ("_id", 1)], encode_cursor([BASE]))
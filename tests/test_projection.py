@@ -0,0 +1,73 @@
+import pytest
+from bson import ObjectId
+
+from app.core.mongo_config import db
+from app.services.event_service import get_events_with_user_as_volunteer_service
+from app.services.task_service import TASK_LIST_FIELDS, get_tasks_by_user_service
+from app.utils.projection import build_projection, is_inclusion
+
+
+def test_default_projection_is_lean_with_computed_fields():
+    computed = {"count": {"$size": "$items"}}
+
+    assert build_projection(None, ("title", "status"), computed=computed) == {"title": 1, "status": 1, **computed}
+
+
+def test_all_fields_hides_service_fields():
+    assert build_projection("all", ("title",), hidden_fields=("search_tokens",)) == {"search_tokens": 0}
+    assert build_projection("*", ("title",)) == {}
+
+
+def test_requested_fields_drop_hidden_ones():
+    assert build_projection("title, location.city", ("status",)) == {"title": 1, "location.city": 1}
+    assert build_projection(["title", "comments"], (), hidden_fields=("comments",)) == {"title": 1}
+    assert build_projection(["comments"], (), hidden_fields=("comments",)) == {"_id": 1}
+
+
+def test_operator_in_field_name_is_rejected():
+    with pytest.raises(ValueError):
+        build_projection(["$where"], ())
+
+
+def test_is_inclusion():
+    assert is_inclusion({"_id": 0, "title": 1})
+    assert not is_inclusion({"comments": 0})
+
+
+def _task(**fields):
+    return {
+        "title": "t", "description": "long text", "assigned_to": "u", "status": "in_progress",
+        "comments": [{"text": "old"}], **fields,
+    }
+
+
+def test_task_list_returns_lean_cards_by_default():
+    db.volunteer_tasks.insert_one(_task())
+
+    task = get_tasks_by_user_service({"user_id": "u"}, "get_tasks_by_user")["data"]["tasks"][0]
+
+    assert set(task) <= {"_id", *TASK_LIST_FIELDS}
+    assert "description" not in task
+
+
+def test_task_list_fields_all_still_hides_embedded_comments():
+    db.volunteer_tasks.insert_one(_task())
+
+    task = get_tasks_by_user_service({"user_id": "u", "fields": "all"}, "get_tasks_by_user")["data"]["tasks"][0]
+
+    assert task["description"] == "long text"
+    assert "comments" not in task
+
+
+def test_event_list_returns_only_requested_fields():
+    db.events.insert_one({
+        "title": "e", "location": "Парк", "volunteers": ["u", str(ObjectId())], "search_tokens": ["e"],
+    })
+
+    response = get_events_with_user_as_volunteer_service(
+        {"user_id": "u", "fields": ["title", "search_tokens"]}, "get_events_with_user_as_volunteer"
+    )
+    event = response["message"]["events"][0]
+
+    assert event["title"] == "e"
+    assert "location" not in event and "volunteers" not in event and "search_tokens" not in event
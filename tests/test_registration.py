@@ -0,0 +1,130 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from app.core.mongo_config import db
+from app.services.event_service import (
+    register_volunteer_service,
+    unregister_volunteer_service,
+    update_event_service,
+)
+from tests.conftest import requires_mongod
+
+
+def _event(required=2, volunteers=(), waitlist=()):
+    return str(db.events.insert_one({
+        "title": "e", "status": "active", "category": "c", "required_volunteers": required,
+        "volunteers": list(volunteers), "waitlist": list(waitlist),
+    }).inserted_id)
+
+
+def _register(event_id, user_id):
+    return register_volunteer_service({"_id": event_id, "user_id": user_id}, "register_volunteer")["message"]
+
+
+def _unregister(event_id, user_id):
+    return unregister_volunteer_service({"_id": event_id, "user_id": user_id}, "unregister_volunteer")["message"]
+
+
+def _stored(event_id):
+    from bson import ObjectId
+    event = db.events.find_one({"_id": ObjectId(event_id)})
+    return event["volunteers"], event["waitlist"]
+
+
+def test_update_rejects_membership_fields():
+    event_id = _event(volunteers=["a"])
+
+    for field in ("volunteers", "waitlist"):
+        message = update_event_service({"_id": event_id, field: ["x", "y", "z"]}, "update_event")["message"]
+        assert message["status"] == "error"
+    assert _stored(event_id) == (["a"], [])
+
+
+@requires_mongod
+def test_register_fills_slots_then_waitlists():
+    event_id = _event(required=2)
+
+    assert _register(event_id, "a")["registration_status"] == "registered"
+    assert _register(event_id, "b")["registration_status"] == "registered"
+    waitlisted = _register(event_id, "c")
+    assert waitlisted["registration_status"] == "waitlisted"
+    assert waitlisted["waitlist_position"] == 1
+
+    assert _stored(event_id) == (["a", "b"], ["c"])
+
+
+@requires_mongod
+def test_register_twice_is_rejected():
+    event_id = _event(required=1)
+    _register(event_id, "a")
+    _register(event_id, "b")
+
+    assert _register(event_id, "a")["status"] == "error"
+    assert _register(event_id, "b")["status"] == "error"
+    assert _stored(event_id) == (["a"], ["b"])
+
+
+@requires_mongod
+def test_user_ids_are_stored_literally():
+    event_id = _event(required=2)
+    _register(event_id, "$volunteers")
+
+    assert _stored(event_id) == (["$volunteers"], [])
+
+
+@requires_mongod
+def test_unregister_promotes_head_of_waitlist():
+    event_id = _event(required=2, volunteers=["a", "b"], waitlist=["c", "d"])
+
+    assert _unregister(event_id, "a")["promoted_user_id"] == "c"
+    assert _stored(event_id) == (["b", "c"], ["d"])
+
+
+@requires_mongod
+def test_unregister_from_waitlist_promotes_nobody():
+    event_id = _event(required=2, volunteers=["a", "b"], waitlist=["c", "d"])
+
+    assert _unregister(event_id, "c")["promoted_user_id"] is None
+    assert _stored(event_id) == (["a", "b"], ["d"])
+
+
+@requires_mongod
+def test_raising_capacity_promotes_waitlist():
+    event_id = _event(required=1, volunteers=["a"], waitlist=["b", "c", "d"])
+
+    message = update_event_service({"_id": event_id, "required_volunteers": 3}, "update_event")["message"]
+
+    assert message["promoted_user_ids"] == ["b", "c"]
+    assert _stored(event_id) == (["a", "b", "c"], ["d"])
+
+
+@requires_mongod
+def test_raising_capacity_beyond_waitlist_promotes_everyone():
+    event_id = _event(required=1, volunteers=["a"], waitlist=["b"])
+
+    update_event_service({"_id": event_id, "required_volunteers": 5}, "update_event")
+
+    assert _stored(event_id) == (["a", "b"], [])
+
+
+@requires_mongod
+def test_lowering_capacity_keeps_registered_volunteers():
+    event_id = _event(required=3, volunteers=["a", "b", "c"], waitlist=["d"])
+
+    message = update_event_service({"_id": event_id, "required_volunteers": 1}, "update_event")["message"]
+
+    assert message["promoted_user_ids"] == []
+    assert _stored(event_id) == (["a", "b", "c"], ["d"])
+
+
+@requires_mongod
+def test_concurrent_registrations_respect_capacity():
+    event_id = _event(required=5)
+    users = [f"u{i}" for i in range(40)]
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(lambda user: _register(event_id, user), users))
+
+    volunteers, waitlist = _stored(event_id)
+    assert len(volunteers) == 5
+    assert sorted(volunteers + waitlist) == sorted(users)
+    assert sum(r["registration_status"] == "registered" for r in results) == 5
@@ -0,0 +1,118 @@
+import logging
+import time
+
+import pytest
+from pydantic import BaseModel, ValidationError
+
+from app.cli import consumer
+from app.core import registry
+from app.core.registry import ActionSpec, register_action, register_async_handler
+
+
+class Payload(BaseModel):
+    title: str
+
+
+@pytest.fixture
+def actions(monkeypatch):
+    """Отдельная таблица действий: регистрации в тестах не попадают в общий реестр"""
+    table = dict(registry.ACTIONS)
+    monkeypatch.setattr(registry, "ACTIONS", table)
+    return table
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    responses = []
+    monkeypatch.setattr(consumer, "send_response", lambda request_id, message: responses.append((request_id, message)))
+    return responses
+
+
+def test_register_action_stores_metadata(actions):
+    @register_action("test_action", write=True, timeout=1.5, model=Payload, data_required=True, key=("task_id",))
+    def handler(data, action):
+        return {"action": action}
+
+    spec = registry.get_action("test_action")
+    assert spec.handler is handler
+    assert (spec.write, spec.timeout, spec.model, spec.data_required, spec.key_fields) == (
+        True, 1.5, Payload, True, ("task_id",)
+    )
+
+
+def test_duplicate_registration_is_rejected(actions):
+    register_action("test_action")(lambda data, action: None)
+
+    with pytest.raises(ValueError):
+        register_action("test_action")(lambda data, action: None)
+
+
+def test_async_handler_requires_registered_action(actions):
+    with pytest.raises(ValueError):
+        register_async_handler("test_action")(lambda data, action: None)
+
+    register_action("test_action")(lambda data, action: None)
+    register_async_handler("test_action")(lambda data, action: None)
+    assert registry.get_action("test_action").async_handler is not None
+
+
+def test_get_data_requires_data_only_when_declared():
+    assert ActionSpec("a", handler=None).get_data({}) == {}
+    with pytest.raises(KeyError):
+        ActionSpec("a", handler=None, data_required=True).get_data({})
+
+
+def test_get_data_validates_with_model_and_returns_raw_data():
+    spec = ActionSpec("a", handler=None, model=Payload)
+    data = {"title": "t", "extra": 1}
+
+    assert spec.get_data({"data": data}) is data
+    with pytest.raises(ValidationError):
+        spec.get_data({"data": {}})
+
+
+def test_ordering_key_takes_first_present_field():
+    spec = ActionSpec("a", handler=None, key_fields=("_id", "task_id"))
+
+    assert spec.ordering_key({"task_id": "t"}) == "t"
+    assert spec.ordering_key({"_id": "e", "task_id": "t"}) == "e"
+    assert spec.ordering_key({}) is None
+    assert spec.ordering_key(None) is None
+
+
+def test_dispatch_calls_registered_handler(actions, sent):
+    register_action("test_action")(lambda data, action: {"action": action, "message": {"status": "success", **data}})
+
+    consumer.process_new_message("test_action", "r-1", {"body": {"data": {"n": 1}}})
+
+    assert sent == [("r-1", {"action": "test_action", "message": {"status": "success", "n": 1}})]
+
+
+def test_unknown_action_is_not_answered(sent):
+    consumer.process_new_message("no_such_action", "r-1", {"data": {}})
+
+    assert sent == []
+
+
+def test_invalid_payload_is_answered_without_calling_handler(actions, sent):
+    calls = []
+    register_action("test_action", model=Payload, data_required=True)(lambda data, action: calls.append(data))
+
+    consumer.process_new_message("test_action", "r-1", {"data": {"title": None}})
+
+    assert calls == []
+    assert sent[0][1]["message"]["status"] == "error"
+
+
+def test_timeout_only_warns_in_sync_mode(actions, sent, caplog):
+    def slow(data, action):
+        time.sleep(0.05)
+        return {"action": action, "message": {"status": "success"}}
+
+    register_action("test_action", timeout=0.01)(slow)
+
+    with caplog.at_level(logging.WARNING, logger=consumer.logger.name):
+        consumer.process_new_message("test_action", "r-1", {"data": {}})
+
+    assert sent[0][1]["message"]["status"] == "success"
+    assert any("лимит" in record.getMessage() for record in caplog.records)
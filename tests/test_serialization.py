@@ -0,0 +1,71 @@
+import importlib.util
+import sys
+from datetime import date, datetime
+
+import pytest
+from bson import ObjectId
+from pydantic import BaseModel, HttpUrl
+
+from app.utils import serialization
+
+
+class Link(BaseModel):
+    url: HttpUrl
+
+
+def stdlib_serialization(monkeypatch):
+    """Отдельная копия модуля без orjson — проверка запасного пути на стандартном json"""
+    monkeypatch.setitem(sys.modules, "orjson", None)
+    spec = importlib.util.spec_from_file_location("serialization_stdlib", serialization.__file__)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def document():
+    return {
+        "_id": ObjectId("65f000000000000000000001"),
+        "title": "Субботник",
+        "start_datetime": datetime(2030, 1, 1, 10, 30),
+        "day": date(2030, 1, 1),
+        "photo_url": Link(url="https://example.com/p.png").url,
+        "tasks": [{"_id": ObjectId("65f000000000000000000002"), "deadline": None}],
+    }
+
+
+EXPECTED = {
+    "_id": "65f000000000000000000001",
+    "title": "Субботник",
+    "start_datetime": "2030-01-01T10:30:00",
+    "day": "2030-01-01",
+    "photo_url": "https://example.com/p.png",
+    "tasks": [{"_id": "65f000000000000000000002", "deadline": None}],
+}
+
+
+def test_dumps_converts_bson_types_in_one_pass():
+    encoded = serialization.dumps(document())
+
+    assert isinstance(encoded, bytes)
+    assert "Субботник".encode("utf-8") in encoded
+    assert serialization.loads(encoded) == EXPECTED
+
+
+def test_stdlib_fallback_matches(monkeypatch):
+    fallback = stdlib_serialization(monkeypatch)
+
+    assert fallback.JSON_BACKEND == "json"
+    assert fallback.loads(fallback.dumps(document())) == EXPECTED
+    assert fallback.loads(fallback.dumps_pretty(document())) == EXPECTED
+
+
+def test_unsupported_type_is_an_error():
+    with pytest.raises(TypeError):
+        serialization.dumps({"value": object()})
+
+
+def test_to_bson_stores_urls_and_ids_as_strings():
+    stored = serialization.to_bson({"photos": [Link(url="https://example.com/a").url], "event_id": ObjectId()})
+
+    assert isinstance(stored["photos"][0], str)
+    assert isinstance(stored["event_id"], str)
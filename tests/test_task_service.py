@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from app.core.mongo_config import db
+from app.services.task_service import (
+    add_task_comment_service, assign_task_service, delete_task_service, get_tasks_by_event_service,
+)
+
+
+def test_delete_task_removes_its_comments():
+    task_id = str(db.volunteer_tasks.insert_one({"title": "t", "assigned_to": "u", "created_by": "c"}).inserted_id)
+    other_id = str(db.volunteer_tasks.insert_one({"title": "o", "assigned_to": "u", "created_by": "c"}).inserted_id)
+    db.task_comments.insert_many([
+        {"task_id": task_id, "text": "a"},
+        {"task_id": task_id, "text": "b"},
+        {"task_id": other_id, "text": "c"},
+    ])
+
+    delete_task_service({"_id": task_id}, "delete_task")
+
+    assert db.task_comments.count_documents({"task_id": task_id}) == 0
+    assert db.task_comments.count_documents({"task_id": other_id}) == 1
+
+
+def test_tasks_by_event_finds_assigned_tasks_and_pages():
+    event_id = str(ObjectId())
+    start = datetime(2030, 1, 1)
+    for day in range(3):
+        assign_task_service(
+            {"title": f"t{day}", "assigned_to": "u", "event_id": event_id, "deadline": start + timedelta(days=day)},
+            "assign_task"
+        )
+    # Старые задачи хранят event_id как ObjectId
+    db.volunteer_tasks.insert_one({
+        "title": "legacy", "assigned_to": "u", "event_id": ObjectId(event_id), "deadline": start + timedelta(days=3),
+    })
+    db.volunteer_tasks.insert_one({"title": "other", "assigned_to": "u", "event_id": str(ObjectId()), "deadline": start})
+
+    first = get_tasks_by_event_service({"event_id": event_id, "limit": 2}, "get_tasks_by_event")["message"]
+    second = get_tasks_by_event_service(
+        {"event_id": event_id, "limit": 2, "cursor": first["next_cursor"]}, "get_tasks_by_event"
+    )["message"]
+
+    assert [task["title"] for task in first["tasks"]] == ["t0", "t1"]
+    assert first["has_more"] is True
+    assert [task["title"] for task in second["tasks"]] == ["t2", "legacy"]
+    assert second["has_more"] is False
+
+
+def test_comment_updates_counters_after_insert():
+    task_id = str(db.volunteer_tasks.insert_one({"title": "t", "assigned_to": "u", "created_by": "c"}).inserted_id)
+
+    response = add_task_comment_service(
+        {"task_id": task_id, "user_id": str(ObjectId()), "text": "hi"}, "add_task_comment"
+    )
+
+    task = db.volunteer_tasks.find_one({"_id": ObjectId(task_id)})
+    assert response["status"] == "success"
+    assert task["comments_count"] == db.task_comments.count_documents({"task_id": task_id}) == 1
+    assert task["last_comment"]["_id"] == response["message"]["comment"]["_id"]
+
+
+def test_comment_to_missing_task_is_not_kept():
+    response = add_task_comment_service(
+        {"task_id": str(ObjectId()), "user_id": str(ObjectId()), "text": "hi"}, "add_task_comment"
+    )
+
+    assert response["message"]["status"] == "error"
+    assert db.task_comments.count_documents({}) == 0
+
+
+def test_failed_insert_leaves_counters_untouched(monkeypatch):
+    task_id = str(db.volunteer_tasks.insert_one({"title": "t", "assigned_to": "u", "created_by": "c"}).inserted_id)
+
+    def fail(document):
+        raise RuntimeError("insert failed")
+
+    monkeypatch.setattr(db.task_comments, "insert_one", fail)
+
+    response = add_task_comment_service(
+        {"task_id": task_id, "user_id": str(ObjectId()), "text": "hi"}, "add_task_comment"
+    )
+
+    assert response["message"]["status"] == "error"
+    assert "comments_count" not in db.volunteer_tasks.find_one({"_id": ObjectId(task_id)})
@@ -0,0 +1,120 @@
+import threading
+import time
+
+from confluent_kafka import TopicPartition
+
+from app.utils.worker_pool import KeyedWorkerPool, OffsetTracker
+
+
+def positions(tracker):
+    return {(tp.topic, tp.partition): tp.offset for tp in tracker.committable()}
+
+
+def test_committable_stops_at_lowest_pending_offset():
+    tracker = OffsetTracker()
+    for offset in range(10, 15):
+        tracker.start("requests", 0, offset)
+
+    # Завершились не по порядку: 10 ещё в работе — коммитить нечего дальше 10
+    tracker.done("requests", 0, 12)
+    tracker.done("requests", 0, 11)
+    assert positions(tracker) == {("requests", 0): 10}
+
+    tracker.done("requests", 0, 10)
+    assert positions(tracker) == {("requests", 0): 13}
+
+    tracker.done("requests", 0, 14)
+    tracker.done("requests", 0, 13)
+    assert positions(tracker) == {("requests", 0): 15}
+
+
+def test_committable_skips_already_committed_positions():
+    tracker = OffsetTracker()
+    tracker.start("requests", 0, 0)
+    tracker.done("requests", 0, 0)
+
+    offsets = tracker.committable()
+    tracker.mark_committed(offsets)
+    assert tracker.committable() == []
+
+    tracker.start("requests", 0, 1)
+    assert tracker.committable() == []
+    tracker.done("requests", 0, 1)
+    assert positions(tracker) == {("requests", 0): 2}
+
+
+def test_partitions_are_tracked_independently():
+    tracker = OffsetTracker()
+    tracker.start("requests", 0, 5)
+    tracker.start("requests", 1, 7)
+    tracker.done("requests", 1, 7)
+    assert positions(tracker) == {("requests", 0): 5, ("requests", 1): 8}
+
+
+def test_forget_during_in_flight_work():
+    tracker = OffsetTracker()
+    tracker.start("requests", 0, 3)
+    tracker.start("requests", 1, 4)
+
+    # Партицию 0 отозвали, пока сообщение 3 ещё обрабатывается
+    tracker.forget([TopicPartition("requests", 0)])
+    assert positions(tracker) == {("requests", 1): 4}
+
+    # Позднее завершение обработчика не возвращает отозванную партицию в коммит
+    tracker.done("requests", 0, 3)
+    assert positions(tracker) == {("requests", 1): 4}
+
+    # После повторного назначения партиция отслеживается с нуля
+    tracker.start("requests", 0, 20)
+    tracker.done("requests", 0, 20)
+    assert positions(tracker)[("requests", 0)] == 21
+
+
+def test_pool_keeps_order_per_key():
+    pool = KeyedWorkerPool(size=4, queue_size=100)
+    results = {}
+    lock = threading.Lock()
+
+    def record(key, value):
+        with lock:
+            results.setdefault(key, []).append(value)
+
+    for value in range(50):
+        for key in ("a", "b", "c"):
+            pool.submit(key, record, key, value)
+
+    assert pool.shutdown(wait=True, timeout=5)
+    assert results == {key: list(range(50)) for key in ("a", "b", "c")}
+
+
+def test_pool_shutdown_reports_unfinished_threads():
+    pool = KeyedWorkerPool(size=1, queue_size=10)
+    release = threading.Event()
+    pool.submit("a", release.wait)
+
+    assert pool.shutdown(wait=True, timeout=0.1) is False
+    release.set()
+    assert pool.shutdown(wait=True, timeout=5) is True
+
+
+def test_pool_shutdown_respects_timeout_with_full_queue():
+    pool = KeyedWorkerPool(size=1, queue_size=1)
+    started, release = threading.Event(), threading.Event()
+    ran = []
+
+    def blocking():
+        started.set()
+        release.wait()
+
+    pool.submit("a", blocking)
+    started.wait(5)
+    pool.submit("a", ran.append, "queued")
+
+    began = time.monotonic()
+    assert pool.shutdown(wait=True, timeout=0.2) is False
+    assert time.monotonic() - began < 1
+
+    # После дедлайна начатая задача доделывается, а ещё не начатые не выполняются
+    release.set()
+    assert pool.join(timeout=5) is True
+    assert ran == []